@@ -5,7 +5,8 @@ from app.core.database import engine
 from app.models.models import *
 
 config = context.config
-fileConfig(config.config_file_name)
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
 
 target_metadata = SQLModel.metadata
 
@@ -0,0 +1,186 @@
+"""baseline schema
+
+Revision ID: 002
+Revises:
+Create Date: 2024-01-01 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# The tables as init_db created them when the migration history was adopted. Frozen here instead
+# of read from app.models, so later model changes need their own revision and don't alter this one
+metadata = sa.MetaData()
+
+sa.Table(
+    "user", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("session_id", sa.String, nullable=False),
+    sa.Column("created_at", sa.DateTime, nullable=False, server_default=sa.text("CURRENT_TIMESTAMP")),
+    sa.Column("is_guest", sa.Boolean, nullable=False, server_default=sa.true()),
+    sa.Column("email", sa.String),
+    sa.Index("ix_user_session_id", "session_id", unique=True),
+    sa.Index("ix_user_email", "email", unique=True),
+)
+
+sa.Table(
+    "ticker", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("symbol", sa.String, nullable=False),
+    sa.Column("user_id", sa.Integer, sa.ForeignKey("user.id"), nullable=False),
+    sa.Column("created_at", sa.DateTime, nullable=False),
+    sa.Column("risk_tolerance", sa.String),
+    sa.Index("ix_ticker_symbol", "symbol"),
+    sa.Index("ix_ticker_user_id", "user_id"),
+)
+
+sa.Table(
+    "pricepoint", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("symbol", sa.String, nullable=False),
+    sa.Column("date", sa.DateTime, nullable=False),
+    sa.Column("open", sa.Float, nullable=False),
+    sa.Column("high", sa.Float, nullable=False),
+    sa.Column("low", sa.Float, nullable=False),
+    sa.Column("close", sa.Float, nullable=False),
+    sa.Column("volume", sa.Integer, nullable=False),
+    sa.Index("ux_pricepoint_symbol_date", "symbol", "date", unique=True),
+    sa.Index("ix_pricepoint_date", "date"),
+)
+
+sa.Table(
+    "metricssnapshot", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("symbol", sa.String, nullable=False),
+    sa.Column("ts", sa.DateTime, nullable=False),
+    sa.Column("price", sa.Float, nullable=False),
+    sa.Column("return_7d", sa.Float, nullable=False),
+    sa.Column("vol_ann", sa.Float, nullable=False),
+    sa.Column("max_drawdown", sa.Float, nullable=False),
+    sa.Index("ix_metricssnapshot_symbol", "symbol"),
+    sa.Index("ix_metricssnapshot_ts", "ts"),
+)
+
+sa.Table(
+    "newsarticle", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("symbol", sa.String, nullable=False),
+    sa.Column("title", sa.String, nullable=False),
+    sa.Column("url", sa.String, nullable=False),
+    sa.Column("url_hash", sa.String),
+    sa.Column("published_at", sa.DateTime, nullable=False),
+    sa.Column("source", sa.String, nullable=False),
+    sa.Column("sentiment", sa.Float),
+    sa.Column("themes_json", sa.String),
+    sa.Index("ux_newsarticle_symbol_url_hash", "symbol", "url_hash", unique=True),
+    sa.Index("ix_newsarticle_symbol", "symbol"),
+    sa.Index("ix_newsarticle_url_hash", "url_hash"),
+    sa.Index("ix_newsarticle_published_at", "published_at"),
+)
+
+sa.Table(
+    "aisnapshot", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("symbol", sa.String, nullable=False),
+    sa.Column("ts", sa.DateTime, nullable=False),
+    sa.Column("sentiment", sa.Float, nullable=False),
+    sa.Column("themes_json", sa.String, nullable=False),
+    sa.Column("summary", sa.Text),
+    sa.Column("raw_json", sa.Text),
+    sa.Index("ix_aisnapshot_symbol", "symbol"),
+    sa.Index("ix_aisnapshot_ts", "ts"),
+)
+
+sa.Table(
+    "aianalysiscache", metadata,
+    sa.Column("key", sa.String, primary_key=True),
+    sa.Column("symbol", sa.String),
+    sa.Column("model", sa.String, nullable=False),
+    sa.Column("prompt_version", sa.String, nullable=False),
+    sa.Column("result_json", sa.Text),
+    sa.Column("created_at", sa.DateTime, nullable=False),
+    sa.Index("ix_aianalysiscache_symbol", "symbol"),
+    sa.Index("ix_aianalysiscache_created_at", "created_at"),
+)
+
+sa.Table(
+    "risksnapshot", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("symbol", sa.String, nullable=False),
+    sa.Column("ts", sa.DateTime, nullable=False),
+    sa.Column("market_score", sa.Float, nullable=False),
+    sa.Column("news_score", sa.Float, nullable=False),
+    sa.Column("total_score", sa.Float, nullable=False),
+    sa.Column("reasons_json", sa.Text),
+    sa.Column("trend", sa.Text),
+    sa.Index("ix_risksnapshot_symbol", "symbol"),
+    sa.Index("ix_risksnapshot_ts", "ts"),
+)
+
+sa.Table(
+    "symbollatest", metadata,
+    sa.Column("symbol", sa.String, primary_key=True),
+    sa.Column("price", sa.Float),
+    sa.Column("return_7d", sa.Float),
+    sa.Column("vol_ann", sa.Float),
+    sa.Column("max_drawdown", sa.Float),
+    sa.Column("metrics_ts", sa.DateTime),
+    sa.Column("market_score", sa.Float),
+    sa.Column("news_score", sa.Float),
+    sa.Column("total_score", sa.Float),
+    sa.Column("previous_total_score", sa.Float),
+    sa.Column("trend", sa.String),
+    sa.Column("reasons_json", sa.Text),
+    sa.Column("risk_ts", sa.DateTime),
+    sa.Column("sentiment", sa.Float),
+    sa.Column("themes_json", sa.Text),
+    sa.Column("summary", sa.Text),
+    sa.Column("market_outlook", sa.String),
+    sa.Column("ai_ts", sa.DateTime),
+    sa.Column("updated_at", sa.DateTime, nullable=False),
+)
+
+sa.Table(
+    "snapshotdailyrollup", metadata,
+    sa.Column("source", sa.String, primary_key=True),
+    sa.Column("symbol", sa.String, primary_key=True),
+    sa.Column("day", sa.DateTime, primary_key=True),
+    sa.Column("field", sa.String, primary_key=True),
+    sa.Column("open", sa.Float, nullable=False),
+    sa.Column("high", sa.Float, nullable=False),
+    sa.Column("low", sa.Float, nullable=False),
+    sa.Column("close", sa.Float, nullable=False),
+    sa.Column("mean", sa.Float, nullable=False),
+    sa.Column("samples", sa.Integer, nullable=False),
+)
+
+sa.Table(
+    "riskforecast", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("symbol", sa.String, nullable=False),
+    sa.Column("forecast_date", sa.DateTime, nullable=False),
+    sa.Column("days_ahead", sa.Integer, nullable=False),
+    sa.Column("predicted_score", sa.Float, nullable=False),
+    sa.Column("confidence", sa.Float, nullable=False),
+    sa.Column("trend_direction", sa.String, nullable=False),
+    sa.Column("forecast_reasons", sa.Text),
+    sa.Column("pattern_match", sa.String),
+    sa.Index("ix_riskforecast_symbol", "symbol"),
+    sa.Index("ix_riskforecast_forecast_date", "forecast_date"),
+)
+
+
+def upgrade() -> None:
+    # Tables that already exist are left alone, so databases created before the migration history
+    # was used can run `alembic upgrade head` directly
+    metadata.create_all(op.get_bind())
+
+
+def downgrade() -> None:
+    pass
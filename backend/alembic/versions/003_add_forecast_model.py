@@ -6,8 +6,6 @@ Create Date: 2024-01-01 12:00:00.000000
 
 """
 from alembic import op
-import sqlalchemy as sa
-from sqlalchemy.dialects import postgresql
 
 # revision identifiers, used by Alembic.
 revision = '003'
@@ -17,32 +15,38 @@ depends_on = None
 
 
 def upgrade() -> None:
+    # Brings pre-baseline Postgres databases up to date; elsewhere the 002 baseline already has it all
+    # (and ADD COLUMN IF NOT EXISTS is Postgres syntax)
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # Idempotent: init_db has applied the same changes to existing databases
     # Add trend column to risk_snapshot
-    op.add_column('risksnapshot', sa.Column('trend', sa.String(), nullable=True))
+    op.execute("ALTER TABLE risksnapshot ADD COLUMN IF NOT EXISTS trend VARCHAR")
     
     # Add risk_tolerance to ticker
-    op.add_column('ticker', sa.Column('risk_tolerance', sa.String(), nullable=True))
+    op.execute("ALTER TABLE ticker ADD COLUMN IF NOT EXISTS risk_tolerance VARCHAR")
     
     # Create risk_forecast table
-    op.create_table(
-        'riskforecast',
-        sa.Column('id', sa.Integer(), nullable=False),
-        sa.Column('symbol', sa.String(), nullable=False),
-        sa.Column('forecast_date', sa.DateTime(), nullable=False),
-        sa.Column('days_ahead', sa.Integer(), nullable=False),
-        sa.Column('predicted_score', sa.Float(), nullable=False),
-        sa.Column('confidence', sa.Float(), nullable=False),
-        sa.Column('trend_direction', sa.String(), nullable=False),
-        sa.Column('forecast_reasons', sa.Text(), nullable=False),
-        sa.Column('pattern_match', sa.String(), nullable=True),
-        sa.PrimaryKeyConstraint('id'),
-        sa.Index('ix_riskforecast_symbol', 'symbol'),
-        sa.Index('ix_riskforecast_forecast_date', 'forecast_date')
-    )
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS riskforecast (
+            id SERIAL PRIMARY KEY,
+            symbol VARCHAR NOT NULL,
+            forecast_date TIMESTAMP NOT NULL,
+            days_ahead INTEGER NOT NULL,
+            predicted_score FLOAT NOT NULL,
+            confidence FLOAT NOT NULL,
+            trend_direction VARCHAR NOT NULL,
+            forecast_reasons TEXT NOT NULL,
+            pattern_match VARCHAR
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_riskforecast_symbol ON riskforecast(symbol)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_riskforecast_forecast_date ON riskforecast(forecast_date)")
 
 
 def downgrade() -> None:
-    op.drop_table('riskforecast')
-    op.drop_column('ticker', 'risk_tolerance')
-    op.drop_column('risksnapshot', 'trend')
-
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("DROP TABLE IF EXISTS riskforecast")
+    op.execute("ALTER TABLE ticker DROP COLUMN IF EXISTS risk_tolerance")
+    op.execute("ALTER TABLE risksnapshot DROP COLUMN IF EXISTS trend")
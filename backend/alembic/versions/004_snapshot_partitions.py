@@ -0,0 +1,145 @@
+"""composite snapshot indexes and monthly partitions
+
+Revision ID: 004
+Revises: 003
+Create Date: 2024-06-01 00:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+from sqlalchemy import text
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+SNAPSHOT_TABLES = ('metricssnapshot', 'risksnapshot', 'aisnapshot')
+PARTITION_KEY = 'ts'
+MONTHS_AHEAD = 3  # partitions created ahead; the scheduler's maintenance keeps extending them
+
+
+# Partition helpers as of this revision (app.services.partitions may change; this migration must not)
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month: datetime, n: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + n
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def is_partitioned(conn, table: str) -> bool:
+    if conn.dialect.name != 'postgresql':
+        return False
+    return bool(conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+        {"table": table}
+    ).scalar())
+
+
+def create_month_partition(conn, table: str, month: datetime) -> str:
+    """Create and attach the partition for `month`, moving any of its rows out of the default partition."""
+    name = f"{table}_p{month:%Y%m}"
+    start, end = month, add_months(month, 1)
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    default = default_partition_name(table)
+    if conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": default}).scalar():
+        conn.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {default} WHERE {PARTITION_KEY} >= :start AND {PARTITION_KEY} < :end RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """), {"start": start, "end": end})
+    conn.execute(text(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+    ))
+    return name
+
+
+def _create_snapshot_indexes(table: str) -> None:
+    # (symbol, ts DESC, id DESC) serves every per-symbol newest-first / time-range read and
+    # replaces the single-column symbol index
+    op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_symbol_ts ON {table} (symbol, {PARTITION_KEY} DESC, id DESC)")
+    op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_ts ON {table} ({PARTITION_KEY})")
+
+
+def _partition(table: str) -> None:
+    """Rebuild `table` as a table range-partitioned by month on ts and copy its rows over."""
+    conn = op.get_bind()
+    legacy = f"{table}_unpartitioned"
+    op.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    op.execute(
+        f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE ({PARTITION_KEY})"
+    )
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": legacy}).scalar()
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+    op.execute(f"CREATE TABLE {default_partition_name(table)} PARTITION OF {table} DEFAULT")
+
+    months = {
+        month_start(row[0]) for row in conn.execute(
+            text(f"SELECT DISTINCT date_trunc('month', {PARTITION_KEY}) FROM {legacy}")
+        ).fetchall()
+    }
+    current = month_start(datetime.utcnow())
+    months.update(add_months(current, n) for n in range(MONTHS_AHEAD + 1))
+    for month in sorted(months):
+        create_month_partition(conn, table, month)
+
+    op.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+    op.execute(f"DROP TABLE {legacy}")
+    # Keys and indexes are built once the data is in (and the old table's names are free).
+    # The partition key has to be part of the primary key; ids stay unique through the shared sequence
+    op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, {PARTITION_KEY})")
+    _create_snapshot_indexes(table)
+    op.execute(f"ANALYZE {table}")
+
+
+def _unpartition(table: str) -> None:
+    conn = op.get_bind()
+    partitioned = f"{table}_partitioned"
+    op.execute(f"ALTER TABLE {table} RENAME TO {partitioned}")
+    op.execute(f"CREATE TABLE {table} (LIKE {partitioned} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": partitioned}).scalar()
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+    op.execute(f"INSERT INTO {table} SELECT * FROM {partitioned}")
+    op.execute(f"DROP TABLE {partitioned}")
+    op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id)")
+    op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_symbol ON {table} (symbol)")
+    op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_ts ON {table} ({PARTITION_KEY})")
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    for table in SNAPSHOT_TABLES:
+        if conn.dialect.name == 'postgresql' and not is_partitioned(conn, table):
+            _partition(table)
+        else:
+            _create_snapshot_indexes(table)
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_symbol")
+    # ux_pricepoint_symbol_date (symbol, date) serves per-symbol reads in either direction. Older
+    # databases only get it in 005 (after its duplicate sweep), which drops the index there instead
+    if conn.dialect.name != 'postgresql' or conn.execute(
+        text("SELECT to_regclass('ux_pricepoint_symbol_date') IS NOT NULL")
+    ).scalar():
+        op.execute("DROP INDEX IF EXISTS ix_pricepoint_symbol")
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    op.execute("CREATE INDEX IF NOT EXISTS ix_pricepoint_symbol ON pricepoint (symbol)")
+    for table in SNAPSHOT_TABLES:
+        if is_partitioned(conn, table):
+            _unpartition(table)
+        else:
+            op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_symbol ON {table} (symbol)")
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_symbol_ts")
@@ -0,0 +1,255 @@
+"""schema changes init_db used to apply on every startup
+
+Revision ID: 005
+Revises: 004
+Create Date: 2024-06-15 00:00:00.000000
+
+"""
+import hashlib
+import json
+from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from alembic import op
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+# URL normalization and trend threshold as of this revision (news_service / risk_scoring may change;
+# the hashes and trends this migration backfills must not)
+TRACKING_PARAMS = {"oc", "ved", "usg", "fbclid", "gclid", "cmpid", "ref"}
+TREND_THRESHOLD = 5
+
+
+def url_hash(url: str) -> str:
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith("utm_")
+    )
+    path = parts.path.rstrip("/") or "/"
+    normalized = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _trend(total, previous):
+    if previous is None:
+        return "new"
+    if total - previous > TREND_THRESHOLD:
+        return "up"
+    if total - previous < -TREND_THRESHOLD:
+        return "down"
+    return "flat"
+
+
+def _market_outlook(raw_json):
+    try:
+        return json.loads(raw_json).get("market_outlook", "NEUTRAL") if raw_json else None
+    except (ValueError, AttributeError):
+        return None
+
+
+# Newest metrics, newest two risk scores and newest AI snapshot per symbol missing from symbollatest
+LATEST_STATE_SQL = """
+    SELECT s.symbol,
+           m.price, m.return_7d, m.vol_ann, m.max_drawdown, m.ts AS metrics_ts,
+           r.market_score, r.news_score, r.total_score, p.total_score AS previous_total_score,
+           r.reasons_json, r.ts AS risk_ts,
+           a.sentiment, a.themes_json, a.summary, a.raw_json, a.ts AS ai_ts
+    FROM (
+        SELECT symbol FROM metricssnapshot
+        UNION SELECT symbol FROM risksnapshot
+        UNION SELECT symbol FROM aisnapshot
+        EXCEPT SELECT symbol FROM symbollatest
+    ) s
+    LEFT JOIN LATERAL (
+        SELECT * FROM metricssnapshot t WHERE t.symbol = s.symbol ORDER BY t.ts DESC, t.id DESC LIMIT 1
+    ) m ON true
+    LEFT JOIN LATERAL (
+        SELECT * FROM risksnapshot t WHERE t.symbol = s.symbol ORDER BY t.ts DESC, t.id DESC LIMIT 1
+    ) r ON true
+    LEFT JOIN LATERAL (
+        SELECT t.total_score FROM risksnapshot t WHERE t.symbol = s.symbol ORDER BY t.ts DESC, t.id DESC OFFSET 1 LIMIT 1
+    ) p ON true
+    LEFT JOIN LATERAL (
+        SELECT * FROM aisnapshot t WHERE t.symbol = s.symbol ORDER BY t.ts DESC, t.id DESC LIMIT 1
+    ) a ON true
+"""
+
+INSERT_LATEST_SQL = """
+    INSERT INTO symbollatest (
+        symbol, price, return_7d, vol_ann, max_drawdown, metrics_ts,
+        market_score, news_score, total_score, previous_total_score, trend, reasons_json, risk_ts,
+        sentiment, themes_json, summary, market_outlook, ai_ts, updated_at
+    ) VALUES (
+        :symbol, :price, :return_7d, :vol_ann, :max_drawdown, :metrics_ts,
+        :market_score, :news_score, :total_score, :previous_total_score, :trend, :reasons_json, :risk_ts,
+        :sentiment, :themes_json, :summary, :market_outlook, :ai_ts, :updated_at
+    )
+    ON CONFLICT (symbol) DO NOTHING
+"""
+
+
+def _step(bind: Connection, note: str, statements):
+    """Run one step in a savepoint; like the old per-step transactions, a failure is logged and skipped."""
+    try:
+        with bind.begin_nested():
+            for statement in statements:
+                bind.execute(text(statement))
+    except Exception as e:
+        print(f"Note {note}: {e}")
+
+
+def run_init_db_steps(bind: Connection):
+    """The steps init_db ran on every startup (numbered as they were there). All are idempotent.
+    Tables init_db's create_all made are created by the 002 baseline."""
+    # 1. Create user table
+    _step(bind, "creating user table", [
+        """
+        CREATE TABLE IF NOT EXISTS "user" (
+            id SERIAL PRIMARY KEY,
+            session_id VARCHAR UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_guest BOOLEAN DEFAULT TRUE,
+            email VARCHAR UNIQUE
+        )
+        """,
+        'CREATE INDEX IF NOT EXISTS ix_user_session_id ON "user"(session_id)',
+        'CREATE INDEX IF NOT EXISTS ix_user_email ON "user"(email)',
+    ])
+
+    # 2. Migrate ticker table (add id and user_id columns)
+    has_id = bind.execute(text("""
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_name = 'ticker' AND column_name = 'id'
+    """)).fetchone()
+    if not has_id:
+        print("Migrating ticker table to new schema...")
+        _step(bind, "adding ticker id column", ["ALTER TABLE ticker ADD COLUMN id SERIAL"])
+    _step(bind, "adding user_id", ["ALTER TABLE ticker ADD COLUMN IF NOT EXISTS user_id INTEGER"])
+
+    # 3. Create legacy user and assign existing tickers
+    _step(bind, "creating legacy user", ["""
+        INSERT INTO "user" (session_id, is_guest)
+        VALUES ('legacy_user', TRUE)
+        ON CONFLICT (session_id) DO NOTHING
+    """])
+    _step(bind, "assigning legacy user to tickers", ["""
+        UPDATE ticker
+        SET user_id = (SELECT id FROM "user" WHERE session_id = 'legacy_user')
+        WHERE user_id IS NULL
+    """])
+
+    # 4. Foreign key constraint
+    _step(bind, "replacing fk_ticker_user", [
+        "ALTER TABLE ticker DROP CONSTRAINT IF EXISTS fk_ticker_user",
+        'ALTER TABLE ticker ADD CONSTRAINT fk_ticker_user FOREIGN KEY (user_id) REFERENCES "user"(id)',
+    ])
+
+    # 5. Unique (user_id, symbol) index
+    _step(bind, "creating unique index", [
+        "DROP INDEX IF EXISTS ix_ticker_user_symbol",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_ticker_user_symbol ON ticker(user_id, symbol)",
+    ])
+
+    # 6. risk_tolerance column
+    _step(bind, "adding risk_tolerance", ["ALTER TABLE ticker ADD COLUMN IF NOT EXISTS risk_tolerance VARCHAR"])
+
+    # 7. trend column on risksnapshot
+    _step(bind, "adding trend", ["ALTER TABLE risksnapshot ADD COLUMN IF NOT EXISTS trend VARCHAR"])
+
+    # 8./9. riskforecast table and indexes (003 creates them on databases it migrates)
+    _step(bind, "creating riskforecast table", [
+        """
+        CREATE TABLE IF NOT EXISTS riskforecast (
+            id SERIAL PRIMARY KEY,
+            symbol VARCHAR NOT NULL,
+            forecast_date TIMESTAMP NOT NULL,
+            days_ahead INTEGER NOT NULL,
+            predicted_score FLOAT NOT NULL,
+            confidence FLOAT NOT NULL,
+            trend_direction VARCHAR NOT NULL,
+            forecast_reasons TEXT NOT NULL,
+            pattern_match VARCHAR,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_riskforecast_symbol ON riskforecast(symbol)",
+        "CREATE INDEX IF NOT EXISTS ix_riskforecast_forecast_date ON riskforecast(forecast_date)",
+    ])
+
+    # 10. Unique (symbol, date) index on pricepoint for bulk upserts (drop duplicate bars first, keep newest row)
+    _step(bind, "creating pricepoint unique index", [
+        """
+        DELETE FROM pricepoint a
+        USING pricepoint b
+        WHERE a.symbol = b.symbol AND a.date = b.date AND a.id < b.id
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_pricepoint_symbol_date ON pricepoint(symbol, date)",
+        # Only once the unique index exists does it replace the single-column one (see 004)
+        "DROP INDEX IF EXISTS ix_pricepoint_symbol",
+    ])
+
+    # 11. url_hash on newsarticle: backfill, drop per-symbol duplicates, then unique (symbol, url_hash)
+    try:
+        with bind.begin_nested():
+            bind.execute(text("ALTER TABLE newsarticle ADD COLUMN IF NOT EXISTS url_hash VARCHAR"))
+            missing = bind.execute(text("SELECT id, url FROM newsarticle WHERE url_hash IS NULL")).fetchall()
+            if missing:
+                bind.execute(
+                    text("UPDATE newsarticle SET url_hash = :url_hash WHERE id = :id"),
+                    [{"id": row.id, "url_hash": url_hash(row.url)} for row in missing]
+                )
+            bind.execute(text("""
+                DELETE FROM newsarticle a
+                USING newsarticle b
+                WHERE a.symbol = b.symbol AND a.url_hash = b.url_hash AND a.id > b.id
+            """))
+            bind.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_newsarticle_symbol_url_hash ON newsarticle(symbol, url_hash)"))
+            bind.execute(text("CREATE INDEX IF NOT EXISTS ix_newsarticle_url_hash ON newsarticle(url_hash)"))
+    except Exception as e:
+        print(f"Note adding newsarticle url_hash: {e}")
+
+    # 12. Backfill the symbollatest projection for symbols that have snapshots but no row yet.
+    # Runs on the migration's connection: a separate one would wait on this transaction's locks.
+    try:
+        with bind.begin_nested():
+            now = datetime.utcnow()
+            missing = []
+            for row in bind.execute(text(LATEST_STATE_SQL)).mappings():
+                values = dict(row)
+                raw_json = values.pop("raw_json")
+                values["trend"] = _trend(row["total_score"], row["previous_total_score"]) if row["risk_ts"] else None
+                values["market_outlook"] = _market_outlook(raw_json)
+                values["updated_at"] = now
+                missing.append(values)
+            if missing:
+                bind.execute(text(INSERT_LATEST_SQL), missing)
+        if missing:
+            print(f"✓ Backfilled latest state for {len(missing)} symbol(s)")
+    except Exception as e:
+        print(f"Note backfilling symbollatest: {e}")
+
+    # 13. Per-article sentiment columns on newsarticle (scored lazily by the historical backfill)
+    _step(bind, "adding newsarticle sentiment columns", [
+        "ALTER TABLE newsarticle ADD COLUMN IF NOT EXISTS sentiment DOUBLE PRECISION",
+        "ALTER TABLE newsarticle ADD COLUMN IF NOT EXISTS themes_json VARCHAR",
+    ])
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # The steps bring Postgres databases from before the migration history up to the baseline; a
+    # database on any other backend was created by the 002 baseline and already has all of it
+    if bind.dialect.name == 'postgresql':
+        run_init_db_steps(bind)
+
+
+def downgrade() -> None:
+    # The steps only bring older databases up to the baseline schema; nothing to undo
+    pass
@@ -0,0 +1,102 @@
+"""store each news story once and link it to symbols
+
+Revision ID: 006
+Revises: 005
+Create Date: 2024-07-01 00:00:00.000000
+
+"""
+import hashlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+# URL normalization as of this revision (news_service may change; the hashes backfilled here must not)
+TRACKING_PARAMS = {"oc", "ved", "usg", "fbclid", "gclid", "cmpid", "ref"}
+
+
+def url_hash(url: str) -> str:
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith("utm_")
+    )
+    path = parts.path.rstrip("/") or "/"
+    normalized = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    missing = bind.execute(text("SELECT id, url FROM newsarticle WHERE url_hash IS NULL")).fetchall()
+    if missing:
+        bind.execute(
+            text("UPDATE newsarticle SET url_hash = :url_hash WHERE id = :id"),
+            [{"id": row.id, "url_hash": url_hash(row.url)} for row in missing]
+        )
+
+    op.create_table(
+        "newsarticlesymbol",
+        sa.Column("symbol", sa.String, primary_key=True),
+        sa.Column("article_id", sa.Integer, sa.ForeignKey("newsarticle.id"), primary_key=True),
+        sa.Column("published_at", sa.DateTime, nullable=False),
+    )
+    # The oldest row of each story is kept; every symbol that stored the story links to it
+    op.execute("""
+        WITH keepers AS (
+            SELECT symbol, min(id) OVER (PARTITION BY url_hash) AS article_id
+            FROM newsarticle
+        )
+        INSERT INTO newsarticlesymbol (symbol, article_id, published_at)
+        SELECT DISTINCT k.symbol, k.article_id, a.published_at
+        FROM keepers k
+        JOIN newsarticle a ON a.id = k.article_id
+    """)
+    op.execute("DELETE FROM newsarticle WHERE id NOT IN (SELECT article_id FROM newsarticlesymbol)")
+
+    # Drop the per-symbol indexes first: SQLite rebuilds the table below and would copy them
+    for name in ("ux_newsarticle_symbol_url_hash", "ix_newsarticle_symbol", "ix_newsarticle_url_hash"):
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    with op.batch_alter_table("newsarticle") as batch:
+        batch.drop_column("symbol")
+        batch.alter_column("url_hash", existing_type=sa.String, nullable=False)
+    op.create_index("ux_newsarticle_url_hash", "newsarticle", ["url_hash"], unique=True)
+    op.create_index("ix_newsarticlesymbol_article_id", "newsarticlesymbol", ["article_id"])
+    op.create_index(
+        "ix_newsarticlesymbol_symbol_published_at", "newsarticlesymbol", ["symbol", "published_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ux_newsarticle_url_hash", table_name="newsarticle")
+    with op.batch_alter_table("newsarticle") as batch:
+        batch.add_column(sa.Column("symbol", sa.String, nullable=True))
+        batch.alter_column("url_hash", existing_type=sa.String, nullable=True)
+
+    # Each story goes back to one row per linked symbol; stories without links are dropped
+    op.execute("""
+        UPDATE newsarticle SET symbol = (
+            SELECT min(l.symbol) FROM newsarticlesymbol l WHERE l.article_id = newsarticle.id
+        )
+    """)
+    op.execute("""
+        INSERT INTO newsarticle (symbol, title, url, url_hash, published_at, source, sentiment, themes_json)
+        SELECT l.symbol, a.title, a.url, a.url_hash, a.published_at, a.source, a.sentiment, a.themes_json
+        FROM newsarticlesymbol l
+        JOIN newsarticle a ON a.id = l.article_id
+        WHERE l.symbol <> a.symbol
+    """)
+    op.drop_table("newsarticlesymbol")
+    op.execute("DELETE FROM newsarticle WHERE symbol IS NULL")
+
+    with op.batch_alter_table("newsarticle") as batch:
+        batch.alter_column("symbol", existing_type=sa.String, nullable=False)
+    op.create_index("ux_newsarticle_symbol_url_hash", "newsarticle", ["symbol", "url_hash"], unique=True)
+    op.create_index("ix_newsarticle_symbol", "newsarticle", ["symbol"])
+    op.create_index("ix_newsarticle_url_hash", "newsarticle", ["url_hash"])
@@ -0,0 +1,33 @@
+"""timestamps of the open and close on snapshotdailyrollup
+
+Revision ID: 007
+Revises: 006
+Create Date: 2024-07-15 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("snapshotdailyrollup") as batch:
+        batch.add_column(sa.Column("open_ts", sa.DateTime, nullable=True))
+        batch.add_column(sa.Column("close_ts", sa.DateTime, nullable=True))
+    # Existing rollups don't record when their open/close were sampled. Start of day keeps their
+    # open and lets the next pass that covers the day replace their close, as compaction used to
+    op.execute("UPDATE snapshotdailyrollup SET open_ts = day, close_ts = day")
+    with op.batch_alter_table("snapshotdailyrollup") as batch:
+        batch.alter_column("open_ts", existing_type=sa.DateTime, nullable=False)
+        batch.alter_column("close_ts", existing_type=sa.DateTime, nullable=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("snapshotdailyrollup") as batch:
+        batch.drop_column("close_ts")
+        batch.drop_column("open_ts")
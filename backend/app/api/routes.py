@@ -1,21 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi.responses import JSONResponse
 from sqlmodel import Session, select, desc
 from typing import List, Optional
 from datetime import datetime, timedelta
-from app.core.database import get_session
-from app.core.auth import get_or_create_user, get_user_from_request
-from app.models.models import Ticker, MetricsSnapshot, RiskSnapshot, NewsArticle, AISnapshot, PricePoint, User
+from app.core.database import get_session, get_async_session, engine
+from app.core.auth import get_or_create_user_async, get_user_from_request
+from app.core.executor import run_blocking
+from app.core.pool_metrics import pool_stats
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.models import Ticker, RiskSnapshot, PricePoint, User, SymbolLatest
 from app.api.schemas import TickerCreate, DashboardRow, RiskDetail, MessageResponse, ChatRequest, ChatResponse, ChatMessage
-from app.services.market_data import refresh_ticker_market_data
-from app.services.news_service import refresh_ticker_news, get_recent_news
-from app.services.ai_service import AIService
+from app.services.market_data import refresh_ticker_market_data_async
+from app.services.news_service import refresh_ticker_news_async, get_recent_news, get_recent_news_async, recent_stories_statement
+from app.services.ai_service import ai_service, ai_usage_stats, store_ai_snapshot
 from app.services.risk_scoring import calculate_risk_score, get_trend
 from app.services.forecasting import generate_risk_forecast, store_forecast
 from app.services.recommendations import generate_smart_recommendations, format_recommendations_for_display
+from app.services.symbol_universe import get_symbol_universe
+from app.services.latest_state import get_latest, get_latest_many_async, get_latest_async
+from app.services.alphavantage_data import is_crypto_symbol, has_fresh_alphavantage_response
+from app.services.rate_limiter import alphavantage_keys
+from app.services.provider_cache import provider_cache
+from app.services.single_flight import single_flight
+from app.services.ai_cache import ai_result_cache
+from app.services.compaction import last_compaction_report
+from app.services.ingestion_jobs import ingestion_queue, QueueFull
+from app.services.response_cache import response_cache, watchlist_scope, NEWS_SCOPE, WATCHLISTS_SCOPE
+import asyncio
 import json
 
 router = APIRouter()
-ai_service = AIService()
 
 
 @router.get("/health")
@@ -23,16 +37,62 @@ async def health_check():
     return {"status": "healthy", "service": "risklattice"}
 
 
+@router.get("/metrics/provider-cache")
+async def provider_cache_metrics():
+    """Hit/miss counters and size of the on-disk provider response cache."""
+    return provider_cache.stats()
+
+
+@router.get("/metrics/response-cache")
+async def response_cache_metrics():
+    """Hit ratio, byte usage and invalidation counters of the in-process API response cache."""
+    return response_cache.stats()
+
+
+@router.get("/metrics/single-flight")
+async def single_flight_metrics():
+    """Leader / coalesced counts of the per-symbol refresh coalescing layer."""
+    return single_flight.stats()
+
+
+@router.get("/metrics/ai-usage")
+async def ai_usage_metrics():
+    """LLM request, symbol and token counters (batched analysis packs several symbols per request)."""
+    return ai_usage_stats()
+
+
+@router.get("/metrics/ai-cache")
+async def ai_cache_metrics():
+    """Hit ratio and size of the content-addressed AI analysis cache."""
+    return await run_blocking(ai_result_cache.stats)
+
+
+@router.get("/metrics/db-pool")
+async def db_pool_metrics():
+    """Per-engine pool usage: in-use/idle/overflow connections, checkout wait times and timeouts."""
+    return pool_stats()
+
+
+@router.get("/metrics/compaction")
+async def compaction_metrics():
+    """Rows and bytes reclaimed by the last snapshot compaction pass (null before the first run)."""
+    return last_compaction_report()
+
+
+@router.get("/metrics/rate-limits")
+async def rate_limit_metrics():
+    """Per-key Alpha Vantage token bucket, daily quota and cooldown state."""
+    return alphavantage_keys.stats()
+
+
 @router.get("/test/{symbol}")
 async def test_fetch(symbol: str):
     """Test endpoint to check if Alpha Vantage works."""
-    from app.core.config import settings
-    from app.services.alphavantage_data import fetch_price_data_alphavantage
+    from app.services.alphavantage_data import fetch_price_data_alphavantage_async
     
     try:
-        # Check if API key is set
-        api_key = settings.alphavantage_api_key
-        if not api_key:
+        # Check if any API key is configured
+        if not alphavantage_keys.keys:
             return {
                 "symbol": symbol,
                 "error": "ALPHAVANTAGE_API_KEY not set",
@@ -41,7 +101,7 @@ async def test_fetch(symbol: str):
             }
         
         # Try to fetch data
-        df = fetch_price_data_alphavantage(symbol, days=30)
+        df = await fetch_price_data_alphavantage_async(symbol, days=30)
         
         if df.empty:
             return {
@@ -63,30 +123,30 @@ async def test_fetch(symbol: str):
         return {
             "symbol": symbol,
             "error": str(e),
-            "api_key_configured": bool(settings.alphavantage_api_key),
+            "api_key_configured": bool(alphavantage_keys.keys),
             "test": "failed"
         }
 
 
 @router.get("/tickers", response_model=List[str])
 async def list_tickers(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     x_session_id: Optional[str] = Header(None, alias="X-Session-Id")
 ):
     """List all tickers in user's watchlist."""
     if not x_session_id:
         return []
     
-    user = get_or_create_user(session, x_session_id)
+    user = await get_or_create_user_async(session, x_session_id)
     statement = select(Ticker).where(Ticker.user_id == user.id)
-    tickers = session.exec(statement).all()
+    tickers = (await session.exec(statement)).all()
     return [t.symbol for t in tickers]
 
 
 @router.post("/tickers", response_model=MessageResponse)
 async def add_ticker(
     ticker: TickerCreate, 
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     x_session_id: Optional[str] = Header(None, alias="X-Session-Id")
 ):
     """Add a ticker to user's watchlist."""
@@ -96,18 +156,19 @@ async def add_ticker(
     symbol = ticker.symbol.upper().strip()
     
     # Get or create user
-    user = get_or_create_user(session, x_session_id)
+    user = await get_or_create_user_async(session, x_session_id)
     
     # Check if ticker already exists for this user
-    existing = session.exec(
+    existing = (await session.exec(
         select(Ticker).where(Ticker.symbol == symbol, Ticker.user_id == user.id)
-    ).first()
+    )).first()
     if existing:
         raise HTTPException(status_code=400, detail=f"Ticker {symbol} already in your watchlist")
     
     new_ticker = Ticker(symbol=symbol, user_id=user.id)
     session.add(new_ticker)
-    session.commit()
+    await session.commit()
+    response_cache.bump(watchlist_scope(x_session_id), WATCHLISTS_SCOPE)
     
     # Return immediately - processing happens via scheduler or manual refresh
     return MessageResponse(message=f"Ticker {symbol} added successfully. Click 'Refresh All' to load data.")
@@ -116,7 +177,7 @@ async def add_ticker(
 @router.delete("/tickers/{symbol}", response_model=MessageResponse)
 async def remove_ticker(
     symbol: str, 
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     x_session_id: Optional[str] = Header(None, alias="X-Session-Id")
 ):
     """Remove a ticker from user's watchlist."""
@@ -124,255 +185,121 @@ async def remove_ticker(
         raise HTTPException(status_code=401, detail="Session ID required")
     
     symbol = symbol.upper().strip()
-    user = get_or_create_user(session, x_session_id)
+    user = await get_or_create_user_async(session, x_session_id)
     
-    ticker = session.exec(
+    ticker = (await session.exec(
         select(Ticker).where(Ticker.symbol == symbol, Ticker.user_id == user.id)
-    ).first()
+    )).first()
     if not ticker:
         raise HTTPException(status_code=404, detail=f"Ticker {symbol} not found in your watchlist")
     
-    session.delete(ticker)
-    session.commit()
+    await session.delete(ticker)
+    await session.commit()
+    response_cache.bump(watchlist_scope(x_session_id), WATCHLISTS_SCOPE)
     return MessageResponse(message=f"Ticker {symbol} removed successfully")
 
 
 @router.get("/dashboard", response_model=List[DashboardRow])
 async def get_dashboard(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     x_session_id: Optional[str] = Header(None, alias="X-Session-Id")
 ):
     """Get dashboard summary for all tickers belonging to the current user."""
-    rows = []
+    cache_key = ("dashboard", x_session_id)
+    if x_session_id:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    versions = response_cache.versions([watchlist_scope(x_session_id)])
     
     # Get or create user from session
     if x_session_id:
-        user = get_or_create_user(session, x_session_id)
+        user = await get_or_create_user_async(session, x_session_id)
         # Only get tickers for this user
-        tickers = session.exec(select(Ticker).where(Ticker.user_id == user.id)).all()
+        tickers = (await session.exec(select(Ticker).where(Ticker.user_id == user.id))).all()
     else:
         # If no session ID, return empty (frontend should always send session ID)
         # But for backwards compatibility, return all tickers (legacy behavior)
-        tickers = session.exec(select(Ticker)).all()
+        tickers = (await session.exec(select(Ticker))).all()
+    
+    # One primary-key batch read of the SymbolLatest projection for the whole watchlist
+    symbols = [ticker.symbol for ticker in tickers]
+    versions.update(response_cache.versions(symbols))
+    latest_by_symbol = await get_latest_many_async(session, symbols)
     
     rows = []
     
     for ticker in tickers:
-        # Get latest metrics
-        metrics_stmt = select(MetricsSnapshot).where(
-            MetricsSnapshot.symbol == ticker.symbol
-        ).order_by(desc(MetricsSnapshot.ts)).limit(1)
-        latest_metrics = session.exec(metrics_stmt).first()
-        
-        # Get latest risk score
-        risk_stmt = select(RiskSnapshot).where(
-            RiskSnapshot.symbol == ticker.symbol
-        ).order_by(desc(RiskSnapshot.ts)).limit(1)
-        latest_risk = session.exec(risk_stmt).first()
+        # Symbols still processing have no row (or only some components filled in)
+        latest = latest_by_symbol.get(ticker.symbol) or SymbolLatest(symbol=ticker.symbol)
         
         # Always show ticker, even if still processing
-        # Get trend
-        risk_stmt2 = select(RiskSnapshot).where(
-            RiskSnapshot.symbol == ticker.symbol
-        ).order_by(desc(RiskSnapshot.ts)).limit(2)
-        risk_snapshots = list(session.exec(risk_stmt2))
-        
-        trend = "new"
-        if len(risk_snapshots) >= 2:
-            diff = risk_snapshots[0].total_score - risk_snapshots[1].total_score
-            if diff > 5:
-                trend = "up"
-            elif diff < -5:
-                trend = "down"
-            else:
-                trend = "flat"
-        elif len(risk_snapshots) == 1:
-            trend = "new"
-        
         rows.append(DashboardRow(
             ticker=ticker.symbol,
-            price=latest_metrics.price if latest_metrics else 0.0,
-            return_7d=latest_metrics.return_7d if latest_metrics else 0.0,
-            volatility=latest_metrics.vol_ann if latest_metrics else 0.0,
-            max_drawdown=latest_metrics.max_drawdown if latest_metrics else 0.0,
-            risk_score=latest_risk.total_score if latest_risk else 0.0,
-            trend=trend,
-            last_updated=latest_risk.ts if latest_risk else (latest_metrics.ts if latest_metrics else datetime.utcnow())
+            price=latest.price or 0.0,
+            return_7d=latest.return_7d or 0.0,
+            volatility=latest.vol_ann or 0.0,
+            max_drawdown=latest.max_drawdown or 0.0,
+            risk_score=latest.total_score or 0.0,
+            trend=latest.trend or "new",
+            last_updated=latest.risk_ts or latest.metrics_ts or datetime.utcnow()
         ))
     
+    if x_session_id:
+        response_cache.set(cache_key, rows, versions)
     return rows
 
 
-@router.get("/risk/{symbol}", response_model=RiskDetail)
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Status and progress of a background ingestion job."""
+    job = ingestion_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+
+@router.get("/risk/{symbol}", response_model=RiskDetail, responses={202: {"description": "Symbol is being ingested; poll status_url"}})
 async def get_risk_detail(
     symbol: str, 
     period: str = "90d", 
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     x_session_id: Optional[str] = Header(None, alias="X-Session-Id")
 ):
     """Get detailed risk analysis for a ticker. Fetches data if needed but does NOT add to watchlist."""
     symbol = symbol.upper().strip()
     
+    # Unchanged since the last request for this symbol/period: serve the encoded response
+    cache_key = ("risk", symbol, period)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    versions = response_cache.versions([symbol])
+    
     # Check if ticker exists in watchlist for this user (optional - doesn't block if not found)
     ticker = None
     if x_session_id:
-        user = get_or_create_user(session, x_session_id)
-        ticker = session.exec(
+        user = await get_or_create_user_async(session, x_session_id)
+        ticker = (await session.exec(
             select(Ticker).where(Ticker.symbol == symbol, Ticker.user_id == user.id)
-        ).first()
-    
-    # Check if we have data, if not fetch it
-    metrics_stmt = select(MetricsSnapshot).where(
-        MetricsSnapshot.symbol == symbol
-    ).order_by(desc(MetricsSnapshot.ts)).limit(1)
-    latest_metrics = session.exec(metrics_stmt).first()
-    
-    # Also check if we have risk scores and AI analysis
-    risk_check_stmt = select(RiskSnapshot).where(
-        RiskSnapshot.symbol == symbol
-    ).order_by(desc(RiskSnapshot.ts)).limit(1)
-    existing_risk = session.exec(risk_check_stmt).first()
-    
-    ai_check_stmt = select(AISnapshot).where(
-        AISnapshot.symbol == symbol
-    ).order_by(desc(AISnapshot.ts)).limit(1)
-    existing_ai = session.exec(ai_check_stmt).first()
-    
-    # Fetch data if we're missing metrics, risk scores, or AI analysis
-    if not latest_metrics or not existing_risk or not existing_ai:
-        # No data available, trigger a refresh
-        try:
-            print(f"\n{'='*60}")
-            print(f"AUTO-FETCHING DATA FOR {symbol} (not in watchlist or no data)")
-            print(f"{'='*60}")
-            
-            # Refresh market data
-            market_result = refresh_ticker_market_data(session, symbol)
-            if market_result.get("error"):
-                error_detail = market_result.get("error", "Unknown error")
-                print(f"✗ Market data fetch failed: {error_detail}")
-                raise HTTPException(status_code=404, detail=f"Could not fetch data for {symbol}: {error_detail}")
-            
-            # Commit market data
-            session.commit()
-            print(f"✓ Market data committed for {symbol}")
-            
-            # Refresh news (with better error handling)
-            news_result = None
-            try:
-                print(f"\n{'='*60}")
-                print(f"FETCHING NEWS FOR {symbol}")
-                print(f"{'='*60}")
-                news_result = refresh_ticker_news(session, symbol)
-                session.commit()  # Make sure news is committed
-                if news_result.get("error"):
-                    print(f"⚠ News fetch returned error for {symbol}: {news_result['error']}")
-                else:
-                    count = news_result.get('count', 0)
-                    print(f"✓ News fetched for {symbol}: {count} articles")
-                    
-                    # Verify news was stored
-                    stored_news = get_recent_news(session, symbol, limit=5)
-                    print(f"✓ Verified: {len(stored_news)} news articles stored in database for {symbol}")
-                print(f"{'='*60}\n")
-            except Exception as e:
-                print(f"⚠ News refresh exception for {symbol}: {e}")
-                import traceback
-                traceback.print_exc()
-            
-            # Process AI and risk scoring (this will work even with no news, using market data)
-            print(f"\n{'='*60}")
-            print(f"PROCESSING AI AND RISK SCORING FOR {symbol}")
-            print(f"{'='*60}")
-            await process_ticker(session, symbol)
-            session.commit()  # Ensure all data is committed
-            
-            # Verify AI snapshot was created
-            ai_check = select(AISnapshot).where(
-                AISnapshot.symbol == symbol
-            ).order_by(desc(AISnapshot.ts)).limit(1)
-            ai_created = session.exec(ai_check).first()
-            if ai_created:
-                print(f"✓ AI analysis created: {ai_created.summary[:100]}...")
-            else:
-                print(f"⚠ WARNING: No AI snapshot found for {symbol} after processing!")
-            
-            # Verify risk snapshot was created
-            risk_check = select(RiskSnapshot).where(
-                RiskSnapshot.symbol == symbol
-            ).order_by(desc(RiskSnapshot.ts)).limit(1)
-            risk_created = session.exec(risk_check).first()
-            if risk_created:
-                print(f"✓ Risk score created: {risk_created.total_score}")
-            else:
-                print(f"⚠ WARNING: No risk snapshot found for {symbol} after processing!")
-            
-            print(f"{'='*60}\n")
-            
-            # Generate historical risk scores (90 days of history)
-            try:
-                from app.services.historical_risk import generate_historical_risk_scores
-                generate_historical_risk_scores(session, symbol, days=90)
-            except Exception as e:
-                print(f"⚠ Error generating historical risk scores for {symbol}: {e}")
-                # Don't fail the request if historical generation fails
-            
-            # Re-fetch metrics after processing
-            session.commit()  # Ensure all commits are done
-            metrics_stmt = select(MetricsSnapshot).where(
-                MetricsSnapshot.symbol == symbol
-            ).order_by(desc(MetricsSnapshot.ts)).limit(1)
-            latest_metrics = session.exec(metrics_stmt).first()
-            
-            if not latest_metrics:
-                print(f"⚠ WARNING: Metrics still not found after refresh for {symbol}")
-                raise HTTPException(status_code=404, detail=f"Could not fetch metrics for {symbol} after refresh. Please try again.")
-            
-            print(f"✓ Successfully fetched and processed data for {symbol}")
-            print(f"{'='*60}\n")
-        except HTTPException:
-            # Re-raise HTTP exceptions as-is
-            raise
-        except Exception as e:
-            error_msg = str(e)
-            print(f"✗ Error auto-fetching data for {symbol}: {error_msg}")
-            import traceback
-            traceback.print_exc()
-            raise HTTPException(status_code=500, detail=f"Error fetching data for {symbol}: {error_msg}")
-    
-    # Final check - ensure we have metrics
-    if not latest_metrics:
-        raise HTTPException(status_code=404, detail=f"No metrics available for {symbol}. The stock may not exist or data is still loading.")
+        )).first()
     
-    # Get latest risk score
-    risk_stmt = select(RiskSnapshot).where(
-        RiskSnapshot.symbol == symbol
-    ).order_by(desc(RiskSnapshot.ts)).limit(1)
-    latest_risk = session.exec(risk_stmt).first()
+    # Check if we have data (metrics, risk score and AI analysis), if not fetch it
+    latest = await get_latest_async(session, symbol)
     
-    if not latest_risk:
-        # If no risk score, try to process the ticker (shouldn't happen after auto-fetch, but just in case)
+    # Missing metrics, risk scores, or AI analysis: hand the ingestion to the background
+    # workers and answer right away with the job to poll
+    if not latest or latest.metrics_ts is None or latest.risk_ts is None or latest.ai_ts is None:
+        failed = ingestion_queue.recent_failure(symbol)
+        if failed:
+            raise HTTPException(status_code=404, detail=f"Could not fetch data for {symbol}: {failed.error}")
         try:
-            print(f"⚠ No risk score found for {symbol} after auto-fetch, processing...")
-            await process_ticker(session, symbol)
-            session.commit()
-            risk_stmt = select(RiskSnapshot).where(
-                RiskSnapshot.symbol == symbol
-            ).order_by(desc(RiskSnapshot.ts)).limit(1)
-            latest_risk = session.exec(risk_stmt).first()
-        except Exception as e:
-            print(f"Error processing risk score for {symbol}: {e}")
-            import traceback
-            traceback.print_exc()
-    
-    if not latest_risk:
-        raise HTTPException(status_code=404, detail=f"No risk score available for {symbol}. Risk analysis may still be processing. Please try again in a few seconds.")
-    
-    # Get latest AI snapshot
-    ai_stmt = select(AISnapshot).where(
-        AISnapshot.symbol == symbol
-    ).order_by(desc(AISnapshot.ts)).limit(1)
-    latest_ai = session.exec(ai_stmt).first()
+            job, created = ingestion_queue.submit(symbol)
+        except QueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+        if created:
+            print(f"Queued ingestion job {job.id} for {symbol} (not in watchlist or no data)")
+        return JSONResponse(status_code=202, content={"status": "processing", **job.to_dict()})
     
     # Get price history based on period parameter
     period_days_map = {
@@ -389,7 +316,7 @@ async def get_risk_detail(
         PricePoint.symbol == symbol,
         PricePoint.date >= cutoff
     ).order_by(PricePoint.date)
-    price_points = session.exec(price_stmt).all()
+    price_points = (await session.exec(price_stmt)).all()
     
     price_history = [
         {
@@ -406,7 +333,7 @@ async def get_risk_detail(
         RiskSnapshot.symbol == symbol,
         RiskSnapshot.ts >= cutoff_risk
     ).order_by(RiskSnapshot.ts).limit(90)
-    risk_history_points = session.exec(risk_history_stmt).all()
+    risk_history_points = (await session.exec(risk_history_stmt)).all()
     
     risk_history = [
         {
@@ -419,7 +346,7 @@ async def get_risk_detail(
     ]
     
     # Get recent news
-    news_articles = get_recent_news(session, symbol, limit=10)
+    news_articles = await get_recent_news_async(session, symbol, limit=10)
     recent_news = [
         {
             "title": article.title,
@@ -430,86 +357,65 @@ async def get_risk_detail(
         for article in news_articles
     ]
     
-    reasons = json.loads(latest_risk.reasons_json) if latest_risk.reasons_json else []
-    themes = json.loads(latest_ai.themes_json) if latest_ai and latest_ai.themes_json else []
-    ai_summary = latest_ai.summary if latest_ai else "No AI analysis available."
-    
-    # Get market outlook from AI result (parse from raw_json if available)
-    market_outlook = None
-    if latest_ai and latest_ai.raw_json:
-        try:
-            ai_data = json.loads(latest_ai.raw_json)
-            market_outlook = ai_data.get("market_outlook", "NEUTRAL")
-        except:
-            pass
+    reasons = json.loads(latest.reasons_json) if latest.reasons_json else []
+    themes = json.loads(latest.themes_json) if latest.themes_json else []
+    ai_summary = latest.summary if latest.ai_ts is not None else "No AI analysis available."
     
-    # Get trend
-    risk_stmt2 = select(RiskSnapshot).where(
-        RiskSnapshot.symbol == symbol
-    ).order_by(desc(RiskSnapshot.ts)).limit(2)
-    risk_snapshots = list(session.exec(risk_stmt2))
-    
-    trend = "new"
-    if len(risk_snapshots) >= 2:
-        diff = risk_snapshots[0].total_score - risk_snapshots[1].total_score
-        if diff > 5:
-            trend = "up"
-        elif diff < -5:
-            trend = "down"
-        else:
-            trend = "flat"
-    
-    return RiskDetail(
+    detail = RiskDetail(
         symbol=symbol,
-        current_price=latest_metrics.price,
-        market_score=latest_risk.market_score,
-        news_score=latest_risk.news_score,
-        total_score=latest_risk.total_score,
-        trend=trend,
+        current_price=latest.price,
+        market_score=latest.market_score,
+        news_score=latest.news_score,
+        total_score=latest.total_score,
+        trend=latest.trend or "new",
         reasons=reasons,
         ai_summary=ai_summary,
         themes=themes,
-        market_outlook=market_outlook,
+        market_outlook=latest.market_outlook,
         metrics={
-            "return_7d": latest_metrics.return_7d,
-            "volatility": latest_metrics.vol_ann,
-            "max_drawdown": latest_metrics.max_drawdown
+            "return_7d": latest.return_7d,
+            "volatility": latest.vol_ann,
+            "max_drawdown": latest.max_drawdown
         },
         price_history=price_history,
         risk_history=risk_history,
         recent_news=recent_news
     )
+    return response_cache.set(cache_key, detail, versions)
+
+
+def find_watched_ticker(session: Session, symbol: str) -> Optional[Ticker]:
+    """Any watchlist entry for `symbol` (Ticker's primary key is its id, not the symbol)."""
+    return session.exec(select(Ticker).where(Ticker.symbol == symbol)).first()
 
 
 @router.post("/refresh", response_model=MessageResponse)
 async def refresh_all(session: Session = Depends(get_session)):
-    """Refresh all tickers."""
-    import time
-    tickers = session.exec(select(Ticker)).all()
+    """Refresh every watched symbol once, however many users watch it."""
+    universe = await run_blocking(get_symbol_universe, session)
+    await run_blocking(session.commit)  # Don't hold a pooled connection while waiting for Alpha Vantage keys
     
-    if not tickers:
+    if not universe:
         return MessageResponse(message="No tickers in watchlist")
     
+    symbols = list(universe)
     print(f"\n{'='*60}")
-    print(f"REFRESH ALL: Processing {len(tickers)} ticker(s)")
+    print(f"REFRESH ALL: Processing {len(symbols)} symbol(s) for {sum(universe.values())} subscription(s)")
     print(f"{'='*60}")
     
     count = 0
     errors = []
     
-    for idx, ticker in enumerate(tickers):
+    for idx, symbol in enumerate(symbols):
         try:
-            # Add delay between tickers to avoid rate limiting (except first one)
-            if idx > 0:
-                delay = 5  # 5 second delay between tickers
-                print(f"\nWaiting {delay}s before next ticker (to avoid rate limits)...")
-                time.sleep(delay)
+            print(f"\n[{idx+1}/{len(symbols)}] Processing {symbol}...")
             
-            symbol = ticker.symbol
-            print(f"\n[{idx+1}/{len(tickers)}] Processing {symbol}...")
+            # Wait for a free Alpha Vantage key instead of sleeping between tickers
+            needs_key = not is_crypto_symbol(symbol) and not has_fresh_alphavantage_response(symbol)
+            api_key = await alphavantage_keys.acquire() if needs_key else None
             
             # Refresh market data
-            market_result = refresh_ticker_market_data(session, symbol)
+            market_result = await refresh_ticker_market_data_async(session, symbol, api_key=api_key)
             if market_result.get("error"):
                 error_msg = market_result['error']
                 errors.append(f"{symbol}: {error_msg}")
@@ -518,7 +424,7 @@ async def refresh_all(session: Session = Depends(get_session)):
             
             # Refresh news (non-blocking if it fails)
             try:
-                refresh_ticker_news(session, symbol)
+                await refresh_ticker_news_async(session, symbol)
             except Exception as e:
                 print(f"⚠ News refresh failed for {symbol} (non-critical): {e}")
             
@@ -530,11 +436,11 @@ async def refresh_all(session: Session = Depends(get_session)):
             
         except Exception as e:
             error_msg = str(e)
-            errors.append(f"{ticker.symbol}: {error_msg}")
-            print(f"✗ Error refreshing {ticker.symbol}: {error_msg}")
+            errors.append(f"{symbol}: {error_msg}")
+            print(f"✗ Error refreshing {symbol}: {error_msg}")
     
     print(f"\n{'='*60}")
-    print(f"REFRESH COMPLETE: {count}/{len(tickers)} tickers refreshed successfully")
+    print(f"REFRESH COMPLETE: {count}/{len(symbols)} symbols refreshed successfully")
     if errors:
         print(f"Errors: {len(errors)}")
         for err in errors[:5]:  # Show first 5 errors
@@ -552,14 +458,14 @@ async def refresh_symbol(symbol: str, session: Session = Depends(get_session)):
     """Refresh a specific ticker."""
     symbol = symbol.upper().strip()
     
-    ticker = session.get(Ticker, symbol)
+    ticker = await run_blocking(find_watched_ticker, session, symbol)
     if not ticker:
         raise HTTPException(status_code=404, detail=f"Ticker {symbol} not found")
     
     try:
         print(f"Starting refresh for {symbol}...")
         # Refresh market data
-        market_result = refresh_ticker_market_data(session, symbol)
+        market_result = await refresh_ticker_market_data_async(session, symbol)
         if market_result.get("error"):
             error_msg = market_result['error']
             print(f"Market data error for {symbol}: {error_msg}")
@@ -569,7 +475,7 @@ async def refresh_symbol(symbol: str, session: Session = Depends(get_session)):
         
         # Refresh news (non-blocking if it fails)
         try:
-            refresh_ticker_news(session, symbol)
+            await refresh_ticker_news_async(session, symbol)
         except Exception as e:
             print(f"News refresh error for {symbol} (non-critical): {e}")
         
@@ -591,34 +497,32 @@ async def get_forecast(symbol: str, days: int = 7, session: Session = Depends(ge
     symbol = symbol.upper().strip()
     
     # Verify ticker exists
-    ticker = session.get(Ticker, symbol)
+    ticker = await run_blocking(find_watched_ticker, session, symbol)
     if not ticker:
         raise HTTPException(status_code=404, detail=f"Ticker {symbol} not found")
     
     # Get latest risk score
-    risk_stmt = select(RiskSnapshot).where(
-        RiskSnapshot.symbol == symbol
-    ).order_by(desc(RiskSnapshot.ts)).limit(1)
-    latest_risk = session.exec(risk_stmt).first()
+    latest = await run_blocking(get_latest, session, symbol)
     
-    if not latest_risk:
+    if not latest or latest.risk_ts is None:
         raise HTTPException(status_code=404, detail=f"No risk score available for {symbol}")
     
-    current_score = latest_risk.total_score
+    current_score = latest.total_score
     
     # Generate forecast
     try:
-        forecast = generate_risk_forecast(session, symbol, current_score, days_ahead=days)
+        # Sync DB queries and numpy trend fitting; keep them off the event loop
+        forecast = await run_blocking(generate_risk_forecast, session, symbol, current_score, days_ahead=days)
         
         # Store forecast
-        store_forecast(session, symbol, forecast)
+        await run_blocking(store_forecast, session, symbol, forecast)
         
         # Get user tolerance (default to moderate)
         user_tolerance = ticker.risk_tolerance or "moderate"
         
         # Generate recommendations
-        recommendations = generate_smart_recommendations(
-            session, symbol, forecast, user_tolerance
+        recommendations = await run_blocking(
+            generate_smart_recommendations, session, symbol, forecast, user_tolerance
         )
         formatted_recs = format_recommendations_for_display(recommendations)
         
@@ -635,16 +539,15 @@ async def get_forecast(symbol: str, days: int = 7, session: Session = Depends(ge
 async def process_ticker(session: Session, symbol: str):
     """Process a ticker: get metrics, news, run AI, calculate risk."""
     # Get latest metrics
-    metrics_stmt = select(MetricsSnapshot).where(
-        MetricsSnapshot.symbol == symbol
-    ).order_by(desc(MetricsSnapshot.ts)).limit(1)
-    latest_metrics = session.exec(metrics_stmt).first()
+    latest_metrics = await run_blocking(get_latest, session, symbol)
     
-    if not latest_metrics:
+    if not latest_metrics or latest_metrics.metrics_ts is None:
         return
     
     # Get recent news
-    news_articles = get_recent_news(session, symbol, limit=15)
+    news_articles = await run_blocking(get_recent_news, session, symbol, limit=15)
+    # End the read transaction so no pooled connection is held during the LLM call
+    await run_blocking(session.commit)
     
     # Prepare market data for AI analysis
     market_data = {
@@ -655,118 +558,109 @@ async def process_ticker(session: Session, symbol: str):
     }
     
     # Run AI analysis with market context
-    ai_result = ai_service.analyze_news(news_articles, market_data)
+    ai_result = await ai_service.analyze_news_async(news_articles, market_data, symbol=symbol)
     
     # Store AI snapshot
-    ai_snapshot = AISnapshot(
-        symbol=symbol,
-        sentiment=ai_result["sentiment"],
-        themes_json=json.dumps(ai_result["themes"]),
-        summary=ai_result["summary"],
-        raw_json=ai_result["raw_json"]
-    )
-    session.add(ai_snapshot)
-    session.commit()
+    await run_blocking(store_ai_snapshot, session, symbol, ai_result)
     
     # Calculate risk score
-    metrics_dict = {
-        "price": latest_metrics.price,
-        "return_7d": latest_metrics.return_7d,
-        "vol_ann": latest_metrics.vol_ann,
-        "max_drawdown": latest_metrics.max_drawdown
-    }
-    calculate_risk_score(session, symbol, metrics_dict, ai_result)
+    await run_blocking(calculate_risk_score, session, symbol, market_data, ai_result)
     
     # Generate historical risk scores (90 days) - automatic for all stocks
     try:
         from app.services.historical_risk import generate_historical_risk_scores
-        generate_historical_risk_scores(session, symbol, days=90)
+        await run_blocking(generate_historical_risk_scores, session, symbol, days=90)
     except Exception as e:
         # Don't fail if historical generation fails - it's non-critical
         print(f"⚠ Historical risk generation failed for {symbol} (non-critical): {e}")
 
 
 @router.get("/market/overview")
-async def get_market_overview(session: Session = Depends(get_session)):
+async def get_market_overview(session: AsyncSession = Depends(get_async_session)):
     """Get market overview for major stocks (for home page)."""
     major_symbols = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'META', 'NVDA', 'JPM', 'V', 'JNJ']
+    cached = response_cache.get(("market_overview",))
+    if cached is not None:
+        return cached
+    versions = response_cache.versions([WATCHLISTS_SCOPE, *major_symbols])
     stocks = []
     
+    # Only symbols that are in someone's watchlist (skip the rest)
+    watched = set((await session.exec(
+        select(Ticker.symbol).where(Ticker.symbol.in_(major_symbols)).distinct()
+    )).all())
+    latest_by_symbol = await get_latest_many_async(session, [symbol for symbol in major_symbols if symbol in watched])
+    
     for symbol in major_symbols:
-        # Check if ticker exists in watchlist
-        ticker = session.get(Ticker, symbol)
-        if not ticker:
-            # Ticker not in watchlist, skip or return placeholder
-            continue
-        
-        # Get latest metrics
-        metrics_stmt = select(MetricsSnapshot).where(
-            MetricsSnapshot.symbol == symbol
-        ).order_by(desc(MetricsSnapshot.ts)).limit(1)
-        latest_metrics = session.exec(metrics_stmt).first()
-        
-        if latest_metrics:
+        latest = latest_by_symbol.get(symbol)
+        if latest and latest.metrics_ts is not None:
             stocks.append({
                 "symbol": symbol,
-                "price": latest_metrics.price,
-                "changePercent": latest_metrics.return_7d,
+                "price": latest.price,
+                "changePercent": latest.return_7d,
                 "volume": 0  # Volume not stored in metrics snapshot
             })
     
-    return {"stocks": stocks}
+    return response_cache.set(("market_overview",), {"stocks": stocks}, versions)
 
 
 @router.get("/market/news")
-async def get_market_news(session: Session = Depends(get_session), limit: int = 30):
+async def get_market_news(session: AsyncSession = Depends(get_async_session), limit: int = 30):
     """Get recent market news from all tickers."""
+    cache_key = ("market_news", limit)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    versions = response_cache.versions([NEWS_SCOPE])
+    
     # Get news from last 7 days (not just 1 day)
     cutoff = datetime.now() - timedelta(days=7)
-    statement = select(NewsArticle).where(
-        NewsArticle.published_at >= cutoff
-    ).order_by(NewsArticle.published_at.desc()).limit(limit)
+    statement = recent_stories_statement(cutoff, limit)
     
-    articles = session.exec(statement).all()
+    articles = (await session.exec(statement)).all()
     
     # If we don't have enough articles, try to fetch fresh news for major stocks
     if len(articles) < 10:
+        await session.commit()  # Don't hold a pooled connection during the news fetches
         # Fetch fresh news for some major stocks to populate
         major_symbols = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'META', 'NVDA']
-        from app.services.news_service import fetch_google_news_rss, store_news_articles
+        async def backfill(symbol: str):
+            # Own session per symbol; joins any refresh of the symbol already in flight
+            with Session(engine) as backfill_session:
+                return await refresh_ticker_news_async(backfill_session, symbol)
         
-        for symbol in major_symbols[:3]:  # Just fetch for first 3 to avoid delays
-            try:
-                articles_list = fetch_google_news_rss(symbol, days=1)
-                store_news_articles(session, symbol, articles_list)
-            except:
-                continue
+        backfill_symbols = major_symbols[:3]  # Just fetch for first 3 to avoid delays
+        await asyncio.gather(*[backfill(symbol) for symbol in backfill_symbols], return_exceptions=True)
         
         # Re-query after fetching
-        articles = session.exec(statement).all()
+        articles = (await session.exec(statement)).all()
     
-    return [
+    return response_cache.set(cache_key, [
         {
             "title": article.title,
             "source": article.source,
             "url": article.url,
             "published_at": article.published_at.isoformat(),
-            "symbol": article.symbol
+            "symbol": symbol
         }
-        for article in articles
-    ]
+        for article, symbol in articles
+    ], versions)
 
 
 @router.get("/market/quote/{symbol}")
-async def get_stock_quote(symbol: str, session: Session = Depends(get_session)):
+async def get_stock_quote(symbol: str, session: AsyncSession = Depends(get_async_session)):
     """Get current stock quote - uses cached data from database."""
     from app.models.models import PricePoint
     
     symbol = symbol.upper().strip()
+    cache_key = ("quote", symbol)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    versions = response_cache.versions([symbol])
     
     # First check cached data from database
-    metrics_stmt = select(MetricsSnapshot).where(
-        MetricsSnapshot.symbol == symbol
-    ).order_by(desc(MetricsSnapshot.ts)).limit(1)
-    latest_metrics = session.exec(metrics_stmt).first()
+    latest_metrics = await get_latest_async(session, symbol)
     
     # Calculate daily return from recent price points
     daily_change_percent = 0.0
@@ -775,7 +669,7 @@ async def get_stock_quote(symbol: str, session: Session = Depends(get_session)):
         price_points_stmt = select(PricePoint).where(
             PricePoint.symbol == symbol
         ).order_by(desc(PricePoint.date)).limit(2)
-        price_points = session.exec(price_points_stmt).all()
+        price_points = (await session.exec(price_points_stmt)).all()
         
         if len(price_points) >= 2:
             current_price = float(price_points[0].close)
@@ -783,12 +677,12 @@ async def get_stock_quote(symbol: str, session: Session = Depends(get_session)):
             if previous_price > 0:
                 daily_change_percent = ((current_price - previous_price) / previous_price) * 100
         
-        return {
+        return response_cache.set(cache_key, {
             "symbol": symbol,
             "price": latest_metrics.price,
             "changePercent": daily_change_percent,  # Daily percentage change
-            "timestamp": latest_metrics.ts.isoformat()
-        }
+            "timestamp": latest_metrics.metrics_ts.isoformat()
+        }, versions)
     
     # No cached data available - return error
     # Note: To get data, add stock to watchlist and use "Refresh All" button
@@ -801,7 +695,7 @@ async def get_stock_quote(symbol: str, session: Session = Depends(get_session)):
 @router.post("/agent/chat", response_model=ChatResponse)
 async def chat_with_agent(
     request: ChatRequest, 
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     x_session_id: Optional[str] = Header(None, alias="X-Session-Id")
 ):
     """Chat with AI agent about financial and stock-related questions."""
@@ -814,35 +708,26 @@ async def chat_with_agent(
         # Get watchlist data with full metrics - filtered by user
         try:
             if x_session_id:
-                user = get_or_create_user(session, x_session_id)
+                user = await get_or_create_user_async(session, x_session_id)
                 statement = select(Ticker).where(Ticker.user_id == user.id)
             else:
                 # If no session ID, return empty watchlist
                 statement = select(Ticker).where(Ticker.id == -1)  # Return nothing
-            all_tickers = session.exec(statement).all()
+            all_tickers = (await session.exec(statement)).all()[:15]  # Limit to 15 for performance
+            latest_by_symbol = await get_latest_many_async(session, [ticker.symbol for ticker in all_tickers])
             
-            for ticker in all_tickers[:15]:  # Limit to 15 for performance
+            for ticker in all_tickers:
                 try:
-                    # Get latest metrics
-                    metrics_stmt = select(MetricsSnapshot).where(
-                        MetricsSnapshot.symbol == ticker.symbol
-                    ).order_by(desc(MetricsSnapshot.ts)).limit(1)
-                    latest_metrics = session.exec(metrics_stmt).first()
-                    
-                    # Get latest risk score
-                    risk_stmt = select(RiskSnapshot).where(
-                        RiskSnapshot.symbol == ticker.symbol
-                    ).order_by(desc(RiskSnapshot.ts)).limit(1)
-                    latest_risk = session.exec(risk_stmt).first()
+                    latest = latest_by_symbol.get(ticker.symbol)
                     
-                    if latest_metrics:
+                    if latest and latest.metrics_ts is not None:
                         watchlist_data.append({
                             "symbol": ticker.symbol,
-                            "price": latest_metrics.price,
-                            "return_7d": latest_metrics.return_7d,
-                            "risk_score": latest_risk.total_score if latest_risk else 0,
-                            "volatility": latest_metrics.vol_ann,
-                            "max_drawdown": latest_metrics.max_drawdown
+                            "price": latest.price,
+                            "return_7d": latest.return_7d,
+                            "risk_score": latest.total_score or 0,
+                            "volatility": latest.vol_ann,
+                            "max_drawdown": latest.max_drawdown
                         })
                 except Exception as e:
                     print(f"Error processing ticker {ticker.symbol}: {e}")
@@ -864,19 +749,16 @@ async def chat_with_agent(
         # Get recent news articles for context
         try:
             cutoff = datetime.now() - timedelta(days=7)
-            news_stmt = select(NewsArticle).where(
-                NewsArticle.published_at >= cutoff
-            ).order_by(desc(NewsArticle.published_at)).limit(20)
-            recent_news = session.exec(news_stmt).all()
+            recent_news = (await session.exec(recent_stories_statement(cutoff, 20))).all()
             
-            for article in recent_news:
+            for article, symbol in recent_news:
                 try:
                     news_data.append({
                         "title": article.title,
                         "source": article.source,
                         "url": article.url,
                         "published_at": article.published_at.isoformat() if article.published_at else None,
-                        "symbol": article.symbol
+                        "symbol": symbol
                     })
                 except Exception:
                     continue
@@ -887,7 +769,7 @@ async def chat_with_agent(
         try:
             from app.models.models import RiskForecast
             forecasts_stmt = select(RiskForecast).order_by(desc(RiskForecast.created_at)).limit(8)
-            forecasts = session.exec(forecasts_stmt).all()
+            forecasts = (await session.exec(forecasts_stmt)).all()
             
             for forecast in forecasts:
                 try:
@@ -904,6 +786,9 @@ async def chat_with_agent(
         
     except Exception as e:
         print(f"Error gathering context: {e}")
+    # End the read transaction (rolled back: it may have been aborted by a failed optional query)
+    # so no pooled connection is held during the LLM call
+    await session.rollback()
     
     context_data = {
         "watchlist": watchlist_data,
@@ -923,7 +808,7 @@ async def chat_with_agent(
     
     # Get AI response
     try:
-        ai_response = ai_service.chat(request.message, context_data, history)
+        ai_response = await run_blocking(ai_service.chat, request.message, context_data, history)
         if not ai_response or len(ai_response.strip()) == 0:
             ai_response = "I apologize, but I couldn't generate a response. Please try again."
     except Exception as e:
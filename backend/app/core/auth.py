@@ -1,5 +1,6 @@
 """Session management for anonymous users."""
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.models.models import User
 from typing import Optional
 
@@ -24,6 +25,18 @@ def get_or_create_user(session: Session, session_id: str) -> User:
     return user
 
 
+async def get_or_create_user_async(session: AsyncSession, session_id: str) -> User:
+    """get_or_create_user on an async session."""
+    user = (await session.exec(select(User).where(User.session_id == session_id))).first()
+    if not user:
+        user = User(session_id=session_id, is_guest=True)
+        session.add(user)
+        await session.commit()
+        await session.refresh(user)
+        print(f"Created new guest user with session_id: {session_id}")
+    return user
+
+
 def get_user_from_request(session: Session, session_id: Optional[str] = None) -> Optional[User]:
     """Get user from session_id. Returns None if session_id is not provided."""
     if not session_id:
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from typing import Optional
 import os
+import tempfile
 
 
 class Settings(BaseSettings):
@@ -9,9 +10,87 @@ class Settings(BaseSettings):
     alphavantage_api_key: Optional[str] = os.getenv("ALPHAVANTAGE_API_KEY")
     # Support multiple API keys (comma-separated) for more requests
     alphavantage_api_keys: str = os.getenv("ALPHAVANTAGE_API_KEYS", os.getenv("ALPHAVANTAGE_API_KEY", ""))
+    # Per-key Alpha Vantage limits (free tier: 5 calls/minute, 25 calls/day)
+    alphavantage_calls_per_minute: float = float(os.getenv("ALPHAVANTAGE_CALLS_PER_MINUTE", "5"))
+    alphavantage_daily_limit: int = int(os.getenv("ALPHAVANTAGE_DAILY_LIMIT", "25"))
+    alphavantage_cooldown_seconds: float = float(os.getenv("ALPHAVANTAGE_COOLDOWN_SECONDS", "60"))
+    # Incremental price refresh: fetch only the missing tail unless the last stored bar is older than this
+    price_incremental_max_gap_days: int = int(os.getenv("PRICE_INCREMENTAL_MAX_GAP_DAYS", "30"))
+    # Tickers per multi-symbol yfinance download request
+    yfinance_batch_size: int = int(os.getenv("YFINANCE_BATCH_SIZE", "50"))
+    # On-disk provider response cache (SQLite), shared by all workers on the host
+    provider_cache_enabled: bool = os.getenv("PROVIDER_CACHE_ENABLED", "true").lower() == "true"
+    provider_cache_path: str = os.getenv("PROVIDER_CACHE_PATH", os.path.join(tempfile.gettempdir(), "risklattice_provider_cache.sqlite3"))
+    provider_cache_max_bytes: int = int(os.getenv("PROVIDER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    provider_cache_ttl_alphavantage_seconds: float = float(os.getenv("PROVIDER_CACHE_TTL_ALPHAVANTAGE_SECONDS", "900"))
+    provider_cache_ttl_news_seconds: float = float(os.getenv("PROVIDER_CACHE_TTL_NEWS_SECONDS", "600"))
+    # Async news fetcher: pooled connections and a global per-host concurrency cap
+    news_max_connections: int = int(os.getenv("NEWS_MAX_CONNECTIONS", "20"))
+    news_per_host_concurrency: int = int(os.getenv("NEWS_PER_HOST_CONCURRENCY", "8"))
+    # In-process API response cache (per worker), invalidated by per-symbol version bumps on write
+    response_cache_enabled: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    response_cache_max_bytes: int = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    response_cache_ttl_seconds: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+    # Historical backfill: news scores come from per-article sentiment (no per-day AI calls);
+    # optionally run the full LLM analysis for the most recent backfilled day only
+    backfill_news_series: bool = os.getenv("BACKFILL_NEWS_SERIES", "true").lower() == "true"
+    backfill_llm_latest_day: bool = os.getenv("BACKFILL_LLM_LATEST_DAY", "true").lower() == "true"
+    # First-view ingestion jobs (GET /risk/{symbol} on a symbol with no data)
+    ingestion_workers: int = int(os.getenv("INGESTION_WORKERS", "2"))
+    ingestion_queue_size: int = int(os.getenv("INGESTION_QUEUE_SIZE", "64"))
+    ingestion_job_timeout_seconds: float = float(os.getenv("INGESTION_JOB_TIMEOUT_SECONDS", "300"))
+    ingestion_job_retention_seconds: float = float(os.getenv("INGESTION_JOB_RETENTION_SECONDS", "900"))
+    ingestion_failure_cooldown_seconds: float = float(os.getenv("INGESTION_FAILURE_COOLDOWN_SECONDS", "60"))
+    # Refresh coalescing: "local" (per process) or "advisory" (also across processes via Postgres advisory locks)
+    single_flight_mode: str = os.getenv("SINGLE_FLIGHT_MODE", "local").lower()
+    # How long a caller waits for another process's (advisory) or another thread's refresh of the same key
+    single_flight_wait_seconds: float = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "120"))
+    # Async I/O layer: bounded pool for remaining blocking work, pooled Alpha Vantage / OpenAI clients
+    blocking_pool_workers: int = int(os.getenv("BLOCKING_POOL_WORKERS", "16"))
+    alphavantage_max_connections: int = int(os.getenv("ALPHAVANTAGE_MAX_CONNECTIONS", "10"))
+    openai_max_connections: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+    # Batched LLM news analysis: symbols per request, prompt+answer token budget per request,
+    # answer tokens reserved per symbol, and how long the pipeline waits to fill a batch
+    ai_batch_max_symbols: int = int(os.getenv("AI_BATCH_MAX_SYMBOLS", "10"))
+    ai_batch_token_budget: int = int(os.getenv("AI_BATCH_TOKEN_BUDGET", "12000"))
+    ai_batch_output_tokens_per_symbol: int = int(os.getenv("AI_BATCH_OUTPUT_TOKENS_PER_SYMBOL", "350"))
+    ai_batch_max_wait_seconds: float = float(os.getenv("AI_BATCH_MAX_WAIT_SECONDS", "0.5"))
+    # Content-addressed cache of AI analysis results (database table, shared by all paths and workers)
+    ai_cache_enabled: bool = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"
+    ai_cache_ttl_hours: float = float(os.getenv("AI_CACHE_TTL_HOURS", "72"))
+    # Monthly snapshot partitions: months created ahead, and months of history kept per table (0 = forever)
+    partition_months_ahead: int = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+    metrics_retention_months: int = int(os.getenv("METRICS_RETENTION_MONTHS", "24"))
+    risk_retention_months: int = int(os.getenv("RISK_RETENTION_MONTHS", "24"))
+    ai_snapshot_retention_months: int = int(os.getenv("AI_SNAPSHOT_RETENTION_MONTHS", "12"))
+    # Snapshot compaction: days kept at full resolution (older days become daily rollups),
+    # days AISnapshot.raw_json is kept, and days compacted per transaction
+    snapshot_raw_days: int = int(os.getenv("SNAPSHOT_RAW_DAYS", "120"))
+    ai_raw_json_days: int = int(os.getenv("AI_RAW_JSON_DAYS", "14"))
+    compaction_batch_days: int = int(os.getenv("COMPACTION_BATCH_DAYS", "7"))
+    # Database connection pools: the API engine (sync + async) and a separate engine for
+    # scheduler refreshes, ingestion jobs and maintenance, so background work can't starve requests
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    db_pool_timeout_seconds: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    db_pool_recycle_seconds: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    db_pool_pre_ping: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # JOBS_DB_MAX_OVERFLOW is a floor: it is raised to fit the refresh and ingestion workers
+    # (twice over for price/news with SINGLE_FLIGHT_MODE=advisory, which adds a lock connection each)
+    jobs_db_pool_size: int = int(os.getenv("JOBS_DB_POOL_SIZE", "5"))
+    jobs_db_max_overflow: int = int(os.getenv("JOBS_DB_MAX_OVERFLOW", "10"))
+    # Apply pending alembic migrations at startup (false: only check the revision and warn)
+    run_migrations_on_startup: bool = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() == "true"
     refresh_interval_minutes: int = int(os.getenv("REFRESH_INTERVAL_MINUTES", "30"))
     market_weight: float = float(os.getenv("MARKET_WEIGHT", "0.6"))
     news_weight: float = float(os.getenv("NEWS_WEIGHT", "0.4"))
+    # Refresh pipeline: worker pool size per stage and bounded queue between stages
+    refresh_price_workers: int = int(os.getenv("REFRESH_PRICE_WORKERS", "4"))
+    refresh_news_workers: int = int(os.getenv("REFRESH_NEWS_WORKERS", "8"))
+    refresh_ai_workers: int = int(os.getenv("REFRESH_AI_WORKERS", "4"))
+    refresh_score_workers: int = int(os.getenv("REFRESH_SCORE_WORKERS", "2"))
+    refresh_queue_size: int = int(os.getenv("REFRESH_QUEUE_SIZE", "32"))
+    refresh_stage_timeout_seconds: float = float(os.getenv("REFRESH_STAGE_TIMEOUT_SECONDS", "120"))
     
     class Config:
         env_file = ".env"
@@ -1,161 +1,98 @@
-from sqlmodel import SQLModel, create_engine, Session
-from sqlalchemy import text
+from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
 from app.core.config import settings
+from app.core.pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, register_engine
 
-engine = create_engine(settings.database_url, echo=False)
+
+def pool_options(url: str, pool_size: int, max_overflow: int, poolclass) -> dict:
+    """QueuePool settings for a server database (SQLite keeps SQLAlchemy's default pool)."""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def jobs_pool_overflow() -> int:
+    """JOBS_DB_MAX_OVERFLOW, raised if needed so every refresh stage and ingestion worker can hold its
+    connections at once. In advisory single-flight mode, price/news refreshes (including an ingestion
+    job's) also hold a lock connection; two more cover the maintenance jobs."""
+    per_refresh = 2 if settings.single_flight_mode == "advisory" else 1
+    demand = (
+        (settings.refresh_price_workers + settings.refresh_news_workers + settings.ingestion_workers) * per_refresh
+        + settings.refresh_ai_workers + settings.refresh_score_workers + 2
+    )
+    return max(settings.jobs_db_max_overflow, demand - settings.jobs_db_pool_size)
+
+
+# Request handlers (get_session) use `engine`; scheduler refreshes, ingestion jobs and maintenance
+# use `jobs_engine`, so a long refresh cycle can't take the connections requests are waiting for
+engine = create_engine(
+    settings.database_url, echo=False,
+    **pool_options(settings.database_url, settings.db_pool_size, settings.db_max_overflow, InstrumentedQueuePool)
+)
+jobs_engine = create_engine(
+    settings.database_url, echo=False,
+    **pool_options(settings.database_url, settings.jobs_db_pool_size, jobs_pool_overflow(), InstrumentedQueuePool)
+)
+register_engine("api", engine)
+register_engine("jobs", jobs_engine)
 
 
 def init_db():
-    SQLModel.metadata.create_all(engine)
-    
-    # Add missing columns if they don't exist (for existing databases)
-    # Use separate transactions for each migration to avoid cascading failures
-    
-    # 1. Create user table
-    try:
-        with engine.begin() as conn:
-            conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS "user" (
-                    id SERIAL PRIMARY KEY,
-                    session_id VARCHAR UNIQUE NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_guest BOOLEAN DEFAULT TRUE,
-                    email VARCHAR UNIQUE
-                )
-            """))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_user_session_id ON \"user\"(session_id)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_user_email ON \"user\"(email)"))
-    except Exception as e:
-        print(f"Note creating user table: {e}")
-    
-    # 2. Migrate ticker table (add id and user_id columns)
-    try:
-        with engine.begin() as conn:
-            # Check if id column exists
-            result = conn.execute(text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'ticker' AND column_name = 'id'
-            """)).fetchone()
-            
-            if not result:
-                conn.execute(text("ALTER TABLE ticker ADD COLUMN id SERIAL"))
-                print("Migrating ticker table to new schema...")
-    except Exception as e:
-        print(f"Note checking/adding ticker id column: {e}")
-    
-    try:
-        with engine.begin() as conn:
-            conn.execute(text("""
-                ALTER TABLE ticker 
-                ADD COLUMN IF NOT EXISTS user_id INTEGER
-            """))
-    except Exception as e:
-        print(f"Note adding user_id (may already exist): {e}")
-    
-    # 3. Create legacy user and assign existing tickers
-    try:
-        with engine.begin() as conn:
-            conn.execute(text("""
-                INSERT INTO "user" (session_id, is_guest) 
-                VALUES ('legacy_user', TRUE)
-                ON CONFLICT (session_id) DO NOTHING
-            """))
-    except Exception as e:
-        print(f"Note creating legacy user: {e}")
-    
-    try:
-        with engine.begin() as conn:
-            conn.execute(text("""
-                UPDATE ticker 
-                SET user_id = (SELECT id FROM "user" WHERE session_id = 'legacy_user')
-                WHERE user_id IS NULL
-            """))
-    except Exception as e:
-        print(f"Note assigning legacy user to tickers: {e}")
-    
-    # 4. Add foreign key constraint
-    try:
-        with engine.begin() as conn:
-            conn.execute(text("""
-                ALTER TABLE ticker 
-                DROP CONSTRAINT IF EXISTS fk_ticker_user
-            """))
-    except Exception as e:
-        print(f"Note dropping old constraint: {e}")
-    
-    try:
-        with engine.begin() as conn:
-            conn.execute(text("""
-                ALTER TABLE ticker 
-                ADD CONSTRAINT fk_ticker_user 
-                FOREIGN KEY (user_id) REFERENCES "user"(id)
-            """))
-    except Exception as e:
-        print(f"Note adding foreign key constraint (may already exist): {e}")
-    
-    # 5. Create unique index
-    try:
-        with engine.begin() as conn:
-            conn.execute(text("""
-                DROP INDEX IF EXISTS ix_ticker_user_symbol
-            """))
-            conn.execute(text("""
-                CREATE UNIQUE INDEX IF NOT EXISTS ix_ticker_user_symbol 
-                ON ticker(user_id, symbol)
-            """))
-    except Exception as e:
-        print(f"Note creating unique index: {e}")
-    
-    # 6. Add risk_tolerance column
-    try:
-        with engine.begin() as conn:
-            conn.execute(text("""
-                ALTER TABLE ticker 
-                ADD COLUMN IF NOT EXISTS risk_tolerance VARCHAR
-            """))
-    except Exception as e:
-        print(f"Note adding risk_tolerance: {e}")
-    
-    # 7. Add trend column to risksnapshot
-    try:
-        with engine.begin() as conn:
-            conn.execute(text("""
-                ALTER TABLE risksnapshot 
-                ADD COLUMN IF NOT EXISTS trend VARCHAR
-            """))
-    except Exception as e:
-        print(f"Note adding trend: {e}")
-    
-    # 8. Create riskforecast table
-    try:
-        with engine.begin() as conn:
-            conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS riskforecast (
-                    id SERIAL PRIMARY KEY,
-                    symbol VARCHAR NOT NULL,
-                    forecast_date TIMESTAMP NOT NULL,
-                    days_ahead INTEGER NOT NULL,
-                    predicted_score FLOAT NOT NULL,
-                    confidence FLOAT NOT NULL,
-                    trend_direction VARCHAR NOT NULL,
-                    forecast_reasons TEXT NOT NULL,
-                    pattern_match VARCHAR,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
-    except Exception as e:
-        print(f"Note creating riskforecast table: {e}")
-    
-    # 9. Create indexes for riskforecast
-    try:
-        with engine.begin() as conn:
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_riskforecast_symbol ON riskforecast(symbol)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_riskforecast_forecast_date ON riskforecast(forecast_date)"))
-    except Exception as e:
-        print(f"Note creating indexes: {e}")
+    """Bring the schema to the newest alembic revision. When the database is already current this
+    is a single version lookup; the schema changes live in alembic/versions."""
+    from app.core.migrations import ensure_schema
+    ensure_schema()
 
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with the matching async driver (asyncpg / aiosqlite)."""
+    for prefix, async_prefix in (
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
+
+_async_engine = None
+
+
+def get_async_engine():
+    """Async engine for the hot read paths, created on first use."""
+    global _async_engine
+    if _async_engine is None:
+        url = async_database_url(settings.database_url)
+        _async_engine = create_async_engine(
+            url, echo=False,
+            **pool_options(url, settings.db_pool_size, settings.db_max_overflow, InstrumentedAsyncQueuePool)
+        )
+        register_engine("api_async", _async_engine)
+    return _async_engine
+
+
+async def get_async_session():
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
+
+
+async def dispose_async_engine():
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
@@ -0,0 +1,29 @@
+"""
+Bounded thread pool for the blocking work async handlers still have to do (sync SQLAlchemy
+sessions, yfinance, pandas, VADER). It is installed as the event loop's default executor on
+startup, so asyncio.to_thread and run_in_executor(None, ...) share the same cap and a burst of
+refreshes queues here instead of spawning threads the API's own requests then compete with.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+from app.core.config import settings
+
+blocking_executor = ThreadPoolExecutor(max_workers=settings.blocking_pool_workers, thread_name_prefix="blocking")
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking callable on the bounded pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, functools.partial(fn, *args, **kwargs))
+
+
+def install_blocking_executor():
+    """Make the bounded pool the running loop's default executor (covers asyncio.to_thread)."""
+    asyncio.get_running_loop().set_default_executor(blocking_executor)
+    print(f"Blocking executor installed: {settings.blocking_pool_workers} threads")
+
+
+def shutdown_blocking_executor():
+    blocking_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,71 @@
+"""
+Import-time report for the API process. Runs `python -X importtime -c "import main"` in a fresh
+interpreter, so nothing is cached in sys.modules, and lists the modules with the highest cumulative
+and self import times. It also reports whether the heavy optional libraries (pandas, numpy, VADER,
+yfinance, openai) loaded at startup. They should load only on the first request or job that uses them.
+Run from backend/:  python -m app.core.import_profile [--module main] [--top 25]
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+HEAVY_MODULES = ("pandas", "numpy", "vaderSentiment", "yfinance", "openai")
+
+
+def profile_imports(module: str = "main") -> List[Dict]:
+    """[{module, self_us, cumulative_us, depth}] in import order, from a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+        })
+    return rows
+
+
+def import_report(module: str = "main", top: int = 25) -> Dict:
+    rows = profile_imports(module)
+    loaded = {row["module"] for row in rows}
+    total = next((row["cumulative_us"] for row in rows if row["module"] == module), 0)
+    return {
+        "module": module,
+        "total_ms": round(total / 1000, 1),
+        "modules": len(rows),
+        "heavy_loaded": [name for name in HEAVY_MODULES if name in loaded],
+        "by_cumulative": sorted(rows, key=lambda row: row["cumulative_us"], reverse=True)[:top],
+        "by_self": sorted(rows, key=lambda row: row["self_us"], reverse=True)[:top],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Module import timings for the API process")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    report = import_report(args.module, args.top)
+    print(f"import {report['module']}: {report['total_ms']:.1f} ms, {report['modules']} modules")
+    print(f"heavy libraries loaded at import: {', '.join(report['heavy_loaded']) or 'none'}")
+    for title, key in (("cumulative", "by_cumulative"), ("self", "by_self")):
+        print(f"\nTop {args.top} by {title} time:")
+        print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for row in report[key]:
+            print(f"{row['cumulative_us'] / 1000:>14.1f} {row['self_us'] / 1000:>9.1f}  {'  ' * row['depth']}{row['module']}")
+
+
+if __name__ == "__main__":
+    main()
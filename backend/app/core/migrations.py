@@ -0,0 +1,80 @@
+"""
+Schema versioning on startup through the alembic history in backend/alembic.
+The database records its revision in alembic_version. At startup ensure_schema() compares it with
+the newest revision in alembic/versions: when they match it returns after that single query, with
+no DDL and no locks. Otherwise it upgrades to head (RUN_MIGRATIONS_ON_STARTUP=true, the default)
+while holding a Postgres advisory lock, so several workers starting together migrate once; with
+RUN_MIGRATIONS_ON_STARTUP=false it only warns and leaves `alembic upgrade head` to the deploy.
+A database created by the old init_db has no revision recorded, so its first upgrade runs the whole
+history, including 004's copy of every snapshot table into monthly partitions, inside startup.
+Postgres is the supported backend; on SQLite the Postgres-only steps are skipped and the 002
+baseline creates the schema.
+"""
+import time
+from pathlib import Path
+from typing import Optional
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect, text
+from app.core.config import settings
+from app.core.database import engine
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+MIGRATION_LOCK_ID = 7_215_031_004  # pg advisory lock key shared by every worker
+
+
+def alembic_config() -> Config:
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    # Keep the application's logging setup when migrations run inside the app
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def head_revision(config: Optional[Config] = None) -> Optional[str]:
+    return ScriptDirectory.from_config(config or alembic_config()).get_current_head()
+
+
+def current_revision() -> Optional[str]:
+    with engine.connect() as conn:
+        return MigrationContext.configure(conn).get_current_revision()
+
+
+def upgrade_to_head(config: Optional[Config] = None):
+    """Run pending migrations, serialized across processes on Postgres."""
+    config = config or alembic_config()
+    if engine.dialect.name != "postgresql":
+        command.upgrade(config, "head")
+        return
+    with engine.connect() as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            # Another worker may have finished the upgrade while we waited for the lock
+            if current_revision() != head_revision(config):
+                command.upgrade(config, "head")
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            lock_conn.commit()
+
+
+def ensure_schema() -> str:
+    """Bring the database to the head revision if needed; returns the revision it is at."""
+    started = time.perf_counter()
+    config = alembic_config()
+    head = head_revision(config)
+    current = current_revision()
+    if current == head:
+        print(f"✓ Database schema current at revision {head} ({(time.perf_counter() - started) * 1000:.0f} ms)")
+        return current
+    if not settings.run_migrations_on_startup:
+        print(f"⚠ Database schema at revision {current or 'none'}, code expects {head}: run `alembic upgrade head`")
+        return current
+    if current is None and inspect(engine).has_table("metricssnapshot"):
+        print("⚠ Existing database without an alembic revision: the upgrade rebuilds the snapshot tables as "
+              "partitions (004) and can take a while; workers wait on the migration lock meanwhile")
+    print(f"Migrating database schema {current or 'none'} -> {head}...")
+    upgrade_to_head(config)
+    print(f"✓ Database schema migrated to {head} in {time.perf_counter() - started:.1f}s")
+    return head
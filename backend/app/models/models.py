@@ -1,5 +1,5 @@
 from sqlmodel import SQLModel, Field, Column, Relationship
-from sqlalchemy import Text
+from sqlalchemy import Text, Index, text
 from datetime import datetime
 from typing import Optional, List
 
@@ -26,8 +26,12 @@ class Ticker(SQLModel, table=True):
 
 
 class PricePoint(SQLModel, table=True):
+    # One bar per symbol per date; store_price_data upserts against this index, which also
+    # serves the per-symbol date range reads (so symbol has no index of its own)
+    __table_args__ = (Index("ux_pricepoint_symbol_date", "symbol", "date", unique=True),)
+    
     id: Optional[int] = Field(default=None, primary_key=True)
-    symbol: str = Field(index=True)
+    symbol: str
     date: datetime = Field(index=True)
     open: float
     high: float
@@ -37,8 +41,11 @@ class PricePoint(SQLModel, table=True):
 
 
 class MetricsSnapshot(SQLModel, table=True):
+    # Newest-first per-symbol reads; partitioned by month on ts in Postgres (alembic 004)
+    __table_args__ = (Index("ix_metricssnapshot_symbol_ts", "symbol", text("ts DESC"), text("id DESC")),)
+    
     id: Optional[int] = Field(default=None, primary_key=True)
-    symbol: str = Field(index=True)
+    symbol: str
     ts: datetime = Field(default_factory=datetime.utcnow, index=True)
     price: float
     return_7d: float
@@ -47,17 +54,37 @@ class MetricsSnapshot(SQLModel, table=True):
 
 
 class NewsArticle(SQLModel, table=True):
+    # One row per story, shared by every symbol it was fetched for (see NewsArticleSymbol);
+    # store_news_articles upserts against this index
+    __table_args__ = (Index("ux_newsarticle_url_hash", "url_hash", unique=True),)
+    
     id: Optional[int] = Field(default=None, primary_key=True)
-    symbol: str = Field(index=True)
     title: str
     url: str
+    url_hash: str  # sha256 of the normalized url
     published_at: datetime = Field(index=True)
     source: str
+    # Per-article headline score, computed once and reused by historical backfills
+    sentiment: Optional[float] = None
+    themes_json: Optional[str] = None  # JSON list of risk keywords in the headline
+
+
+class NewsArticleSymbol(SQLModel, table=True):
+    # Links a story to a symbol. published_at is copied from the story so a symbol's recent news
+    # is read from this index without visiting its older links
+    __table_args__ = (Index("ix_newsarticlesymbol_symbol_published_at", "symbol", "published_at"),)
+    
+    symbol: str = Field(primary_key=True)
+    article_id: int = Field(foreign_key="newsarticle.id", primary_key=True, index=True)
+    published_at: datetime
 
 
 class AISnapshot(SQLModel, table=True):
+    # Newest-first per-symbol reads; partitioned by month on ts in Postgres (alembic 004)
+    __table_args__ = (Index("ix_aisnapshot_symbol_ts", "symbol", text("ts DESC"), text("id DESC")),)
+    
     id: Optional[int] = Field(default=None, primary_key=True)
-    symbol: str = Field(index=True)
+    symbol: str
     ts: datetime = Field(default_factory=datetime.utcnow, index=True)
     sentiment: float
     themes_json: str  # JSON string of themes list
@@ -65,9 +92,22 @@ class AISnapshot(SQLModel, table=True):
     raw_json: str = Field(sa_column=Column(Text))  # Full AI response JSON
 
 
+class AIAnalysisCache(SQLModel, table=True):
+    """analyze_news results keyed by a hash of their inputs (headline ids, bucketed metrics, prompt, model)."""
+    key: str = Field(primary_key=True)  # sha256 hex
+    symbol: Optional[str] = Field(default=None, index=True)
+    model: str
+    prompt_version: str
+    result_json: str = Field(sa_column=Column(Text))
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
 class RiskSnapshot(SQLModel, table=True):
+    # Newest-first per-symbol reads; partitioned by month on ts in Postgres (alembic 004)
+    __table_args__ = (Index("ix_risksnapshot_symbol_ts", "symbol", text("ts DESC"), text("id DESC")),)
+    
     id: Optional[int] = Field(default=None, primary_key=True)
-    symbol: str = Field(index=True)
+    symbol: str
     ts: datetime = Field(default_factory=datetime.utcnow, index=True)
     market_score: float
     news_score: float
@@ -76,6 +116,48 @@ class RiskSnapshot(SQLModel, table=True):
     trend: Optional[str] = Field(default=None, sa_column=Column(Text))  # "up", "down", "flat", "new"
 
 
+class SymbolLatest(SQLModel, table=True):
+    """One row per symbol with its newest metrics, risk and AI state, maintained on write."""
+    symbol: str = Field(primary_key=True)
+    # Latest MetricsSnapshot
+    price: Optional[float] = None
+    return_7d: Optional[float] = None
+    vol_ann: Optional[float] = None
+    max_drawdown: Optional[float] = None
+    metrics_ts: Optional[datetime] = None
+    # Latest RiskSnapshot (+ the score it replaced, for the trend)
+    market_score: Optional[float] = None
+    news_score: Optional[float] = None
+    total_score: Optional[float] = None
+    previous_total_score: Optional[float] = None
+    trend: Optional[str] = None  # "up", "down", "flat", "new"
+    reasons_json: Optional[str] = Field(default=None, sa_column=Column(Text))
+    risk_ts: Optional[datetime] = None
+    # Latest AISnapshot
+    sentiment: Optional[float] = None
+    themes_json: Optional[str] = Field(default=None, sa_column=Column(Text))
+    summary: Optional[str] = Field(default=None, sa_column=Column(Text))
+    market_outlook: Optional[str] = None
+    ai_ts: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class SnapshotDailyRollup(SQLModel, table=True):
+    """Daily open/high/low/close of one snapshot field, written when old snapshots are compacted."""
+    source: str = Field(primary_key=True)  # "metricssnapshot", "risksnapshot", "aisnapshot"
+    symbol: str = Field(primary_key=True)
+    day: datetime = Field(primary_key=True)
+    field: str = Field(primary_key=True)  # e.g. "total_score", "price", "sentiment"
+    open: float
+    open_ts: datetime  # snapshot the open came from; later passes only replace it with an earlier one
+    high: float
+    low: float
+    close: float
+    close_ts: datetime  # likewise for close, with a later one
+    mean: float
+    samples: int
+
+
 class RiskForecast(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     symbol: str = Field(index=True)
@@ -0,0 +1,143 @@
+"""
+Content-addressed cache of analyze_news results.
+The key is a sha256 over the symbol, the sorted ids of the analyzed headlines, the market metrics
+rounded into buckets, the prompt version and the model. When none of those changed since the last
+analysis (overnight, weekends, a symbol viewed by many users) the stored result is returned
+without calling the LLM or VADER again. Rows persist in the database, so the cache is shared by
+the scheduler, the API routes, first-view ingestion and the historical backfill across processes.
+"""
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, select
+from app.core.config import settings
+from app.core.database import engine
+from app.models.models import AIAnalysisCache
+
+# Bucket sizes for the market context: analyses are reused while metrics stay in the same bucket
+METRIC_BUCKETS = {"return_7d": 0.5, "vol_ann": 1.0, "max_drawdown": 0.5}
+PRICE_SIGNIFICANT_DIGITS = 3
+
+
+def _bucket(value: Optional[float], size: float) -> Optional[float]:
+    return None if value is None else round(round(value / size) * size, 4)
+
+
+def bucket_market_data(market_data: Optional[Dict]) -> Optional[Dict]:
+    """Market context rounded to the cache's buckets (price to 3 significant digits)."""
+    if not market_data:
+        return None
+    bucketed = {name: _bucket(market_data.get(name), size) for name, size in METRIC_BUCKETS.items()}
+    price = market_data.get("price")
+    bucketed["price"] = float(f"{price:.{PRICE_SIGNIFICANT_DIGITS}g}") if price else price
+    return bucketed
+
+
+def analysis_cache_key(symbol: Optional[str], articles: Iterable, market_data: Optional[Dict], model: str, prompt_version: str) -> str:
+    """sha256 of everything an analysis depends on. Headlines are identified by row id (title if unsaved)."""
+    headline_ids = sorted(str(getattr(article, "id", None) or article.title) for article in articles)
+    payload = json.dumps({
+        "symbol": symbol,
+        "headlines": headline_ids,
+        "market": bucket_market_data(market_data),
+        "prompt_version": prompt_version,
+        "model": model,
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AIResultCache:
+    """Database-backed analyze_news result store with hit/miss counters."""
+
+    def __init__(self, ttl_hours: float, enabled: bool = True):
+        self.ttl_hours = ttl_hours
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict]:
+        """{key: result} for the keys with a live entry (one query)."""
+        keys = list(dict.fromkeys(keys))
+        if not self.enabled or not keys:
+            return {}
+        cutoff = datetime.utcnow() - timedelta(hours=self.ttl_hours)
+        try:
+            with Session(engine) as session:
+                rows = session.exec(
+                    select(AIAnalysisCache.key, AIAnalysisCache.result_json).where(
+                        AIAnalysisCache.key.in_(keys),
+                        AIAnalysisCache.created_at >= cutoff
+                    )
+                ).all()
+        except Exception as e:
+            # The cache must never break an analysis
+            print(f"⚠ AI cache lookup failed: {e}")
+            self._count("errors")
+            return {}
+        found = {row.key: json.loads(row.result_json) for row in rows}
+        self._count("hits", len(found))
+        self._count("misses", len(keys) - len(found))
+        return found
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, entries: List[Dict]):
+        """Store results; entries are {key, symbol, model, prompt_version, result}. Newer results replace older ones."""
+        if not self.enabled or not entries:
+            return
+        rows = [{
+            "key": entry["key"],
+            "symbol": entry.get("symbol"),
+            "model": entry["model"],
+            "prompt_version": entry["prompt_version"],
+            "result_json": json.dumps(entry["result"]),
+            "created_at": datetime.utcnow(),
+        } for entry in {entry["key"]: entry for entry in entries}.values()]
+        try:
+            with Session(engine) as session:
+                statement = pg_insert(AIAnalysisCache).values(rows)
+                session.execute(statement.on_conflict_do_update(
+                    index_elements=["key"],
+                    set_={"result_json": statement.excluded.result_json, "created_at": statement.excluded.created_at}
+                ))
+                session.commit()
+        except Exception as e:
+            print(f"⚠ AI cache store failed: {e}")
+            self._count("errors")
+            return
+        self._count("stores", len(rows))
+
+    def put(self, key: str, symbol: Optional[str], model: str, prompt_version: str, result: Dict):
+        self.put_many([{"key": key, "symbol": symbol, "model": model, "prompt_version": prompt_version, "result": result}])
+
+    def prune(self, session: Session) -> int:
+        """Delete entries past the TTL; returns the number of rows removed."""
+        cutoff = datetime.utcnow() - timedelta(hours=self.ttl_hours)
+        result = session.execute(delete(AIAnalysisCache).where(AIAnalysisCache.created_at < cutoff))
+        session.commit()
+        return result.rowcount or 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats.update({"enabled": self.enabled, "ttl_hours": self.ttl_hours})
+        try:
+            with Session(engine) as session:
+                stats["entries"] = session.exec(select(func.count()).select_from(AIAnalysisCache)).one()
+        except Exception:
+            stats["entries"] = None
+        return stats
+
+
+ai_result_cache = AIResultCache(ttl_hours=settings.ai_cache_ttl_hours, enabled=settings.ai_cache_enabled)
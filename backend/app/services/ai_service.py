@@ -1,44 +1,377 @@
+import asyncio
 import json
 import os
-from typing import Dict, List, Optional
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+import threading
+import httpx
+from typing import Dict, List, Optional, Tuple
 from app.core.config import settings
-from app.models.models import NewsArticle
+from sqlmodel import Session
+from app.models.models import NewsArticle, AISnapshot
+from app.services.latest_state import record_ai
+from app.services.response_cache import response_cache
+from app.services.ai_cache import ai_result_cache, analysis_cache_key
+from app.core.executor import run_blocking
+
+
+# Headline keywords used by the VADER fallback for themes and headline impact
+RISK_KEYWORDS = ["lawsuit", "regulation", "investigation", "decline", "loss", "miss", "warning", "breach", "fraud", "selloff", "crash", "drop"]
+POSITIVE_KEYWORDS = ["growth", "profit", "gain", "beat", "surge", "rally", "upgrade", "soar", "jump", "rise"]
+
+
+LLM_MODEL = "gpt-3.5-turbo"
+# Bump when the analysis prompts (single or batched) change so cached results are not reused
+PROMPT_VERSION = "news-v2"
+VADER_VERSION = "vader-v1"
+
+# LLM usage counters (requests, symbols analyzed, tokens reported by the API), per process
+_usage_lock = threading.Lock()
+ai_usage = {"requests": 0, "batched_requests": 0, "symbols": 0, "prompt_tokens": 0, "completion_tokens": 0, "symbol_retries": 0}
+
+# Shared instructions for batched analysis: sent once per request instead of once per symbol
+BATCH_SYSTEM_PROMPT = """You are a financial risk analyst. For EACH symbol block you receive (market conditions
+right now plus recent news headlines), analyze the CURRENT situation by combining news sentiment with
+actual price movement.
+
+Return ONLY a valid JSON object keyed by symbol, with exactly one entry per symbol block:
+{
+    "<SYMBOL>": {
+        "sentiment": <float from -1.0 to 1.0, where -1.0 is very negative/bearish, 1.0 is very positive/bullish>,
+        "themes": [<3-5 key themes like "earnings concern", "regulatory risk", "volatility spike", "positive momentum">],
+        "summary": "<2-3 sentence DIRECT summary starting with 'Currently...' or 'Right now...', specific about what is happening NOW>",
+        "market_outlook": "<ONE WORD: 'POSITIVE', 'NEGATIVE', or 'NEUTRAL' based on BOTH news AND price movement>",
+        "headline_impacts": [
+            {"title": "<headline>", "impact": <int from -2 to 2>, "reason": "<why this matters right now>"}
+        ]
+    }
+}
+
+CRITICAL RULES:
+- Analyze every symbol independently; never mix headlines between symbols
+- If price is DOWN and news is negative = STRONGLY NEGATIVE
+- If price is UP but news is mixed = NEUTRAL to slightly positive
+- Market outlook must reflect BOTH news AND price action together
+- headline_impacts: only the (up to 5) most market-moving headlines per symbol
+- Summary must be active voice, present tense, specific"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for packing prompts within a budget."""
+    return len(text) // 4 + 1
+
+
+def _load_llm_json(content: str):
+    content = content.strip()
+    # Remove markdown code blocks if present
+    if content.startswith("```"):
+        content = content.split("```")[1]
+        if content.startswith("json"):
+            content = content[4:]
+    return json.loads(content)
+
+
+def _record_usage(response, symbols: int, batched: bool = False):
+    usage = getattr(response, "usage", None)
+    with _usage_lock:
+        ai_usage["requests"] += 1
+        ai_usage["batched_requests"] += int(batched)
+        ai_usage["symbols"] += symbols
+        if usage:
+            ai_usage["prompt_tokens"] += usage.prompt_tokens or 0
+            ai_usage["completion_tokens"] += usage.completion_tokens or 0
+
+
+def ai_usage_stats() -> Dict:
+    with _usage_lock:
+        stats = dict(ai_usage)
+    stats["symbols_per_request"] = round(stats["symbols"] / stats["requests"], 2) if stats["requests"] else 0.0
+    stats["prompt_tokens_per_symbol"] = round(stats["prompt_tokens"] / stats["symbols"], 1) if stats["symbols"] else 0.0
+    return stats
+
+
+def _symbol_block(symbol: str, articles: List[NewsArticle], market_data: Optional[Dict]) -> str:
+    """Compact per-symbol section of a batched prompt: one market line plus its headlines."""
+    lines = [f"### {symbol}"]
+    if market_data:
+        price_change = market_data.get('return_7d', 0)
+        volatility = market_data.get('vol_ann', 0)
+        lines.append(
+            f"Market: price ${market_data.get('price', 0):.2f}, 7d {price_change:+.2f}%, "
+            f"volatility {volatility:.1f}%, max drawdown {market_data.get('max_drawdown', 0):.2f}%"
+        )
+    lines.append("Headlines:" if articles else "Headlines: none")
+    lines.extend(f"- {article.title}" for article in articles[:15])
+    return "\n".join(lines)
+
+
+def pack_news_batches(
+    items: List[Tuple[str, List[NewsArticle], Optional[Dict]]],
+    token_budget: Optional[int] = None,
+    max_symbols: Optional[int] = None
+) -> List[List[Tuple[str, List[NewsArticle], Optional[Dict]]]]:
+    """Greedily group (symbol, articles, market_data) items into requests whose prompt plus
+    reserved answer tokens stay within the budget."""
+    token_budget = token_budget or settings.ai_batch_token_budget
+    max_symbols = max_symbols or settings.ai_batch_max_symbols
+    base = estimate_tokens(BATCH_SYSTEM_PROMPT)
+    batches, current, used = [], [], base
+    for item in items:
+        cost = estimate_tokens(_symbol_block(*item)) + settings.ai_batch_output_tokens_per_symbol
+        if current and (used + cost > token_budget or len(current) >= max_symbols):
+            batches.append(current)
+            current, used = [], base
+        current.append(item)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+# Pooled OpenAI clients shared by every AIService (the async one is bound to its event loop)
+_openai_client = None
+_async_openai_client = None
+_async_openai_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        from openai import OpenAI
+        _openai_client = OpenAI(
+            api_key=settings.openai_api_key,
+            http_client=httpx.Client(limits=httpx.Limits(max_connections=settings.openai_max_connections), timeout=60)
+        )
+    return _openai_client
+
+
+def get_async_openai_client():
+    """Pooled AsyncOpenAI client (recreated if the event loop changed)."""
+    global _async_openai_client, _async_openai_loop
+    loop = asyncio.get_running_loop()
+    if _async_openai_client is None or _async_openai_loop is not loop:
+        from openai import AsyncOpenAI
+        _async_openai_client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            http_client=httpx.AsyncClient(limits=httpx.Limits(max_connections=settings.openai_max_connections), timeout=60)
+        )
+        _async_openai_loop = loop
+    return _async_openai_client
+
+
+# VADER analyzer shared by every AIService; building it loads the lexicon, so it waits for first use
+_sentiment_analyzer = None
+_sentiment_analyzer_lock = threading.Lock()
+
+
+def get_sentiment_analyzer():
+    global _sentiment_analyzer
+    if _sentiment_analyzer is None:
+        with _sentiment_analyzer_lock:
+            if _sentiment_analyzer is None:
+                from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+                _sentiment_analyzer = SentimentIntensityAnalyzer()
+    return _sentiment_analyzer
+
+
+async def close_openai_client():
+    global _async_openai_client, _async_openai_loop
+    if _async_openai_client is not None:
+        await _async_openai_client.close()
+    _async_openai_client = None
+    _async_openai_loop = None
 
 
 class AIService:
     def __init__(self):
         self.openai_key = settings.openai_api_key
-        self.analyzer = SentimentIntensityAnalyzer()
+
+    @property
+    def analyzer(self):
+        return get_sentiment_analyzer()
     
-    def analyze_news(self, articles: List[NewsArticle], market_data: Optional[Dict] = None) -> Dict:
-        """Analyze news articles with market context and return sentiment, themes, and summary."""
-        if self.openai_key:
-            return self._analyze_with_llm(articles, market_data)
+    def analyze_news(self, articles: List[NewsArticle], market_data: Optional[Dict] = None, symbol: Optional[str] = None) -> Dict:
+        """Analyze news articles with market context and return sentiment, themes, and summary.
+        Unchanged inputs (same headlines, same bucketed metrics) are served from the AI result cache."""
+        key = self._cache_key(symbol, articles, market_data)
+        cached = ai_result_cache.get(key)
+        if cached is not None:
+            return cached
+        if not self.openai_key:
+            result = self._analyze_with_fallback(articles, market_data)
         else:
-            return self._analyze_with_fallback(articles, market_data)
+            try:
+                result = self._analyze_with_llm(articles, market_data)
+            except Exception as e:
+                # Not cached, so the next cycle tries the LLM again
+                print(f"LLM analysis failed: {e}, falling back to sentiment analysis")
+                return self._analyze_with_fallback(articles)
+        ai_result_cache.put(key, symbol, *self._cache_identity(), result)
+        return result
     
-    def _analyze_with_llm(self, articles: List[NewsArticle], market_data: Optional[Dict] = None) -> Dict:
-        """Use OpenAI to analyze news with market context."""
+    async def analyze_news_async(self, articles: List[NewsArticle], market_data: Optional[Dict] = None, symbol: Optional[str] = None) -> Dict:
+        """analyze_news for async callers: the LLM call is awaited on the pooled AsyncOpenAI client."""
+        key = self._cache_key(symbol, articles, market_data)
+        cached = await run_blocking(ai_result_cache.get, key)
+        if cached is not None:
+            return cached
+        if not self.openai_key:
+            result = await run_blocking(self._analyze_with_fallback, articles, market_data)
+        else:
+            try:
+                response = await get_async_openai_client().chat.completions.create(**self._news_request(articles, market_data))
+                _record_usage(response, 1)
+                result = self._parse_news_analysis(response.choices[0].message.content, market_data)
+            except Exception as e:
+                print(f"LLM analysis failed: {e}, falling back to sentiment analysis")
+                return await run_blocking(self._analyze_with_fallback, articles)
+        await run_blocking(ai_result_cache.put, key, symbol, *self._cache_identity(), result)
+        return result
+    
+    def _cache_identity(self) -> Tuple[str, str]:
+        """(model, prompt version) a result depends on; VADER results are cached under their own identity."""
+        return (LLM_MODEL, PROMPT_VERSION) if self.openai_key else ("vader", VADER_VERSION)
+    
+    def _cache_key(self, symbol: Optional[str], articles: List[NewsArticle], market_data: Optional[Dict]) -> str:
+        return analysis_cache_key(symbol, articles, market_data, *self._cache_identity())
+    
+    def _cache_entries(self, keys: Dict[str, str], results: Dict[str, Optional[Dict]]) -> List[Dict]:
+        model, prompt_version = self._cache_identity()
+        return [
+            {"key": keys[symbol], "symbol": symbol, "model": model, "prompt_version": prompt_version, "result": result}
+            for symbol, result in results.items() if result is not None
+        ]
+    
+    def analyze_news_batch(self, items: List[Tuple[str, List[NewsArticle], Optional[Dict]]]) -> Dict[str, Dict]:
+        """analyze_news for several symbols at once: items are (symbol, articles, market_data), packed
+        into a few LLM requests within the token budget. Returns {symbol: analyze_news result}.
+        Symbols whose inputs are unchanged are served from the AI result cache (one lookup query)."""
+        keys = {symbol: self._cache_key(symbol, articles, market_data) for symbol, articles, market_data in items}
+        cached = ai_result_cache.get_many(list(keys.values()))
+        results = {symbol: cached[keys[symbol]] for symbol in keys if keys[symbol] in cached}
+        pending = [item for item in items if item[0] not in results]
+        if not pending:
+            return results
+        if not self.openai_key:
+            fresh = self._analyze_many_with_fallback(pending)
+            ai_result_cache.put_many(self._cache_entries(keys, fresh))
+            results.update(fresh)
+            return results
+        for batch in pack_news_batches(pending):
+            try:
+                response = get_openai_client().chat.completions.create(**self._batch_request(batch))
+                _record_usage(response, len(batch), batched=True)
+                fresh = self._parse_batch(batch, response.choices[0].message.content)
+            except Exception as e:
+                print(f"Batched LLM analysis failed for {len(batch)} symbol(s): {e}, falling back to sentiment analysis")
+                results.update(self._analyze_many_with_fallback(batch, with_market_data=False))
+                continue
+            ai_result_cache.put_many(self._cache_entries(keys, fresh))
+            results.update(fresh)
+            # Symbols the batch answer left out (or got wrong) get their own request
+            for symbol, articles, market_data in batch:
+                if results.get(symbol) is None:
+                    results[symbol] = self.analyze_news(articles, market_data, symbol=symbol)
+        return results
+    
+    async def analyze_news_batch_async(self, items: List[Tuple[str, List[NewsArticle], Optional[Dict]]]) -> Dict[str, Dict]:
+        """analyze_news_batch on the pooled AsyncOpenAI client; packed requests run concurrently."""
+        keys = {symbol: self._cache_key(symbol, articles, market_data) for symbol, articles, market_data in items}
+        cached = await run_blocking(ai_result_cache.get_many, list(keys.values()))
+        results = {symbol: cached[keys[symbol]] for symbol in keys if keys[symbol] in cached}
+        pending = [item for item in items if item[0] not in results]
+        if not pending:
+            return results
+        if not self.openai_key:
+            fresh = await run_blocking(self._analyze_many_with_fallback, pending)
+            await run_blocking(ai_result_cache.put_many, self._cache_entries(keys, fresh))
+            results.update(fresh)
+            return results
+        
+        async def run(batch) -> Dict[str, Dict]:
+            try:
+                response = await get_async_openai_client().chat.completions.create(**self._batch_request(batch))
+                _record_usage(response, len(batch), batched=True)
+                fresh = self._parse_batch(batch, response.choices[0].message.content)
+            except Exception as e:
+                print(f"Batched LLM analysis failed for {len(batch)} symbol(s): {e}, falling back to sentiment analysis")
+                return await run_blocking(self._analyze_many_with_fallback, batch, with_market_data=False)
+            await run_blocking(ai_result_cache.put_many, self._cache_entries(keys, fresh))
+            for symbol, articles, market_data in batch:
+                if fresh.get(symbol) is None:
+                    fresh[symbol] = await self.analyze_news_async(articles, market_data, symbol=symbol)
+            return fresh
+        
+        for batch_results in await asyncio.gather(*[run(batch) for batch in pack_news_batches(pending)]):
+            results.update(batch_results)
+        return results
+    
+    def _analyze_many_with_fallback(
+        self, items: List[Tuple[str, List[NewsArticle], Optional[Dict]]], with_market_data: bool = True
+    ) -> Dict[str, Dict]:
+        """VADER analysis for several symbols (one blocking call, so async callers offload it once)."""
+        return {
+            symbol: self._analyze_with_fallback(articles, market_data if with_market_data else None)
+            for symbol, articles, market_data in items
+        }
+    
+    def _batch_request(self, batch: List[Tuple[str, List[NewsArticle], Optional[Dict]]]) -> Dict:
+        """Chat completion arguments for one packed multi-symbol request."""
+        blocks = "\n\n".join(_symbol_block(*item) for item in batch)
+        return {
+            "model": LLM_MODEL,
+            "messages": [
+                {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                {"role": "user", "content": f"Analyze these {len(batch)} symbols. Return ONLY valid JSON.\n\n{blocks}"}
+            ],
+            "temperature": 0.3,
+            "max_tokens": len(batch) * settings.ai_batch_output_tokens_per_symbol,
+            "response_format": {"type": "json_object"}
+        }
+    
+    def _parse_batch(self, batch: List[Tuple[str, List[NewsArticle], Optional[Dict]]], content: str) -> Dict[str, Optional[Dict]]:
+        """Per-symbol results from a batched answer; None for a symbol whose entry is missing or invalid."""
         try:
-            from openai import OpenAI
-            client = OpenAI(api_key=self.openai_key)
+            parsed = _load_llm_json(content)
+        except (ValueError, AttributeError) as e:
+            print(f"⚠ Batched LLM answer is not valid JSON ({e}); analyzing {len(batch)} symbol(s) individually")
+            parsed = {}
+        if not isinstance(parsed, dict):
+            parsed = {}
+        entries = {str(key).upper(): value for key, value in parsed.items()}
+        results = {}
+        for symbol, _, market_data in batch:
+            try:
+                results[symbol] = self._normalize_news_analysis(entries[symbol.upper()], market_data)
+            except (KeyError, TypeError, ValueError, AttributeError):
+                results[symbol] = None
+        retries = sum(1 for result in results.values() if result is None)
+        if retries:
+            with _usage_lock:
+                ai_usage["symbol_retries"] += retries
+        return results
+    
+    def _analyze_with_llm(self, articles: List[NewsArticle], market_data: Optional[Dict] = None) -> Dict:
+        """Use OpenAI to analyze news with market context (raises on failure; callers fall back)."""
+        response = get_openai_client().chat.completions.create(**self._news_request(articles, market_data))
+        _record_usage(response, 1)
+        return self._parse_news_analysis(response.choices[0].message.content, market_data)
+    
+    def _news_request(self, articles: List[NewsArticle], market_data: Optional[Dict] = None) -> Dict:
+        """Chat completion arguments for the news + market context analysis prompt."""
+        headlines = [{"title": a.title, "url": a.url} for a in articles[:15]]
+        headlines_text = "\n".join([f"- {h['title']}" for h in headlines])
+        
+        # Build market context
+        market_context = ""
+        if market_data:
+            price_change = market_data.get('return_7d', 0)
+            volatility = market_data.get('vol_ann', 0)
+            drawdown = market_data.get('max_drawdown', 0)
+            current_price = market_data.get('price', 0)
             
-            headlines = [{"title": a.title, "url": a.url} for a in articles[:15]]
-            headlines_text = "\n".join([f"- {h['title']}" for h in headlines])
+            price_direction = "DOWN" if price_change < -2 else "UP" if price_change > 2 else "FLAT"
+            volatility_status = "HIGH" if volatility > 30 else "MODERATE" if volatility > 20 else "LOW"
             
-            # Build market context
-            market_context = ""
-            if market_data:
-                price_change = market_data.get('return_7d', 0)
-                volatility = market_data.get('vol_ann', 0)
-                drawdown = market_data.get('max_drawdown', 0)
-                current_price = market_data.get('price', 0)
-                
-                price_direction = "DOWN" if price_change < -2 else "UP" if price_change > 2 else "FLAT"
-                volatility_status = "HIGH" if volatility > 30 else "MODERATE" if volatility > 20 else "LOW"
-                
-                market_context = f"""
+            market_context = f"""
 
 CURRENT MARKET CONDITIONS (RIGHT NOW):
 - Price Movement: {price_direction} ({price_change:+.2f}% over 7 days)
@@ -47,8 +380,8 @@ CURRENT MARKET CONDITIONS (RIGHT NOW):
 - Max Drawdown: {drawdown:.2f}%
 - Market Trend: {'BEARISH' if price_change < -3 and volatility > 25 else 'BULLISH' if price_change > 3 and volatility < 20 else 'MIXED'}
 """
-            
-            prompt = f"""You are a financial risk analyst. Analyze the CURRENT market situation RIGHT NOW.
+        
+        prompt = f"""You are a financial risk analyst. Analyze the CURRENT market situation RIGHT NOW.
 
 {market_context}
 
@@ -76,81 +409,54 @@ CRITICAL RULES:
 
 Return ONLY valid JSON, no markdown formatting."""
 
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a financial risk analyst. Return only valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3
-            )
-            
-            content = response.choices[0].message.content.strip()
-            # Remove markdown code blocks if present
-            if content.startswith("```"):
-                content = content.split("```")[1]
-                if content.startswith("json"):
-                    content = content[4:]
-            
-            result = json.loads(content)
-            
-            # Validate and normalize
-            sentiment = float(result.get("sentiment", 0))
-            themes = result.get("themes", [])
-            summary = result.get("summary", "No summary available.")
-            headline_impacts = result.get("headline_impacts", [])
-            market_outlook = result.get("market_outlook", "NEUTRAL")
-            
-            # Ensure summary starts with active language if it doesn't
-            if not summary.startswith(("Currently", "Currently,", "Right now", "Right now,", "The stock", "The market")):
-                if market_data:
-                    price_change = market_data.get('return_7d', 0)
-                    if price_change < -2:
-                        summary = f"Currently, {summary.lower()}"
-                    elif price_change > 2:
-                        summary = f"Right now, {summary.lower()}"
-                    else:
-                        summary = f"The stock {summary.lower()}"
-            
-            return {
-                "sentiment": max(-1, min(1, sentiment)),
-                "themes": themes[:5],  # Limit to 5 themes
-                "summary": summary,
-                "market_outlook": market_outlook,
-                "headline_impacts": headline_impacts[:15],
-                "raw_json": json.dumps(result)
-            }
-        except Exception as e:
-            print(f"LLM analysis failed: {e}, falling back to sentiment analysis")
-            return self._analyze_with_fallback(articles)
+        return {
+            "model": LLM_MODEL,
+            "messages": [
+                {"role": "system", "content": "You are a financial risk analyst. Return only valid JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.3
+        }
     
-    def _analyze_with_fallback(self, articles: List[NewsArticle], market_data: Optional[Dict] = None) -> Dict:
-        """Use VADER sentiment analysis as fallback with market context."""
-        if not articles:
-            outlook = "NEUTRAL"
-            summary = "Currently, no recent news available to analyze."
+    def _parse_news_analysis(self, content: str, market_data: Optional[Dict] = None) -> Dict:
+        """Normalize the LLM's JSON answer into the analyze_news result shape."""
+        return self._normalize_news_analysis(_load_llm_json(content), market_data)
+    
+    def _normalize_news_analysis(self, result: Dict, market_data: Optional[Dict] = None) -> Dict:
+        # Validate and normalize
+        sentiment = float(result.get("sentiment", 0))
+        themes = result.get("themes", [])
+        summary = result.get("summary", "No summary available.")
+        headline_impacts = result.get("headline_impacts", [])
+        market_outlook = result.get("market_outlook", "NEUTRAL")
+        
+        # Ensure summary starts with active language if it doesn't
+        if not summary.startswith(("Currently", "Currently,", "Right now", "Right now,", "The stock", "The market")):
             if market_data:
                 price_change = market_data.get('return_7d', 0)
                 if price_change < -2:
-                    outlook = "NEGATIVE"
-                    summary = f"Currently, no news available but stock is down {price_change:.1f}%, indicating negative momentum."
+                    summary = f"Currently, {summary.lower()}"
                 elif price_change > 2:
-                    outlook = "POSITIVE"
-                    summary = f"Right now, no news available but stock is up {price_change:.1f}%, showing positive momentum."
-            
-            return {
-                "sentiment": 0.0,
-                "themes": [],
-                "summary": summary,
-                "market_outlook": outlook,
-                "headline_impacts": [],
-                "raw_json": "{}"
-            }
+                    summary = f"Right now, {summary.lower()}"
+                else:
+                    summary = f"The stock {summary.lower()}"
+        
+        return {
+            "sentiment": max(-1, min(1, sentiment)),
+            "themes": themes[:5],  # Limit to 5 themes
+            "summary": summary,
+            "market_outlook": market_outlook,
+            "headline_impacts": headline_impacts[:15],
+            "raw_json": json.dumps(result)
+        }
+    
+    def _analyze_with_fallback(self, articles: List[NewsArticle], market_data: Optional[Dict] = None) -> Dict:
+        """Use VADER sentiment analysis as fallback with market context."""
+        if not articles:
+            return self.summarize_sentiment(0.0, [], 0, market_data)
         
         sentiments = []
         headline_impacts = []
-        risk_keywords = ["lawsuit", "regulation", "investigation", "decline", "loss", "miss", "warning", "breach", "fraud", "selloff", "crash", "drop"]
-        positive_keywords = ["growth", "profit", "gain", "beat", "surge", "rally", "upgrade", "soar", "jump", "rise"]
         
         for article in articles[:15]:
             scores = self.analyzer.polarity_scores(article.title)
@@ -162,10 +468,10 @@ Return ONLY valid JSON, no markdown formatting."""
             impact = compound
             reason = "Sentiment analysis"
             
-            if any(kw in title_lower for kw in risk_keywords):
+            if any(kw in title_lower for kw in RISK_KEYWORDS):
                 impact = min(impact - 0.3, -2.0)
                 reason = "Contains risk keywords"
-            elif any(kw in title_lower for kw in positive_keywords):
+            elif any(kw in title_lower for kw in POSITIVE_KEYWORDS):
                 impact = max(impact + 0.3, 2.0)
                 reason = "Contains positive keywords"
             
@@ -178,11 +484,40 @@ Return ONLY valid JSON, no markdown formatting."""
         avg_sentiment = sum(sentiments) / len(sentiments) if sentiments else 0.0
         
         # Extract themes
-        themes = []
         all_text = " ".join([a.title.lower() for a in articles])
-        for keyword in risk_keywords:
-            if keyword in all_text:
-                themes.append(keyword)
+        themes = [keyword for keyword in RISK_KEYWORDS if keyword in all_text]
+        
+        result = self.summarize_sentiment(avg_sentiment, themes, len(articles), market_data)
+        result["headline_impacts"] = headline_impacts
+        return result
+    
+    def score_headline(self, title: str) -> Tuple[float, List[str]]:
+        """VADER compound score and risk-keyword themes for one headline (no LLM)."""
+        title_lower = title.lower()
+        return self.analyzer.polarity_scores(title)['compound'], [kw for kw in RISK_KEYWORDS if kw in title_lower]
+    
+    def summarize_sentiment(self, avg_sentiment: float, themes: List[str], article_count: int, market_data: Optional[Dict] = None) -> Dict:
+        """Build an analyze_news-shaped result from an already computed average sentiment and themes."""
+        if not article_count:
+            outlook = "NEUTRAL"
+            summary = "Currently, no recent news available to analyze."
+            if market_data:
+                price_change = market_data.get('return_7d', 0)
+                if price_change < -2:
+                    outlook = "NEGATIVE"
+                    summary = f"Currently, no news available but stock is down {price_change:.1f}%, indicating negative momentum."
+                elif price_change > 2:
+                    outlook = "POSITIVE"
+                    summary = f"Right now, no news available but stock is up {price_change:.1f}%, showing positive momentum."
+            
+            return {
+                "sentiment": 0.0,
+                "themes": [],
+                "summary": summary,
+                "market_outlook": outlook,
+                "headline_impacts": [],
+                "raw_json": "{}"
+            }
         
         # Build active summary with market context
         sentiment_word = "positive" if avg_sentiment > 0.1 else "negative" if avg_sentiment < -0.1 else "neutral"
@@ -207,7 +542,7 @@ Return ONLY valid JSON, no markdown formatting."""
                 summary = f"Currently, {sentiment_word} news sentiment with {price_change:+.1f}% price movement. Market conditions are relatively stable."
                 outlook = "NEUTRAL"
         else:
-            summary = f"Currently, analyzed {len(articles)} headlines showing {sentiment_word} sentiment overall."
+            summary = f"Currently, analyzed {article_count} headlines showing {sentiment_word} sentiment overall."
             outlook = "POSITIVE" if avg_sentiment > 0.1 else "NEGATIVE" if avg_sentiment < -0.1 else "NEUTRAL"
         
         return {
@@ -215,7 +550,7 @@ Return ONLY valid JSON, no markdown formatting."""
             "themes": themes[:5],
             "summary": summary,
             "market_outlook": outlook,
-            "headline_impacts": headline_impacts,
+            "headline_impacts": [],
             "raw_json": json.dumps({"method": "vader", "sentiment": avg_sentiment, "themes": themes, "outlook": outlook})
         }
     
@@ -229,8 +564,7 @@ Return ONLY valid JSON, no markdown formatting."""
     def _chat_with_llm(self, user_message: str, context_data: Optional[Dict] = None, conversation_history: Optional[List] = None) -> str:
         """Use OpenAI to answer financial/stock questions with context."""
         try:
-            from openai import OpenAI
-            client = OpenAI(api_key=self.openai_key)
+            client = get_openai_client()
             
             # Build context from database
             context_text = ""
@@ -891,3 +1225,70 @@ Remember: You have access to real stock data, news articles, and metrics. Use th
         # Default response
         return "I'm a financial AI assistant. I can help explain risk scores, volatility, market trends, and answer questions about stocks in your watchlist. Ask me about any financial concept or stock analysis!"
 
+
+# Shared instance used by the routes, the refresh pipeline, ingestion jobs and the historical backfill
+ai_service = AIService()
+
+
+class NewsAnalysisBatcher:
+    """Micro-batches concurrent analyze requests (e.g. the refresh pipeline's AI stage workers) into
+    analyze_news_batch_async calls: a batch is sent once it has max_symbols requests or the oldest
+    has waited max_wait seconds. Bound to the event loop it is used on."""
+
+    def __init__(self, ai_service: "AIService", max_symbols: int, max_wait: float, max_concurrent: int):
+        self.ai_service = ai_service
+        self.max_symbols = max_symbols
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrent))
+        self._pending: List[Tuple[Tuple[str, List[NewsArticle], Optional[Dict]], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+    async def analyze(self, symbol: str, articles: List[NewsArticle], market_data: Optional[Dict] = None) -> Dict:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(((symbol, articles, market_data), future))
+        if len(self._pending) >= self.max_symbols:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        async with self._semaphore:
+            try:
+                results = await self.ai_service.analyze_news_batch_async([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+        for (symbol, _, _), future in batch:
+            if not future.done():
+                future.set_result(results[symbol])
+
+
+def store_ai_snapshot(session: Session, symbol: str, ai_result: Dict) -> AISnapshot:
+    """Store an analyze_news result as an AISnapshot and update the symbol's latest state."""
+    snapshot = AISnapshot(
+        symbol=symbol,
+        sentiment=ai_result["sentiment"],
+        themes_json=json.dumps(ai_result["themes"]),
+        summary=ai_result["summary"],
+        raw_json=ai_result["raw_json"]
+    )
+    session.add(snapshot)
+    record_ai(session, snapshot)
+    session.commit()
+    response_cache.bump(symbol)
+    return snapshot
@@ -1,9 +1,19 @@
+import asyncio
+import json
+import httpx
 import requests
-import pandas as pd
-import numpy as np
+import threading
 from datetime import datetime, timedelta
-from typing import Dict
+from typing import TYPE_CHECKING, Dict, List, Optional
 from app.core.config import settings
+from app.core.executor import run_blocking
+from app.services.rate_limiter import alphavantage_keys
+from app.services.provider_cache import provider_cache
+
+if TYPE_CHECKING:
+    import pandas as pd  # imported where frames are built, so importing the API doesn't load pandas
+
+ALPHAVANTAGE_URL = "https://www.alphavantage.co/query"
 
 
 def is_crypto_symbol(symbol: str) -> bool:
@@ -25,22 +35,156 @@ def is_crypto_symbol(symbol: str) -> bool:
     return base_symbol in common_crypto
 
 
-def fetch_price_data_with_yfinance(symbol: str, days: int = 90) -> pd.DataFrame:
-    """Fetch price data using yfinance (works for both stocks and crypto)."""
+YFINANCE_PERIODS = [("5d", 5), ("1mo", 30), ("3mo", 90), ("6mo", 180), ("1y", 365), ("2y", 730), ("5y", 1825)]
+
+
+def to_naive_index(df: "pd.DataFrame") -> "pd.DataFrame":
+    """Drop timezone info from a DatetimeIndex (keeps exchange-local wall time, like stored PricePoints)."""
+    import pandas as pd
+    if isinstance(df.index, pd.DatetimeIndex) and df.index.tz is not None:
+        df.index = df.index.tz_localize(None)
+    return df
+
+
+# Symbol -> Yahoo ticker variant that returned data last time, so variant probing is skipped next time
+_resolved_variants: Dict[str, str] = {}
+_resolved_variants_lock = threading.Lock()
+
+
+def get_symbol_variants(symbol: str) -> List[str]:
+    """Yahoo ticker formats to try for a symbol, the one that worked last time first."""
+    variants = [symbol]
+    if '-' in symbol and symbol.endswith('-USD'):
+        # Try without -USD suffix and with =X suffix (Yahoo Finance format)
+        base = symbol.replace('-USD', '')
+        variants.append(f"{base}-USD")
+        variants.append(f"{base}=X")
+    with _resolved_variants_lock:
+        resolved = _resolved_variants.get(symbol)
+    if resolved:
+        variants.insert(0, resolved)
+    return list(dict.fromkeys(variants))
+
+
+def remember_symbol_variant(symbol: str, variant: str):
+    with _resolved_variants_lock:
+        _resolved_variants[symbol] = variant
+
+
+def _yfinance_window(days: int, since: Optional[datetime]) -> Dict[str, str]:
+    """yfinance download/history arguments covering the last `days`, or the tail from `since`."""
+    if since:
+        return {"start": since.strftime("%Y-%m-%d")}
+    for period, period_days in YFINANCE_PERIODS:
+        if period_days >= days:
+            return {"period": period}
+    return {"period": YFINANCE_PERIODS[-1][0]}
+
+
+def _clean_yfinance_frame(hist: "pd.DataFrame", days: int, since: Optional[datetime]) -> "pd.DataFrame":
+    import pandas as pd
+    df = hist[['Open', 'High', 'Low', 'Close', 'Volume']].dropna(subset=['Close']).copy()
+    if df.empty:
+        return df
+    if not isinstance(df.index, pd.DatetimeIndex):
+        df.index = pd.to_datetime(df.index)
+    df = to_naive_index(df)
+    df['Volume'] = df['Volume'].fillna(0)
+    cutoff_date = since if since else datetime.now() - timedelta(days=days)
+    return df[df.index >= cutoff_date]
+
+
+def fetch_price_data_batch_yfinance(
+    symbols: List[str],
+    days: int = 90,
+    since: Optional[Dict[str, Optional[datetime]]] = None,
+    chunk_size: Optional[int] = None
+) -> Dict[str, "pd.DataFrame"]:
+    """Fetch many symbols with chunked multi-ticker yfinance downloads.
+
+    Symbols are grouped by request window (full period or incremental start date) and downloaded
+    `chunk_size` tickers per request. Symbols that return nothing are retried with their next
+    Yahoo variant in a later round; the variant that works is remembered for future cycles.
+    Returns {symbol: DataFrame} for every symbol that produced data.
+    """
+    import pandas as pd
+    import yfinance as yf
+    
+    since = since or {}
+    chunk_size = chunk_size or settings.yfinance_batch_size
+    variants = {symbol: get_symbol_variants(symbol) for symbol in dict.fromkeys(symbols)}
+    results: Dict[str, "pd.DataFrame"] = {}
+    pending = list(variants)
+    rank = 0
+    
+    while pending:
+        # Group this round's symbols by request window, then by the variant to request
+        groups: Dict[tuple, Dict[str, str]] = {}
+        for symbol in pending:
+            if rank >= len(variants[symbol]):
+                continue
+            window = tuple(sorted(_yfinance_window(days, since.get(symbol)).items()))
+            groups.setdefault(window, {})[variants[symbol][rank]] = symbol
+        if not groups:
+            break
+        
+        for window, by_variant in groups.items():
+            tickers = list(by_variant)
+            for i in range(0, len(tickers), chunk_size):
+                chunk = tickers[i:i + chunk_size]
+                try:
+                    data = yf.download(
+                        tickers=chunk,
+                        interval='1d',
+                        group_by='ticker',
+                        auto_adjust=True,
+                        threads=True,
+                        progress=False,
+                        **dict(window)
+                    )
+                except Exception as e:
+                    print(f"✗ yfinance batch download failed for {len(chunk)} tickers: {e}")
+                    continue
+                if data is None or data.empty:
+                    continue
+                
+                for variant in chunk:
+                    if isinstance(data.columns, pd.MultiIndex):
+                        if variant not in data.columns.get_level_values(0):
+                            continue
+                        hist = data[variant]
+                    elif len(chunk) == 1:
+                        hist = data
+                    else:
+                        continue
+                    symbol = by_variant[variant]
+                    df = _clean_yfinance_frame(hist, days, since.get(symbol))
+                    if not df.empty:
+                        results[symbol] = df
+                        remember_symbol_variant(symbol, variant)
+        
+        pending = [symbol for symbol in pending if symbol not in results]
+        rank += 1
+    
+    print(f"✓ yfinance batch: {len(results)}/{len(variants)} symbols fetched in {rank} round(s)")
+    return results
+
+
+def fetch_price_data_with_yfinance(symbol: str, days: int = 90, since: Optional[datetime] = None) -> "pd.DataFrame":
+    """Fetch price data using yfinance (works for both stocks and crypto).
+
+    With `since`, only bars from that date onwards are requested (incremental refresh).
+    """
     try:
+        import pandas as pd
         import yfinance as yf
         from datetime import datetime, timedelta
         import time
         
         print(f"Fetching {symbol} using yfinance...")
         
-        # Try different symbol formats for crypto if needed
-        symbol_variants = [symbol]
-        if '-' in symbol and symbol.endswith('-USD'):
-            # Try without -USD suffix and with =X suffix (Yahoo Finance format)
-            base = symbol.replace('-USD', '')
-            symbol_variants.append(f"{base}-USD")
-            symbol_variants.append(f"{base}=X")
+        # Try different symbol formats for crypto if needed (last known-good format first)
+        symbol_variants = get_symbol_variants(symbol)
         
         hist = None
         used_symbol = None
@@ -50,21 +194,26 @@ def fetch_price_data_with_yfinance(symbol: str, days: int = 90) -> pd.DataFrame:
                 print(f"  Trying symbol format: {variant}")
                 ticker = yf.Ticker(variant)
                 
-                # Try with a small delay to avoid rate limits
-                time.sleep(0.5)
+                if since:
+                    # Incremental: only the missing tail, starting at the latest stored bar
+                    attempts = [("start", since.strftime("%Y-%m-%d"))]
+                else:
+                    # Full: start with the shortest period that covers the window, widen if empty
+                    attempts = [("period", period) for period, period_days in YFINANCE_PERIODS if period_days >= days]
+                    attempts = attempts or [("period", YFINANCE_PERIODS[-1][0])]
                 
-                # Try multiple periods - start with shorter ones
-                for period in ["5d", "1mo", "3mo", "6mo", "1y"]:
+                for arg, value in attempts:
                     try:
-                        print(f"    Trying period: {period}")
-                        hist = ticker.history(period=period, interval='1d')
+                        print(f"    Trying {arg}: {value}")
+                        hist = ticker.history(**{arg: value}, interval='1d')
                         if not hist.empty:
                             used_symbol = variant
-                            print(f"    ✓ Got data with {variant} using period {period}")
+                            remember_symbol_variant(symbol, variant)
+                            print(f"    ✓ Got data with {variant} using {arg} {value}")
                             break
                         time.sleep(0.3)  # Small delay between attempts
                     except Exception as period_error:
-                        print(f"    ✗ Period {period} failed: {period_error}")
+                        print(f"    ✗ {arg} {value} failed: {period_error}")
                         continue
                 
                 if hist is not None and not hist.empty:
@@ -85,9 +234,10 @@ def fetch_price_data_with_yfinance(symbol: str, days: int = 90) -> pd.DataFrame:
         # Ensure index is DatetimeIndex (it should be already, but just in case)
         if not isinstance(df.index, pd.DatetimeIndex):
             df.index = pd.to_datetime(df.index)
+        df = to_naive_index(df)
         
-        # Filter to last N days
-        cutoff_date = datetime.now() - timedelta(days=days)
+        # Filter to last N days (or to the requested tail)
+        cutoff_date = since if since else datetime.now() - timedelta(days=days)
         df = df[df.index >= cutoff_date]
         
         if df.empty:
@@ -110,16 +260,8 @@ def fetch_price_data_with_yfinance(symbol: str, days: int = 90) -> pd.DataFrame:
         raise
 
 
-def fetch_price_data_alphavantage(symbol: str, days: int = 90) -> pd.DataFrame:
-    """Fetch price history using Alpha Vantage API. Handles both stocks and crypto."""
-    
-    api_key = settings.alphavantage_api_key
-    if not api_key:
-        raise ValueError("ALPHAVANTAGE_API_KEY not set in environment variables")
-    
-    # Alpha Vantage API endpoint
-    url = "https://www.alphavantage.co/query"
-    
+def _alphavantage_request(symbol: str, days: int = 90, since: Optional[datetime] = None) -> Dict:
+    """Request params (without apikey) and response layout for a symbol's daily series."""
     # Determine if this is crypto
     is_crypto = is_crypto_symbol(symbol)
     
@@ -136,120 +278,151 @@ def fetch_price_data_alphavantage(symbol: str, days: int = 90) -> pd.DataFrame:
                 base_symbol = parts[0]
                 market = parts[1]
         
-        params = {
-            "function": "DIGITAL_CURRENCY_DAILY",
-            "symbol": base_symbol,
+        return {
+            "is_crypto": True,
             "market": market,
-            "apikey": api_key
+            "params": {
+                "function": "DIGITAL_CURRENCY_DAILY",
+                "symbol": base_symbol,
+                "market": market
+            },
+            "time_series_key": "Time Series (Digital Currency Daily)",
+            "label": f"crypto {base_symbol} in {market}"
         }
-        time_series_key = f"Time Series (Digital Currency Daily)"
-        print(f"Fetching crypto {base_symbol} in {market} from Alpha Vantage...")
-    else:
-        # For stocks, use TIME_SERIES_DAILY
-        params = {
+    
+    # For stocks, use TIME_SERIES_DAILY
+    return {
+        "is_crypto": False,
+        "market": None,
+        "params": {
             "function": "TIME_SERIES_DAILY",
             "symbol": symbol.upper(),
-            "apikey": api_key,
-            "outputsize": "compact"  # Free tier: last 100 data points
-        }
-        time_series_key = "Time Series (Daily)"
-        print(f"Fetching stock {symbol} from Alpha Vantage...")
+            # compact = last 100 data points, the smallest payload; only go full for long backfills
+            "outputsize": "full" if days > 100 and not since else "compact"
+        },
+        "time_series_key": "Time Series (Daily)",
+        "label": f"stock {symbol}"
+    }
+
+
+def has_fresh_alphavantage_response(symbol: str, days: int = 90, since: Optional[datetime] = None) -> bool:
+    """True when a fetch would be served from the provider cache (no API key / quota needed)."""
+    request = _alphavantage_request(symbol, days, since)
+    return provider_cache.is_fresh("alphavantage", ALPHAVANTAGE_URL, request["params"])
+
+
+def _check_alphavantage_response(status_code: int, headers, content: bytes, params: Dict, api_key: str) -> Dict:
+    """Decode an Alpha Vantage response, report rate limiting, and cache usable responses."""
+    if status_code == 429:
+        retry_after = headers.get("Retry-After")
+        alphavantage_keys.report_rate_limited(api_key, float(retry_after) if retry_after and retry_after.isdigit() else None)
+        raise ValueError("Alpha Vantage rate limit reached (HTTP 429)")
+    data = json.loads(content)
     
-    try:
-        response = requests.get(url, params=params, timeout=30)
+    # Debug: print response keys to see what we got
+    print(f"Response keys: {list(data.keys())}")
+    
+    # Check for API errors
+    if "Error Message" in data:
+        error_msg = data["Error Message"]
+        print(f"✗ Alpha Vantage API error: {error_msg}")
+        raise ValueError(f"Alpha Vantage API error: {error_msg}")
+    
+    if "Note" in data:
+        # Rate limit message
+        note_msg = data["Note"]
+        print(f"⚠ Alpha Vantage note: {note_msg}")
+        alphavantage_keys.report_rate_limited(api_key)
+        raise ValueError(f"Alpha Vantage rate limit reached: {note_msg}")
+    
+    if "Information" in data:
+        # Sometimes API returns information messages
+        info_msg = data["Information"]
+        print(f"⚠ Alpha Vantage info: {info_msg}")
+        if "per day" in info_msg.lower() or "daily" in info_msg.lower():
+            alphavantage_keys.report_quota_exhausted(api_key)
+            raise ValueError(f"Rate limit: {info_msg}")
+        if "API call frequency" in info_msg or "rate" in info_msg.lower():
+            alphavantage_keys.report_rate_limited(api_key)
+            raise ValueError(f"Rate limit: {info_msg}")
+    
+    if any(key.startswith("Time Series") for key in data):
+        provider_cache.store("alphavantage", ALPHAVANTAGE_URL, params, content)
+    return data
+
+
+def _request_alphavantage(params: Dict, api_key: str) -> Dict:
+    """Call Alpha Vantage with one pool key."""
+    response = requests.get(ALPHAVANTAGE_URL, params={**params, "apikey": api_key}, timeout=30)
+    if response.status_code != 429:
         response.raise_for_status()
-        data = response.json()
-        
-        # Debug: print response keys to see what we got
-        print(f"Response keys: {list(data.keys())}")
-        
-        # Check for API errors
-        if "Error Message" in data:
-            error_msg = data["Error Message"]
-            print(f"✗ Alpha Vantage API error: {error_msg}")
-            raise ValueError(f"Alpha Vantage API error: {error_msg}")
-        
-        if "Note" in data:
-            # Rate limit message
-            note_msg = data["Note"]
-            print(f"⚠ Alpha Vantage note: {note_msg}")
-            raise ValueError(f"Alpha Vantage rate limit reached: {note_msg}")
-        
-        if "Information" in data:
-            # Sometimes API returns information messages
-            info_msg = data["Information"]
-            print(f"⚠ Alpha Vantage info: {info_msg}")
-            if "API call frequency" in info_msg or "rate" in info_msg.lower():
-                raise ValueError(f"Rate limit: {info_msg}")
-        
-        # Extract time series data
-        if time_series_key not in data:
-            # Print what we actually got for debugging
-            print(f"✗ No time series data in response for {symbol}")
-            print(f"   Response contains: {list(data.keys())}")
-            if "Meta Data" in data:
-                print(f"   Meta Data: {data['Meta Data']}")
-            return pd.DataFrame()
-        
-        time_series = data[time_series_key]
-        
-        # Convert to DataFrame
-        df_data = []
-        if is_crypto:
-            # DIGITAL_CURRENCY_DAILY has: 1a. open (USD), 1b. open (crypto), 2a. high (USD), etc.
-            # Note: Field names might vary, try different formats
-            for date_str, values in time_series.items():
-                try:
-                    # Try different field name formats
-                    open_key = f"1a. open ({market})"
-                    high_key = f"2a. high ({market})"
-                    low_key = f"3a. low ({market})"
-                    close_key = f"4a. close ({market})"
-                    
-                    # If those don't work, try without market suffix
-                    if open_key not in values:
-                        open_key = "1a. open (USD)"
-                        high_key = "2a. high (USD)"
-                        low_key = "3a. low (USD)"
-                        close_key = "4a. close (USD)"
-                    
-                    df_data.append({
-                        "Date": pd.to_datetime(date_str),
-                        "Open": float(values[open_key]),
-                        "High": float(values[high_key]),
-                        "Low": float(values[low_key]),
-                        "Close": float(values[close_key]),
-                        "Volume": int(float(values.get("5. volume", 0)))  # Volume is usually in crypto units
-                    })
-                except KeyError as e:
-                    print(f"⚠ Warning: Missing field {e} in crypto data, skipping date {date_str}")
-                    continue
+    return _check_alphavantage_response(response.status_code, response.headers, response.content, params, api_key)
+
+
+# Shared async client, bound to the running event loop (same scheme as the news client)
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_alphavantage_client() -> httpx.AsyncClient:
+    """Pooled AsyncClient for Alpha Vantage calls (recreated if the event loop changed)."""
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            timeout=30,
+            limits=httpx.Limits(
+                max_connections=settings.alphavantage_max_connections,
+                max_keepalive_connections=settings.alphavantage_max_connections
+            )
+        )
+        _async_client_loop = loop
+    return _async_client
+
+
+async def close_alphavantage_client():
+    global _async_client, _async_client_loop
+    if _async_client is not None:
+        await _async_client.aclose()
+    _async_client = None
+    _async_client_loop = None
+
+
+async def _request_alphavantage_async(params: Dict, api_key: str) -> Dict:
+    """Async _request_alphavantage on the pooled client; the cache write runs off the event loop."""
+    response = await get_alphavantage_client().get(ALPHAVANTAGE_URL, params={**params, "apikey": api_key})
+    if response.status_code != 429:
+        response.raise_for_status()
+    return await run_blocking(
+        _check_alphavantage_response, response.status_code, response.headers, response.content, params, api_key
+    )
+
+
+def fetch_price_data_alphavantage(
+    symbol: str,
+    days: int = 90,
+    api_key: Optional[str] = None,
+    since: Optional[datetime] = None
+) -> "pd.DataFrame":
+    """Fetch price history using Alpha Vantage API. Handles both stocks and crypto.
+
+    Responses are served from the provider cache within its TTL. Otherwise pass an `api_key`
+    already acquired from `alphavantage_keys`, or one is taken from the pool without waiting
+    (raises a rate-limit error if none is ready).
+    With `since`, only bars from that date onwards are returned (incremental refresh).
+    """
+    request = _alphavantage_request(symbol, days, since)
+    try:
+        cached = provider_cache.lookup("alphavantage", ALPHAVANTAGE_URL, request["params"])
+        if cached and cached.fresh:
+            print(f"Using cached Alpha Vantage response for {request['label']}")
+            data = json.loads(cached.text())
         else:
-            # TIME_SERIES_DAILY has: 1. open, 2. high, 3. low, 4. close, 5. volume
-            for date_str, values in time_series.items():
-                df_data.append({
-                    "Date": pd.to_datetime(date_str),
-                    "Open": float(values["1. open"]),
-                    "High": float(values["2. high"]),
-                    "Low": float(values["3. low"]),
-                    "Close": float(values["4. close"]),
-                    "Volume": int(values["5. volume"])
-                })
-        
-        df = pd.DataFrame(df_data)
-        df = df.sort_values("Date")
-        df = df.set_index("Date")
-        
-        # Filter to last N days
-        cutoff_date = datetime.now() - timedelta(days=days)
-        df = df[df.index >= cutoff_date]
-        
-        print(f"✓ Successfully fetched {len(df)} rows for {symbol}")
-        print(f"  Latest price: ${df['Close'].iloc[-1]:.2f}")
-        print(f"  Date range: {df.index[0].date()} to {df.index[-1].date()}")
-        
-        return df
-        
+            if not api_key:
+                api_key = alphavantage_keys.acquire_nowait()
+            print(f"Fetching {request['label']} from Alpha Vantage...")
+            data = _request_alphavantage(request["params"], api_key)
+        return _alphavantage_frame(symbol, request, data, days, since)
     except requests.exceptions.RequestException as e:
         print(f"✗ Network error fetching {symbol}: {e}")
         raise
@@ -257,3 +430,110 @@ def fetch_price_data_alphavantage(symbol: str, days: int = 90) -> pd.DataFrame:
         print(f"✗ Error fetching {symbol}: {e}")
         raise
 
+
+async def fetch_price_data_alphavantage_async(
+    symbol: str,
+    days: int = 90,
+    api_key: Optional[str] = None,
+    since: Optional[datetime] = None
+) -> "pd.DataFrame":
+    """Async fetch_price_data_alphavantage: the HTTP call is awaited on the pooled client; cache
+    lookups and frame building run on the bounded blocking pool."""
+    request = _alphavantage_request(symbol, days, since)
+    try:
+        cached = await run_blocking(provider_cache.lookup, "alphavantage", ALPHAVANTAGE_URL, request["params"])
+        if cached and cached.fresh:
+            print(f"Using cached Alpha Vantage response for {request['label']}")
+            data = json.loads(cached.text())
+        else:
+            if not api_key:
+                api_key = alphavantage_keys.acquire_nowait()
+            print(f"Fetching {request['label']} from Alpha Vantage...")
+            data = await _request_alphavantage_async(request["params"], api_key)
+        return await run_blocking(_alphavantage_frame, symbol, request, data, days, since)
+    except httpx.HTTPError as e:
+        print(f"✗ Network error fetching {symbol}: {e}")
+        raise
+    except Exception as e:
+        print(f"✗ Error fetching {symbol}: {e}")
+        raise
+
+
+def _alphavantage_frame(symbol: str, request: Dict, data: Dict, days: int, since: Optional[datetime]) -> "pd.DataFrame":
+    """OHLCV frame from a decoded Alpha Vantage time series response."""
+    import pandas as pd
+    is_crypto = request["is_crypto"]
+    market = request["market"]
+    time_series_key = request["time_series_key"]
+    
+    # Extract time series data
+    if time_series_key not in data:
+        # Print what we actually got for debugging
+        print(f"✗ No time series data in response for {symbol}")
+        print(f"   Response contains: {list(data.keys())}")
+        if "Meta Data" in data:
+            print(f"   Meta Data: {data['Meta Data']}")
+        return pd.DataFrame()
+    
+    time_series = data[time_series_key]
+    
+    # Convert to DataFrame
+    df_data = []
+    if is_crypto:
+        # DIGITAL_CURRENCY_DAILY has: 1a. open (USD), 1b. open (crypto), 2a. high (USD), etc.
+        # Note: Field names might vary, try different formats
+        for date_str, values in time_series.items():
+            try:
+                # Try different field name formats
+                open_key = f"1a. open ({market})"
+                high_key = f"2a. high ({market})"
+                low_key = f"3a. low ({market})"
+                close_key = f"4a. close ({market})"
+                
+                # If those don't work, try without market suffix
+                if open_key not in values:
+                    open_key = "1a. open (USD)"
+                    high_key = "2a. high (USD)"
+                    low_key = "3a. low (USD)"
+                    close_key = "4a. close (USD)"
+                
+                df_data.append({
+                    "Date": pd.to_datetime(date_str),
+                    "Open": float(values[open_key]),
+                    "High": float(values[high_key]),
+                    "Low": float(values[low_key]),
+                    "Close": float(values[close_key]),
+                    "Volume": int(float(values.get("5. volume", 0)))  # Volume is usually in crypto units
+                })
+            except KeyError as e:
+                print(f"⚠ Warning: Missing field {e} in crypto data, skipping date {date_str}")
+                continue
+    else:
+        # TIME_SERIES_DAILY has: 1. open, 2. high, 3. low, 4. close, 5. volume
+        for date_str, values in time_series.items():
+            df_data.append({
+                "Date": pd.to_datetime(date_str),
+                "Open": float(values["1. open"]),
+                "High": float(values["2. high"]),
+                "Low": float(values["3. low"]),
+                "Close": float(values["4. close"]),
+                "Volume": int(values["5. volume"])
+            })
+    
+    df = pd.DataFrame(df_data)
+    df = df.sort_values("Date")
+    df = df.set_index("Date")
+    
+    # Filter to last N days (or to the requested tail)
+    cutoff_date = since if since else datetime.now() - timedelta(days=days)
+    df = df[df.index >= cutoff_date]
+    if df.empty:
+        print(f"⚠ No rows for {symbol} after {cutoff_date.date()}")
+        return df
+    
+    print(f"✓ Successfully fetched {len(df)} rows for {symbol}")
+    print(f"  Latest price: ${df['Close'].iloc[-1]:.2f}")
+    print(f"  Date range: {df.index[0].date()} to {df.index[-1].date()}")
+    
+    return df
+
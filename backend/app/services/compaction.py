@@ -0,0 +1,170 @@
+"""
+Compaction of snapshot history.
+The scheduler appends metrics, risk and AI snapshots for every symbol every refresh. Snapshots older
+than SNAPSHOT_RAW_DAYS are folded into SnapshotDailyRollup (open/high/low/close/mean per field and
+day) and deleted; AISnapshot.raw_json is cleared after AI_RAW_JSON_DAYS. Each symbol's newest row
+in every table is never touched, so the SymbolLatest rebuild keeps working for symbols that
+stopped refreshing. The raw window never drops below MIN_RAW_DAYS, so /risk/{symbol} risk_history
+(90 days of RiskSnapshots) returns exactly what it did before compaction.
+"""
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import jobs_engine
+
+MIN_RAW_DAYS = 91  # risk_history reads 90 days of raw RiskSnapshots (+1 day for local/UTC skew)
+
+# Snapshot table -> numeric fields rolled up per day
+ROLLUP_FIELDS = {
+    "metricssnapshot": ("price", "return_7d", "vol_ann", "max_drawdown"),
+    "risksnapshot": ("total_score", "market_score", "news_score"),
+    "aisnapshot": ("sentiment",),
+}
+
+# Leaves each symbol's newest row alone
+NOT_NEWEST = "t.ts < (SELECT max(n.ts) FROM {table} n WHERE n.symbol = t.symbol)"
+
+# A later pass can fold rows from either side of a stored rollup into it (e.g. a symbol's former
+# newest row), so open/close are replaced only by an earlier/later snapshot
+COMPACT_SQL = """
+    WITH gone AS (
+        DELETE FROM {table} t
+        WHERE t.ts >= :start AND t.ts < :end AND {not_newest}
+        RETURNING t.symbol, t.ts, {fields}, pg_column_size(t.*) AS bytes
+    ),
+    rolled AS (
+        INSERT INTO snapshotdailyrollup
+            (source, symbol, day, field, open, open_ts, high, low, close, close_ts, mean, samples)
+        SELECT '{table}', g.symbol, date_trunc('day', g.ts), v.field,
+               (array_agg(v.value ORDER BY g.ts))[1], min(g.ts), max(v.value), min(v.value),
+               (array_agg(v.value ORDER BY g.ts DESC))[1], max(g.ts), avg(v.value), count(*)
+        FROM gone g CROSS JOIN LATERAL (VALUES {values}) AS v(field, value)
+        WHERE v.value IS NOT NULL
+        GROUP BY g.symbol, date_trunc('day', g.ts), v.field
+        ON CONFLICT (source, symbol, day, field) DO UPDATE SET
+            open = CASE WHEN excluded.open_ts < snapshotdailyrollup.open_ts
+                        THEN excluded.open ELSE snapshotdailyrollup.open END,
+            open_ts = LEAST(snapshotdailyrollup.open_ts, excluded.open_ts),
+            high = GREATEST(snapshotdailyrollup.high, excluded.high),
+            low = LEAST(snapshotdailyrollup.low, excluded.low),
+            close = CASE WHEN excluded.close_ts > snapshotdailyrollup.close_ts
+                         THEN excluded.close ELSE snapshotdailyrollup.close END,
+            close_ts = GREATEST(snapshotdailyrollup.close_ts, excluded.close_ts),
+            mean = (snapshotdailyrollup.mean * snapshotdailyrollup.samples + excluded.mean * excluded.samples)
+                   / (snapshotdailyrollup.samples + excluded.samples),
+            samples = snapshotdailyrollup.samples + excluded.samples
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM gone), (SELECT coalesce(sum(bytes), 0) FROM gone), (SELECT count(*) FROM rolled)
+"""
+
+PRUNE_RAW_JSON_SQL = """
+    WITH target AS (
+        SELECT t.id, t.ts, octet_length(t.raw_json) AS bytes FROM aisnapshot t
+        WHERE t.ts >= :start AND t.ts < :end AND t.raw_json IS NOT NULL AND {not_newest}
+    ),
+    cleared AS (
+        UPDATE aisnapshot a SET raw_json = NULL FROM target
+        WHERE a.id = target.id AND a.ts = target.ts
+        RETURNING target.bytes
+    )
+    SELECT count(*), coalesce(sum(bytes), 0) FROM cleared
+"""
+
+last_compaction: Optional[Dict] = None
+
+
+def last_compaction_report() -> Optional[Dict]:
+    return last_compaction
+
+
+def _day_windows(start: datetime, end: datetime, batch_days: int):
+    """[start, end) split into whole-day windows of at most batch_days."""
+    cursor = datetime(start.year, start.month, start.day)
+    while cursor < end:
+        window_end = min(cursor + timedelta(days=batch_days), end)
+        yield cursor, window_end
+        cursor = window_end
+
+
+def _oldest_ts(table: str, extra_where: str = "") -> Optional[datetime]:
+    with jobs_engine.connect() as conn:
+        return conn.execute(text(f"SELECT min(ts) FROM {table} {extra_where}")).scalar()
+
+
+def compact_table(table: str, cutoff: datetime, batch_days: int) -> Dict:
+    """Roll up and delete `table` rows older than `cutoff`, one transaction per window."""
+    fields = ROLLUP_FIELDS[table]
+    statement = text(COMPACT_SQL.format(
+        table=table,
+        not_newest=NOT_NEWEST.format(table=table),
+        fields=", ".join(f"t.{field}" for field in fields),
+        values=", ".join(f"('{field}', g.{field}::double precision)" for field in fields),
+    ))
+    report = {"rows": 0, "bytes": 0, "rollup_rows": 0}
+    oldest = _oldest_ts(table)
+    if oldest is None:
+        return report
+    for start, end in _day_windows(oldest, cutoff, batch_days):
+        with jobs_engine.begin() as conn:
+            rows, size, rollups = conn.execute(statement, {"start": start, "end": end}).one()
+        report["rows"] += rows
+        report["bytes"] += int(size)
+        report["rollup_rows"] += rollups
+    return report
+
+
+def prune_raw_json(cutoff: datetime, batch_days: int) -> Dict:
+    """Clear AISnapshot.raw_json on rows older than `cutoff` (each symbol's newest row keeps it)."""
+    statement = text(PRUNE_RAW_JSON_SQL.format(not_newest=NOT_NEWEST.format(table="aisnapshot")))
+    report = {"rows": 0, "bytes": 0}
+    oldest = _oldest_ts("aisnapshot", "WHERE raw_json IS NOT NULL")
+    if oldest is None:
+        return report
+    for start, end in _day_windows(oldest, cutoff, batch_days):
+        with jobs_engine.begin() as conn:
+            rows, size = conn.execute(statement, {"start": start, "end": end}).one()
+        report["rows"] += rows
+        report["bytes"] += int(size)
+    return report
+
+
+def compact_snapshots() -> Dict:
+    """Run one compaction pass over every snapshot table and report what was reclaimed."""
+    global last_compaction
+    if jobs_engine.dialect.name != "postgresql":
+        print("⚠ Snapshot compaction needs Postgres; skipped")
+        return {}
+    started = time.monotonic()
+    today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    raw_cutoff = today - timedelta(days=max(settings.snapshot_raw_days, MIN_RAW_DAYS))
+    json_cutoff = today - timedelta(days=settings.ai_raw_json_days)
+    batch_days = max(1, settings.compaction_batch_days)
+
+    report = {"raw_cutoff": raw_cutoff.isoformat(), "tables": {}}
+    for table in ROLLUP_FIELDS:
+        try:
+            report["tables"][table] = compact_table(table, raw_cutoff, batch_days)
+        except Exception as e:
+            print(f"✗ Compacting {table} failed: {e}")
+            report["tables"][table] = {"error": str(e)}
+    try:
+        report["raw_json"] = prune_raw_json(json_cutoff, batch_days)
+    except Exception as e:
+        print(f"✗ Pruning AI raw_json failed: {e}")
+        report["raw_json"] = {"error": str(e)}
+
+    parts = [report["raw_json"], *report["tables"].values()]
+    report["reclaimed_rows"] = sum(part.get("rows", 0) for part in report["tables"].values())
+    report["reclaimed_bytes"] = sum(part.get("bytes", 0) for part in parts)
+    report["duration_seconds"] = round(time.monotonic() - started, 2)
+    report["finished_at"] = datetime.utcnow().isoformat()
+    last_compaction = report
+    print(
+        f"✓ Snapshot compaction: {report['reclaimed_rows']} row(s) rolled up, "
+        f"{report['raw_json'].get('rows', 0)} raw_json blob(s) cleared, "
+        f"~{report['reclaimed_bytes'] / 1_048_576:.1f} MB reclaimed in {report['duration_seconds']}s"
+    )
+    return report
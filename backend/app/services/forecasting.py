@@ -2,12 +2,10 @@
 Risk Forecasting Service
 Predicts future risk scores based on historical patterns, trends, and news momentum.
 """
-import pandas as pd
-import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from sqlmodel import Session, select
-from app.models.models import RiskSnapshot, MetricsSnapshot, NewsArticle, RiskForecast
+from app.models.models import RiskSnapshot, MetricsSnapshot, NewsArticle, NewsArticleSymbol, RiskForecast
 from app.services.risk_scoring import calculate_market_score, calculate_news_score
 import json
 
@@ -17,6 +15,8 @@ def analyze_risk_trends(session: Session, symbol: str, days: int = 30) -> Dict:
     Analyze historical risk trends to identify patterns.
     Returns trend direction, volatility of risk, and momentum.
     """
+    import numpy as np
+
     # Get recent risk snapshots
     cutoff = datetime.utcnow() - timedelta(days=days)
     statement = select(RiskSnapshot).where(
@@ -74,11 +74,15 @@ def predict_news_momentum(session: Session, symbol: str, days: int = 7) -> Dict:
     """
     Predict news sentiment continuation based on recent news trends.
     """
+    import numpy as np
+
     cutoff = datetime.utcnow() - timedelta(days=days)
-    statement = select(NewsArticle).where(
-        NewsArticle.symbol == symbol,
-        NewsArticle.published_at >= cutoff
-    ).order_by(NewsArticle.published_at)
+    statement = select(NewsArticle).join(
+        NewsArticleSymbol, NewsArticleSymbol.article_id == NewsArticle.id
+    ).where(
+        NewsArticleSymbol.symbol == symbol,
+        NewsArticleSymbol.published_at >= cutoff
+    ).order_by(NewsArticleSymbol.published_at)
     
     articles = session.exec(statement).all()
     
@@ -118,6 +122,8 @@ def recognize_risk_patterns(session: Session, symbol: str) -> Optional[str]:
     Match current risk patterns to historical patterns.
     Returns pattern name if match found.
     """
+    import numpy as np
+
     # Get recent risk snapshots
     cutoff = datetime.utcnow() - timedelta(days=14)
     statement = select(RiskSnapshot).where(
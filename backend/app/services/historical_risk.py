@@ -3,25 +3,67 @@ Generate historical risk scores from price data.
 This allows stocks to have 90 days of risk history even if just added to watchlist.
 """
 from datetime import datetime, timedelta
+from sqlalchemy import insert
 from sqlmodel import Session, select, desc
-from typing import List, Dict
-import numpy as np
+from typing import TYPE_CHECKING, List, Dict
 import json
-from app.models.models import PricePoint, MetricsSnapshot, RiskSnapshot, AISnapshot, NewsArticle
-from app.services.risk_scoring import calculate_risk_score
-from app.services.ai_service import AIService
-from app.services.news_service import get_recent_news
+from app.models.models import PricePoint, RiskSnapshot
+from app.core.config import settings
+from app.services.risk_scoring import score_risk, trend_between
+from app.services.latest_state import record_risk
+from app.services.response_cache import response_cache
+from app.services.ai_service import ai_service
+from app.services.news_sentiment import news_windows_by_day, score_unscored_articles, window_sentiment
 
-ai_service = AIService()
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Price points per metrics window (about 90 trading days), and the minimum for a 7-day return
+ROLLING_WINDOW = 90
+MIN_POINTS = 7
+
+
+def compute_rolling_metrics(dates: List[datetime], closes: List[float], window: int = ROLLING_WINDOW) -> "pd.DataFrame":
+    """Price, 7-day return, annualized volatility and max drawdown for every point of a close
+    series, each over the trailing `window` points ending at it, in one vectorized pass.
+
+    Matches the per-date definitions used for history: population std of daily returns
+    (x sqrt(252)), and max drawdown as a positive percentage from the window's running peak.
+    """
+    import numpy as np
+    import pandas as pd
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    close = pd.Series(np.asarray(closes, dtype=float), index=pd.DatetimeIndex(dates))
+    values = close.to_numpy()
+    
+    return_7d = (close / close.shift(MIN_POINTS - 1) - 1) * 100
+    # `window` prices give `window - 1` daily returns
+    vol_ann = close.pct_change().rolling(window - 1, min_periods=1).std(ddof=0) * np.sqrt(252) * 100
+    
+    # Pad with the first price so every point has a full window; the padding never sets a new peak or trough
+    padded = np.concatenate([np.full(window - 1, values[0] if len(values) else 0.0), values])
+    windows = sliding_window_view(padded, window)
+    peaks = np.maximum.accumulate(windows, axis=1)
+    max_drawdown = ((peaks - windows) / peaks).max(axis=1) * 100
+    
+    return pd.DataFrame({
+        "price": values,
+        "return_7d": return_7d.fillna(0.0).to_numpy(),
+        "vol_ann": vol_ann.fillna(0.0).to_numpy(),
+        "max_drawdown": max_drawdown
+    }, index=close.index)
 
 
 def generate_historical_risk_scores(session: Session, symbol: str, days: int = 90):
     """Generate risk score history by processing historical price data. Creates snapshots for every trading day."""
+    import numpy as np
+
     print(f"Generating {days}-day risk history for {symbol}...")
     
     # Get all price points for the last 90 days
     cutoff_date = datetime.now() - timedelta(days=days)
-    price_stmt = select(PricePoint).where(
+    price_stmt = select(PricePoint.date, PricePoint.close).where(
         PricePoint.symbol == symbol,
         PricePoint.date >= cutoff_date
     ).order_by(PricePoint.date)
@@ -34,138 +76,123 @@ def generate_historical_risk_scores(session: Session, symbol: str, days: int = 9
     
     print(f"Found {len(price_points)} price points for {symbol}")
     
-    # Get unique trading dates from price points (convert datetime to date)
-    trading_dates = sorted(set([
-        pp.date.date() if isinstance(pp.date, datetime) else pp.date 
-        for pp in price_points
-    ]))
+    # Metrics for every price point in one pass; the last point of each date is that date's value
+    metrics = compute_rolling_metrics([pp.date for pp in price_points], [pp.close for pp in price_points])
+    metrics["position"] = np.arange(len(metrics))
+    daily = metrics.groupby(metrics.index.date).last()
     
-    if len(trading_dates) < 7:
-        print(f"Not enough trading dates for {symbol} (need at least 7)")
+    if len(daily) < MIN_POINTS:
+        print(f"Not enough trading dates for {symbol} (need at least {MIN_POINTS})")
         return
     
-    print(f"Processing {len(trading_dates)} trading dates...")
+    # Skip the first 6 days (need at least 7 days for calculations)
+    daily = daily.iloc[MIN_POINTS - 1:]
+    daily = daily[daily["position"] >= MIN_POINTS - 1]
+    if daily.empty:
+        return
+    
+    # Skip dates that already have a snapshot within 1 day (one query for the whole range)
+    existing = session.exec(
+        select(RiskSnapshot.ts, RiskSnapshot.total_score).where(
+            RiskSnapshot.symbol == symbol,
+            RiskSnapshot.ts >= datetime.combine(daily.index[0] - timedelta(days=1), datetime.min.time()),
+            RiskSnapshot.ts <= datetime.combine(daily.index[-1] + timedelta(days=1), datetime.max.time())
+        )
+    ).all()
+    covered = {row.ts.date() for row in existing}
+    pending = daily[[
+        not ({d - timedelta(days=1), d, d + timedelta(days=1)} & covered) for d in daily.index
+    ]]
+    risk_snapshots_skipped = len(daily) - len(pending)
+    print(f"Processing {len(pending)} trading dates ({risk_snapshots_skipped} already covered)...")
+    if pending.empty:
+        print(f"✓ Risk history for {symbol} already complete")
+        return
+    
+    # News for every date from one query: each date sees the newest articles of its 7-day window
+    news_windows = news_windows_by_day(session, symbol, list(pending.index))
+    article_scores = {}
+    if settings.backfill_news_series:
+        # Score each article once; daily news scores come from the stored per-article scores
+        article_scores = score_unscored_articles(
+            session, list({row.id: row for window in news_windows.values() for row in window}.values()), ai_service
+        )
+    latest_date = daily.index[-1]
     
-    risk_snapshots_created = 0
-    risk_snapshots_skipped = 0
+    rows = []
     
     # Process each trading date (oldest to newest)
-    for idx, trading_date in enumerate(trading_dates):
-        # Skip the first 6 days (need at least 7 days for calculations)
-        if idx < 6:
-            continue
-        
-        # Check if we already have a risk snapshot for this date (within 1 day tolerance)
-        date_start = datetime.combine(trading_date, datetime.min.time())
-        date_end = datetime.combine(trading_date, datetime.max.time())
-        
-        existing_stmt = select(RiskSnapshot).where(
-            RiskSnapshot.symbol == symbol,
-            RiskSnapshot.ts >= date_start - timedelta(days=1),
-            RiskSnapshot.ts <= date_end + timedelta(days=1)
-        ).limit(1)
-        existing = session.exec(existing_stmt).first()
-        
-        if existing:
-            risk_snapshots_skipped += 1
-            continue  # Skip if we already have data for this date
-        
-        # Get price points up to and including this trading date
-        points_up_to_date = [
-            p for p in price_points 
-            if (p.date.date() if isinstance(p.date, datetime) else p.date) <= trading_date
-        ]
-        
-        if len(points_up_to_date) < 7:
-            continue
-        
-        # Get the last 90 days of price points up to this date (or all available if less than 90)
-        recent_points = points_up_to_date[-min(90, len(points_up_to_date)):]
-        
-        if len(recent_points) < 7:
-            continue
-        
+    for trading_date, row in pending.iterrows():
         try:
-            # Calculate price and metrics for this date
-            current_price = float(recent_points[-1].close)
-            
-            # Calculate 7-day return (using the last 7 price points up to this date)
-            if len(recent_points) >= 7:
-                price_7d_ago = float(recent_points[-7].close)
-                return_7d = ((current_price - price_7d_ago) / price_7d_ago) * 100
-            else:
-                return_7d = 0.0
-            
-            # Calculate volatility (annualized) from daily returns
-            if len(recent_points) >= 2:
-                returns = []
-                for j in range(1, len(recent_points)):
-                    ret = (float(recent_points[j].close) - float(recent_points[j-1].close)) / float(recent_points[j-1].close)
-                    returns.append(ret)
-                
-                if returns:
-                    std_dev = np.std(returns)
-                    vol_ann = std_dev * np.sqrt(252) * 100  # Annualized
-                else:
-                    vol_ann = 0.0
-            else:
-                vol_ann = 0.0
-            
-            # Calculate max drawdown
-            if len(recent_points) >= 2:
-                prices = [float(p.close) for p in recent_points]
-                peak = prices[0]
-                max_dd = 0.0
-                for price in prices:
-                    if price > peak:
-                        peak = price
-                    dd = (peak - price) / peak * 100
-                    if dd > max_dd:
-                        max_dd = dd
-            else:
-                max_dd = 0.0
-            
-            # Prepare market data for AI analysis
             market_data = {
-                "price": current_price,
-                "return_7d": return_7d,
-                "vol_ann": vol_ann,
-                "max_drawdown": max_dd
+                "price": float(row["price"]),
+                "return_7d": float(row["return_7d"]),
+                "vol_ann": float(row["vol_ann"]),
+                "max_drawdown": float(row["max_drawdown"])
             }
             
-            # Get news articles available up to this date (last 7 days from this date)
-            news_cutoff = date_start - timedelta(days=7)
-            news_stmt = select(NewsArticle).where(
-                NewsArticle.symbol == symbol,
-                NewsArticle.published_at <= date_end,
-                NewsArticle.published_at >= news_cutoff
-            ).order_by(desc(NewsArticle.published_at)).limit(15)
-            news_articles = list(session.exec(news_stmt))
-            
-            # Run AI analysis (even if no news, will use market data)
-            ai_result = ai_service.analyze_news(news_articles, market_data)
-            
-            # Calculate and store risk score with the specific date
-            metrics_dict = {
-                "price": current_price,
-                "return_7d": return_7d,
-                "vol_ann": vol_ann,
-                "max_drawdown": max_dd
-            }
-            calculate_risk_score(session, symbol, metrics_dict, ai_result, snapshot_date=date_start)
+            # News articles available up to this date (last 7 days from this date)
+            news_articles = news_windows[trading_date]
             
-            risk_snapshots_created += 1
+            use_llm = not settings.backfill_news_series or (
+                settings.backfill_llm_latest_day and trading_date == latest_date
+            )
+            if use_llm:
+                # Full AI analysis (even if no news, will use market data)
+                ai_result = ai_service.analyze_news(news_articles, market_data, symbol=symbol)
+            else:
+                sentiment, themes = window_sentiment(news_articles, article_scores)
+                ai_result = ai_service.summarize_sentiment(sentiment, themes, len(news_articles), market_data)
             
-            # Commit every 10 snapshots to avoid long transactions
-            if risk_snapshots_created % 10 == 0:
-                session.commit()
-                print(f"  Created {risk_snapshots_created} risk snapshots for {symbol} (skipped {risk_snapshots_skipped})...")
-        
+            scores = score_risk(market_data, ai_result)
+            rows.append({
+                "symbol": symbol,
+                "ts": datetime.combine(trading_date, datetime.min.time()),
+                "market_score": scores["market_score"],
+                "news_score": scores["news_score"],
+                "total_score": scores["total_score"],
+                "reasons_json": json.dumps(scores["reasons"])
+            })
         except Exception as e:
             print(f"  Error generating risk snapshot for {symbol} on {trading_date}: {e}")
             import traceback
             traceback.print_exc()
             continue
     
+    store_historical_snapshots(session, symbol, rows, existing)
+    print(f"✓ Generated {len(rows)} historical risk snapshots for {symbol} (skipped {risk_snapshots_skipped} that already existed)")
+
+
+def store_historical_snapshots(session: Session, symbol: str, rows: List[Dict], existing: List):
+    """Bulk-insert backdated risk snapshots in one transaction.
+
+    Trends are computed in memory over the date-ordered series of new and existing
+    (ts, total_score) points, each row against the point right before it.
+    """
+    if not rows:
+        return
+    earliest = min(row["ts"] for row in rows)
+    before = session.exec(
+        select(RiskSnapshot.ts, RiskSnapshot.total_score).where(
+            RiskSnapshot.symbol == symbol,
+            RiskSnapshot.ts < min([earliest] + [point.ts for point in existing])
+        ).order_by(desc(RiskSnapshot.ts)).limit(1)
+    ).all()
+    
+    series = sorted(
+        [(point.ts, point.total_score, None) for point in list(before) + list(existing)] +
+        [(row["ts"], row["total_score"], row) for row in rows],
+        key=lambda point: point[0]
+    )
+    previous_score = None
+    for _, total_score, row in series:
+        if row is not None:
+            row["trend"] = "new" if previous_score is None else trend_between(total_score, previous_score)
+        previous_score = total_score
+    
+    session.execute(insert(RiskSnapshot), rows)
+    # Backdated rows only reach the latest-state row if the symbol has nothing newer
+    newest = max(rows, key=lambda row: row["ts"])
+    record_risk(session, RiskSnapshot(**newest))
     session.commit()
-    print(f"✓ Generated {risk_snapshots_created} historical risk snapshots for {symbol} (skipped {risk_snapshots_skipped} that already existed)")
+    response_cache.bump(symbol)
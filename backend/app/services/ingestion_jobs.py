@@ -0,0 +1,229 @@
+"""
+Background ingestion of symbols seen for the first time (e.g. GET /risk/{symbol} on a cold symbol).
+Requests enqueue a job and get its id back immediately; a small worker pool runs market refresh,
+news refresh, AI analysis and the historical backfill off the request path. Jobs are single-flight
+per symbol, so concurrent viewers of the same new symbol share one job.
+The market stage runs on the event loop through the async refresh, which takes an Alpha Vantage
+key only if this job leads the symbol's refresh (a job that joins a refresh already in flight
+spends no quota); the other stages run in a thread.
+A job has one deadline covering the key wait and every stage. The thread can't be interrupted
+mid-call, so the deadline is checked between stages, and the job (with its symbol slot and worker)
+stays "running" until the thread has actually returned.
+"""
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from sqlmodel import Session
+from app.core.config import settings
+from app.core.database import jobs_engine
+from app.services.market_data import refresh_ticker_market_data_async
+from app.services.news_service import refresh_ticker_news, get_recent_news
+from app.services.ai_service import ai_service, store_ai_snapshot
+from app.services.risk_scoring import calculate_risk_score
+from app.services.historical_risk import generate_historical_risk_scores
+from app.services.alphavantage_data import is_crypto_symbol, has_fresh_alphavantage_response
+from app.services.rate_limiter import alphavantage_keys
+
+# (stage, progress once the stage has finished)
+INGESTION_STAGES = [("market", 0.4), ("news", 0.6), ("analysis", 0.8), ("history", 1.0)]
+
+
+class QueueFull(Exception):
+    """The ingestion queue is at capacity; the caller should retry later."""
+
+
+class IngestionTimeout(Exception):
+    """The job passed its deadline; raised between stages."""
+
+
+@dataclass
+class IngestionJob:
+    symbol: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"  # queued, running, succeeded, failed
+    stage: Optional[str] = None
+    progress: float = 0.0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    deadline: Optional[float] = None  # time.monotonic() value, set when a worker picks the job up
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "symbol": self.symbol,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 2),
+            "error": self.error,
+            "status_url": f"/api/jobs/{self.id}"
+        }
+
+
+def _check_deadline(job: IngestionJob):
+    if job.deadline is not None and time.monotonic() > job.deadline:
+        raise IngestionTimeout()
+
+
+async def _ingest_market(job: IngestionJob) -> Dict:
+    """The market stage. A key is waited for (against the job's deadline) only if this job leads
+    the symbol's market refresh."""
+    async def acquire_key() -> Optional[str]:
+        if is_crypto_symbol(job.symbol) or has_fresh_alphavantage_response(job.symbol):
+            return None
+        return await alphavantage_keys.acquire(timeout=max(0.0, job.deadline - time.monotonic()))
+
+    _check_deadline(job)
+    with Session(jobs_engine) as session:
+        market_result = await refresh_ticker_market_data_async(session, job.symbol, acquire_key=acquire_key)
+    if market_result.get("error"):
+        raise RuntimeError(market_result["error"])
+    job.progress = INGESTION_STAGES[0][1]
+    return market_result
+
+
+def _ingest(job: IngestionJob, market_result: Dict):
+    """Everything after the market stage a symbol needs to be viewable, reporting progress on the job.
+    Each stage uses its own short-lived session, so no connection is held across the provider
+    and LLM calls of the other stages. Stops between stages once the job's deadline has passed."""
+    _check_deadline(job)
+    job.stage = "news"
+    try:
+        with Session(jobs_engine) as session:
+            news_result = refresh_ticker_news(session, job.symbol)
+        if news_result.get("error"):
+            print(f"⚠ News fetch returned error for {job.symbol}: {news_result['error']}")
+    except Exception as e:
+        print(f"⚠ News refresh exception for {job.symbol} (non-critical): {e}")
+    job.progress = INGESTION_STAGES[1][1]
+
+    _check_deadline(job)
+    job.stage = "analysis"
+    metrics = market_result["metrics"]
+    market_data = {
+        "price": metrics["price"],
+        "return_7d": metrics["return_7d"],
+        "vol_ann": metrics["vol_ann"],
+        "max_drawdown": metrics["max_drawdown"]
+    }
+    with Session(jobs_engine) as session:
+        news_articles = get_recent_news(session, job.symbol, limit=15)
+    ai_result = ai_service.analyze_news(news_articles, market_data, symbol=job.symbol)
+    with Session(jobs_engine) as session:
+        store_ai_snapshot(session, job.symbol, ai_result)
+        calculate_risk_score(session, job.symbol, market_data, ai_result)
+    job.progress = INGESTION_STAGES[2][1]
+
+    _check_deadline(job)
+    job.stage = "history"
+    try:
+        with Session(jobs_engine) as session:
+            generate_historical_risk_scores(session, job.symbol, days=90)
+    except Exception as e:
+        print(f"⚠ Historical risk generation failed for {job.symbol} (non-critical): {e}")
+    job.progress = INGESTION_STAGES[3][1]
+
+
+class IngestionQueue:
+    """Bounded job queue with a worker pool and per-symbol single-flight."""
+
+    def __init__(self, workers: int, queue_size: int, job_timeout: float, retention_seconds: float, failure_cooldown: float):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.job_timeout = job_timeout
+        self.retention_seconds = retention_seconds
+        self.failure_cooldown = failure_cooldown
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._by_symbol: Dict[str, IngestionJob] = {}  # Newest job per symbol
+
+    def start(self):
+        """Start the worker pool on the running event loop."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))]
+        print(f"Ingestion workers started: {len(self._tasks)}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        for job_id, job in list(self._jobs.items()):
+            if job.done and job.finished_at < cutoff:
+                del self._jobs[job_id]
+                if self._by_symbol.get(job.symbol) is job:
+                    del self._by_symbol[job.symbol]
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self._jobs.get(job_id)
+
+    def recent_failure(self, symbol: str) -> Optional[IngestionJob]:
+        """The symbol's last job if it failed within the failure cooldown (don't retry yet)."""
+        job = self._by_symbol.get(symbol)
+        if job and job.status == "failed" and time.time() - job.finished_at < self.failure_cooldown:
+            return job
+        return None
+
+    def submit(self, symbol: str) -> Tuple[IngestionJob, bool]:
+        """Return the symbol's in-flight job, or enqueue a new one. The flag says whether it is new."""
+        if self._queue is None:
+            raise RuntimeError("Ingestion workers are not running")
+        self._prune()
+        job = self._by_symbol.get(symbol)
+        if job and not job.done:
+            return job, False
+        job = IngestionJob(symbol=symbol)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFull(f"Ingestion queue is full ({self.queue_size} jobs)")
+        self._jobs[job.id] = job
+        self._by_symbol[symbol] = job
+        return job, True
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.stage = "market"
+            started = time.monotonic()
+            job.deadline = started + self.job_timeout
+            try:
+                market_result = await _ingest_market(job)
+                # Awaited to completion: a timed-out job keeps its worker and symbol slot until the
+                # thread returns, so a retry can't overlap it
+                await asyncio.to_thread(_ingest, job, market_result)
+                job.status = "succeeded"
+                print(f"✓ Ingested {job.symbol} in {time.monotonic() - started:.1f}s")
+            except Exception as e:
+                if isinstance(e, IngestionTimeout):
+                    job.error = f"Ingestion timed out after {self.job_timeout:.0f}s (stopped after the {job.stage} stage)"
+                else:
+                    job.error = str(e) or e.__class__.__name__
+                job.status = "failed"
+                print(f"✗ Ingestion failed for {job.symbol} at {job.stage} stage: {job.error}")
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+
+
+ingestion_queue = IngestionQueue(
+    workers=settings.ingestion_workers,
+    queue_size=settings.ingestion_queue_size,
+    job_timeout=settings.ingestion_job_timeout_seconds,
+    retention_seconds=settings.ingestion_job_retention_seconds,
+    failure_cooldown=settings.ingestion_failure_cooldown_seconds
+)
+
@@ -0,0 +1,153 @@
+"""
+SymbolLatest projection: one row per symbol holding its newest metrics, risk and AI state.
+Writers call record_* in the same transaction as the snapshot insert; each component is an
+upsert guarded by its timestamp so an older snapshot (e.g. a historical backfill) never
+replaces a newer one. Readers get a primary-key lookup instead of ORDER BY ts DESC LIMIT 1.
+"""
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import case, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.database import engine
+from app.core.executor import run_blocking
+from app.models.models import SymbolLatest, MetricsSnapshot, RiskSnapshot, AISnapshot
+from app.services.risk_scoring import TREND_THRESHOLD
+from app.services.snapshot_queries import latest_metrics_by_symbol, latest_risks_by_symbol, latest_ai_by_symbol
+
+
+def _upsert(session: Session, symbol: str, ts_column: str, values: Dict, newer_only, extra_set: Optional[Dict] = None):
+    statement = pg_insert(SymbolLatest).values(symbol=symbol, updated_at=datetime.utcnow(), **values)
+    excluded = statement.excluded
+    set_ = {column: excluded[column] for column in values}
+    set_["updated_at"] = excluded.updated_at
+    set_.update(extra_set or {})
+    current_ts = getattr(SymbolLatest, ts_column)
+    statement = statement.on_conflict_do_update(
+        index_elements=["symbol"],
+        set_=set_,
+        where=or_(current_ts.is_(None), newer_only(current_ts, excluded[ts_column]))
+    )
+    session.execute(statement)
+
+
+def record_metrics(session: Session, snapshot: MetricsSnapshot):
+    """Project a MetricsSnapshot onto the symbol's latest row (caller commits)."""
+    _upsert(session, snapshot.symbol, "metrics_ts", {
+        "price": snapshot.price,
+        "return_7d": snapshot.return_7d,
+        "vol_ann": snapshot.vol_ann,
+        "max_drawdown": snapshot.max_drawdown,
+        "metrics_ts": snapshot.ts,
+    }, newer_only=lambda current, new: current <= new)
+
+
+def record_risk(session: Session, snapshot: RiskSnapshot):
+    """Project a RiskSnapshot; the score it replaces becomes previous_total_score for the trend."""
+    previous = SymbolLatest.total_score
+    diff = snapshot.total_score - previous
+    _upsert(session, snapshot.symbol, "risk_ts", {
+        "market_score": snapshot.market_score,
+        "news_score": snapshot.news_score,
+        "total_score": snapshot.total_score,
+        "reasons_json": snapshot.reasons_json,
+        "risk_ts": snapshot.ts,
+        "previous_total_score": None,
+        "trend": "new",
+    }, newer_only=lambda current, new: current < new, extra_set={
+        # Same rule as trend_from_snapshots, evaluated against the row being replaced
+        "previous_total_score": previous,
+        "trend": case(
+            (previous.is_(None), "new"),
+            (diff > TREND_THRESHOLD, "up"),
+            (diff < -TREND_THRESHOLD, "down"),
+            else_="flat"
+        ),
+    })
+
+
+def record_ai(session: Session, snapshot: AISnapshot):
+    """Project an AISnapshot onto the symbol's latest row (caller commits)."""
+    market_outlook = None
+    try:
+        market_outlook = json.loads(snapshot.raw_json).get("market_outlook", "NEUTRAL") if snapshot.raw_json else None
+    except (ValueError, AttributeError):
+        pass
+    _upsert(session, snapshot.symbol, "ai_ts", {
+        "sentiment": snapshot.sentiment,
+        "themes_json": snapshot.themes_json,
+        "summary": snapshot.summary,
+        "market_outlook": market_outlook,
+        "ai_ts": snapshot.ts,
+    }, newer_only=lambda current, new: current <= new)
+
+
+def rebuild_latest_state(session: Session, symbols: List[str]) -> Dict[str, SymbolLatest]:
+    """Rebuild rows for symbols from the snapshot tables (batched queries) and commit."""
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    metrics = latest_metrics_by_symbol(session, symbols)
+    risks = latest_risks_by_symbol(session, symbols, depth=2)
+    ais = latest_ai_by_symbol(session, symbols)
+    rebuilt = [symbol for symbol in symbols if symbol in metrics or symbol in risks or symbol in ais]
+    if not rebuilt:
+        return {}
+    for symbol in rebuilt:
+        if symbol in metrics:
+            record_metrics(session, metrics[symbol])
+        # Oldest first, so the newest lands with the previous score behind it
+        for snapshot in reversed(risks.get(symbol, [])):
+            record_risk(session, snapshot)
+        if symbol in ais:
+            record_ai(session, ais[symbol])
+    session.commit()
+    rows = session.exec(select(SymbolLatest).where(SymbolLatest.symbol.in_(rebuilt))).all()
+    return {row.symbol: row for row in rows}
+
+
+def get_latest_many(session: Session, symbols: List[str]) -> Dict[str, SymbolLatest]:
+    """Latest state for several symbols; rows missing from the projection are rebuilt on the fly."""
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    rows = session.exec(select(SymbolLatest).where(SymbolLatest.symbol.in_(symbols))).all()
+    latest = {row.symbol: row for row in rows}
+    missing = [symbol for symbol in symbols if symbol not in latest]
+    if missing:
+        latest.update(rebuild_latest_state(session, missing))
+    return latest
+
+
+def get_latest(session: Session, symbol: str) -> Optional[SymbolLatest]:
+    """Latest state for one symbol (primary-key lookup), or None if it has no snapshots yet."""
+    row = session.get(SymbolLatest, symbol)
+    if row is None:
+        row = rebuild_latest_state(session, [symbol]).get(symbol)
+    return row
+
+
+def _rebuild_in_new_session(symbols: List[str]) -> Dict[str, SymbolLatest]:
+    with Session(engine) as session:
+        rows = rebuild_latest_state(session, symbols)
+        session.expunge_all()
+    return rows
+
+
+async def get_latest_many_async(session: AsyncSession, symbols: List[str]) -> Dict[str, SymbolLatest]:
+    """get_latest_many on the async engine; the rare rebuild of missing rows runs on the blocking pool."""
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    rows = (await session.exec(select(SymbolLatest).where(SymbolLatest.symbol.in_(symbols)))).all()
+    latest = {row.symbol: row for row in rows}
+    missing = [symbol for symbol in symbols if symbol not in latest]
+    if missing:
+        latest.update(await run_blocking(_rebuild_in_new_session, missing))
+    return latest
+
+
+async def get_latest_async(session: AsyncSession, symbol: str) -> Optional[SymbolLatest]:
+    return (await get_latest_many_async(session, [symbol])).get(symbol)
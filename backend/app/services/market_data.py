@@ -1,15 +1,30 @@
-import pandas as pd
-import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import func, or_, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlmodel import Session, select
 from app.models.models import PricePoint, MetricsSnapshot
-from app.services.alphavantage_data import fetch_price_data_alphavantage
+from app.core.config import settings
+from app.services.alphavantage_data import fetch_price_data_alphavantage, fetch_price_data_batch_yfinance
+from app.services.latest_state import record_metrics, get_latest
+from app.services.response_cache import response_cache
+from app.services.single_flight import single_flight
+from app.core.executor import run_blocking
 
+if TYPE_CHECKING:
+    import pandas as pd
 
-def fetch_price_data(symbol: str, days: int = 90) -> pd.DataFrame:
-    """Fetch price history for a ticker. Uses yfinance for crypto, Alpha Vantage for stocks."""
-    import time
+
+def fetch_price_data(
+    symbol: str,
+    days: int = 90,
+    api_key: Optional[str] = None,
+    since: Optional[datetime] = None
+) -> "pd.DataFrame":
+    """Fetch price history for a ticker. Uses yfinance for crypto, Alpha Vantage for stocks.
+
+    With `since`, providers are only asked for bars from that date onwards.
+    """
     from app.services.alphavantage_data import is_crypto_symbol, fetch_price_data_with_yfinance
     
     # Check if this is crypto - ALWAYS use yfinance (it's free and works better)
@@ -19,7 +34,7 @@ def fetch_price_data(symbol: str, days: int = 90) -> pd.DataFrame:
         print(f"{'='*50}")
         try:
             print(f"Using yfinance for crypto symbol: {symbol}")
-            df = fetch_price_data_with_yfinance(symbol, days)
+            df = fetch_price_data_with_yfinance(symbol, days, since=since)
             if not df.empty:
                 print(f"✓ Successfully fetched {symbol} using yfinance")
                 print(f"{'='*50}\n")
@@ -38,27 +53,26 @@ def fetch_price_data(symbol: str, days: int = 90) -> pd.DataFrame:
             raise ValueError(f"Failed to fetch crypto data for {symbol} using yfinance: {e}")
     
     # For stocks, use Alpha Vantage
-    # Alpha Vantage has rate limits (5 calls per minute for free tier)
-    # Add a small delay to be safe
-    time.sleep(1)
-    
+    # Rate limits are enforced per key by the shared key pool (see rate_limiter)
     try:
         # Use Alpha Vantage API for stocks
-        df = fetch_price_data_alphavantage(symbol, days)
+        df = fetch_price_data_alphavantage(symbol, days, api_key=api_key, since=since)
         return df
     except ValueError as e:
         # Rate limit or API key error
         error_msg = str(e)
         if "rate limit" in error_msg.lower():
-            print(f"⚠ Rate limited. Free tier allows 5 calls/minute. Please wait...")
+            print(f"⚠ Rate limited on all configured Alpha Vantage keys. Please wait...")
         raise
     except Exception as e:
         print(f"✗ Error fetching {symbol}: {e}")
         raise
 
 
-def calculate_metrics(df: pd.DataFrame) -> Dict:
+def calculate_metrics(df: "pd.DataFrame") -> Dict:
     """Calculate market risk metrics from price data."""
+    import numpy as np
+
     if df.empty or len(df) < 7:
         return {
             "price": 0.0,
@@ -109,29 +123,99 @@ def calculate_metrics(df: pd.DataFrame) -> Dict:
     }
 
 
-def store_price_data(session: Session, symbol: str, df: pd.DataFrame):
-    """Store price data in database."""
-    for date, row in df.iterrows():
-        existing = session.exec(
-            select(PricePoint).where(
-                PricePoint.symbol == symbol,
-                PricePoint.date == date.to_pydatetime() if isinstance(date, pd.Timestamp) else date
-            )
-        ).first()
-        
-        if not existing:
-            price_point = PricePoint(
-                symbol=symbol,
-                date=date.to_pydatetime() if isinstance(date, pd.Timestamp) else date,
-                open=float(row['Open']),
-                high=float(row['High']),
-                low=float(row['Low']),
-                close=float(row['Close']),
-                volume=int(row['Volume']) if 'Volume' in row else 0
-            )
-            session.add(price_point)
+def get_incremental_start(session: Session, symbol: str, days: int = 90) -> Optional[datetime]:
+    """Date to resume fetching from, or None when a full fetch is needed.
+
+    Returns the latest stored bar date (re-fetched so an in-progress daily bar gets updated)
+    when stored history covers the window and the gap since the last bar is small.
+    New symbols, stale symbols and symbols with a truncated history get a full fetch.
+    """
+    first_date, last_date = session.exec(
+        select(func.min(PricePoint.date), func.max(PricePoint.date)).where(PricePoint.symbol == symbol)
+    ).one()
+    if not last_date:
+        return None
+    
+    now = datetime.now()
+    if now - last_date > timedelta(days=settings.price_incremental_max_gap_days):
+        return None
+    # Allow for weekends/holidays at the start of the window
+    if first_date > now - timedelta(days=days) + timedelta(days=7):
+        return None
+    return last_date
+
+
+def load_price_history(session: Session, symbol: str, days: int = 90) -> "pd.DataFrame":
+    """Load stored bars for the last N days as a provider-shaped DataFrame."""
+    import pandas as pd
+
+    cutoff = datetime.now() - timedelta(days=days)
+    price_points = session.exec(
+        select(PricePoint).where(
+            PricePoint.symbol == symbol,
+            PricePoint.date >= cutoff
+        ).order_by(PricePoint.date)
+    ).all()
     
+    df = pd.DataFrame(
+        [
+            {"Date": pp.date, "Open": pp.open, "High": pp.high, "Low": pp.low, "Close": pp.close, "Volume": pp.volume}
+            for pp in price_points
+        ],
+        columns=["Date", "Open", "High", "Low", "Close", "Volume"]
+    )
+    return df.set_index("Date")
+
+
+def merge_price_history(stored: "pd.DataFrame", fetched: "pd.DataFrame") -> "pd.DataFrame":
+    """Overlay freshly fetched bars on stored history (fetched wins for the same date)."""
+    import pandas as pd
+
+    if stored.empty:
+        return fetched
+    merged = pd.concat([stored, fetched[stored.columns]])
+    merged = merged[~merged.index.duplicated(keep="last")]
+    return merged.sort_index()
+
+
+def store_price_data(session: Session, symbol: str, df: "pd.DataFrame") -> Dict[str, int]:
+    """Upsert price bars in a single statement. Returns inserted/updated row counts.
+
+    Existing (symbol, date) bars are only rewritten when a value changed, so concurrent
+    refreshes can't create duplicate bars and unchanged rows aren't counted as updates.
+    """
+    import pandas as pd
+
+    df = df[~df.index.duplicated(keep="last")]
+    rows = [
+        {
+            "symbol": symbol,
+            "date": date.to_pydatetime() if isinstance(date, pd.Timestamp) else date,
+            "open": float(row['Open']),
+            "high": float(row['High']),
+            "low": float(row['Low']),
+            "close": float(row['Close']),
+            "volume": int(row['Volume']) if 'Volume' in row else 0
+        }
+        for date, row in df.iterrows()
+    ]
+    if not rows:
+        return {"inserted": 0, "updated": 0}
+    
+    table = PricePoint.__table__
+    stmt = pg_insert(table).values(rows)
+    value_columns = ["open", "high", "low", "close", "volume"]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.symbol, table.c.date],
+        set_={name: stmt.excluded[name] for name in value_columns},
+        where=or_(*[table.c[name].is_distinct_from(stmt.excluded[name]) for name in value_columns])
+    ).returning(literal_column("(xmax = 0)").label("inserted"))
+    
+    results = session.execute(stmt).all()
     session.commit()
+    
+    inserted = sum(1 for r in results if r.inserted)
+    return {"inserted": inserted, "updated": len(results) - inserted}
 
 
 def store_metrics(session: Session, symbol: str, metrics: Dict):
@@ -144,50 +228,180 @@ def store_metrics(session: Session, symbol: str, metrics: Dict):
         max_drawdown=metrics["max_drawdown"]
     )
     session.add(snapshot)
+    record_metrics(session, snapshot)
     session.commit()
     return snapshot
 
 
-def refresh_ticker_market_data(session: Session, symbol: str) -> Dict:
-    """Refresh market data for a ticker."""
-    import time
-    try:
-        print(f"\n{'='*50}")
-        print(f"REFRESHING MARKET DATA FOR {symbol}")
-        print(f"{'='*50}")
-        
-        df = fetch_price_data(symbol)
-        if df.empty:
-            error_msg = f"No data found for {symbol}"
-            print(f"✗ ERROR: {error_msg}")
-            return {"error": error_msg}
-        
-        print(f"Storing {len(df)} price data points for {symbol}...")
-        store_price_data(session, symbol, df)
-        
-        print(f"Calculating metrics for {symbol}...")
-        metrics = calculate_metrics(df)
-        print(f"✓ Metrics calculated:")
-        print(f"  Price: ${metrics['price']:.2f}")
-        print(f"  7D Return: {metrics['return_7d']:.2f}%")
-        print(f"  Volatility: {metrics['vol_ann']:.2f}%")
-        print(f"  Max Drawdown: {metrics['max_drawdown']:.2f}%")
-        
-        snapshot = store_metrics(session, symbol, metrics)
-        print(f"✓ Successfully stored metrics snapshot for {symbol}")
-        print(f"{'='*50}\n")
-        
+def fetch_yfinance_batch(session: Session, symbols: List[str], days: int = 90) -> Dict[str, "pd.DataFrame"]:
+    """Batch-download a cycle's yfinance-served symbols, each from its own incremental start."""
+    since = {symbol: get_incremental_start(session, symbol, days) for symbol in symbols}
+    return fetch_price_data_batch_yfinance(symbols, days, since=since)
+
+
+def stored_market_result(symbol: str) -> Dict:
+    """Result shaped like refresh_ticker_market_data's, built from the stored latest metrics.
+    Used when another process just refreshed the symbol."""
+    from app.core.database import engine
+    with Session(engine) as session:
+        latest = get_latest(session, symbol)
+        if not latest or latest.metrics_ts is None:
+            return {"error": f"No data found for {symbol}"}
         return {
             "success": True,
-            "metrics": metrics,
-            "snapshot": snapshot
+            "coalesced": True,
+            "metrics": {
+                "price": latest.price,
+                "return_7d": latest.return_7d,
+                "vol_ann": latest.vol_ann,
+                "max_drawdown": latest.max_drawdown
+            }
         }
+
+
+def refresh_ticker_market_data(
+    session: Session,
+    symbol: str,
+    api_key: Optional[str] = None,
+    prefetched: Optional["pd.DataFrame"] = None
+) -> Dict:
+    """Refresh market data for a ticker.
+
+    `api_key` is an Alpha Vantage key already acquired from the pool; `prefetched` is this
+    symbol's frame from a batch download, used instead of a per-symbol provider call.
+    Concurrent refreshes of the same symbol share one in-flight refresh and its result.
+    """
+    return single_flight.do(
+        ("market", symbol),
+        lambda: _refresh_ticker_market_data(session, symbol, api_key, prefetched),
+        fallback=lambda: stored_market_result(symbol)
+    )
+
+
+def _refresh_ticker_market_data(
+    session: Session,
+    symbol: str,
+    api_key: Optional[str] = None,
+    prefetched: Optional["pd.DataFrame"] = None
+) -> Dict:
+    try:
+        since = _start_market_refresh(session, symbol)
+        if prefetched is not None and not prefetched.empty:
+            print(f"Using batch-downloaded bars for {symbol}")
+            df = prefetched
+        else:
+            df = fetch_price_data(symbol, api_key=api_key, since=since)
+        return _apply_price_frame(session, symbol, df, since)
     except Exception as e:
-        error_msg = str(e) if e else "Unknown error"
-        import traceback
-        print(f"\n✗ ERROR in refresh_ticker_market_data for {symbol}: {error_msg}")
-        print(f"Full traceback:")
-        traceback.print_exc()
-        if "429" in error_msg or "Too Many Requests" in error_msg or "rate limit" in error_msg.lower():
-            return {"error": f"Rate limited. Wait 1-2 minutes and try again."}
-        return {"error": error_msg if error_msg else "Unknown error occurred"}
+        return _market_refresh_error(symbol, e)
+
+
+async def refresh_ticker_market_data_async(
+    session: Session,
+    symbol: str,
+    api_key: Optional[str] = None,
+    prefetched: Optional["pd.DataFrame"] = None,
+    acquire_key: Optional[Callable[[], Awaitable[Optional[str]]]] = None
+) -> Dict:
+    """Async refresh_ticker_market_data: Alpha Vantage is awaited on the pooled HTTP client; the
+    session work, yfinance and metrics run on the bounded blocking pool. Coalesces with the sync
+    variant through the same single-flight key.
+
+    `acquire_key` is awaited for an Alpha Vantage key only if this caller leads the refresh, so a
+    caller that joins one already in flight spends no quota."""
+    async def refresh() -> Dict:
+        try:
+            since = await run_blocking(_start_market_refresh, session, symbol)
+            if prefetched is not None and not prefetched.empty:
+                print(f"Using batch-downloaded bars for {symbol}")
+                df = prefetched
+            else:
+                key = api_key
+                if key is None and acquire_key is not None:
+                    key = await acquire_key()
+                df = await fetch_price_data_async(symbol, api_key=key, since=since)
+            return await run_blocking(_apply_price_frame, session, symbol, df, since)
+        except Exception as e:
+            return _market_refresh_error(symbol, e)
+
+    return await single_flight.do_async(
+        ("market", symbol), refresh, fallback=lambda: stored_market_result(symbol)
+    )
+
+
+async def fetch_price_data_async(
+    symbol: str,
+    days: int = 90,
+    api_key: Optional[str] = None,
+    since: Optional[datetime] = None
+) -> "pd.DataFrame":
+    """Async fetch_price_data. yfinance (crypto) has no async API, so it runs on the blocking pool."""
+    from app.services.alphavantage_data import is_crypto_symbol, fetch_price_data_alphavantage_async
+    if is_crypto_symbol(symbol):
+        return await run_blocking(fetch_price_data, symbol, days, api_key, since)
+    try:
+        return await fetch_price_data_alphavantage_async(symbol, days, api_key=api_key, since=since)
+    except ValueError as e:
+        if "rate limit" in str(e).lower():
+            print(f"⚠ Rate limited on all configured Alpha Vantage keys. Please wait...")
+        raise
+
+
+def _start_market_refresh(session: Session, symbol: str) -> Optional[datetime]:
+    print(f"\n{'='*50}")
+    print(f"REFRESHING MARKET DATA FOR {symbol}")
+    print(f"{'='*50}")
+    
+    since = get_incremental_start(session, symbol)
+    # End the read transaction so the session doesn't hold a pooled connection during the provider call
+    session.commit()
+    if since:
+        print(f"Incremental fetch for {symbol} from {since.date()}")
+    else:
+        print(f"Full fetch for {symbol} (new symbol or gap in stored history)")
+    return since
+
+
+def _apply_price_frame(session: Session, symbol: str, df: "pd.DataFrame", since: Optional[datetime]) -> Dict:
+    """Store fetched bars, recompute metrics and store the metrics snapshot."""
+    if df.empty:
+        error_msg = f"No data found for {symbol}"
+        print(f"✗ ERROR: {error_msg}")
+        return {"error": error_msg}
+    
+    print(f"Storing {len(df)} price data points for {symbol}...")
+    counts = store_price_data(session, symbol, df)
+    print(f"  {counts['inserted']} inserted, {counts['updated']} updated")
+    
+    print(f"Calculating metrics for {symbol}...")
+    if since:
+        # Only the tail was fetched; metrics need the whole window
+        df = merge_price_history(load_price_history(session, symbol), df)
+    metrics = calculate_metrics(df)
+    print(f"✓ Metrics calculated:")
+    print(f"  Price: ${metrics['price']:.2f}")
+    print(f"  7D Return: {metrics['return_7d']:.2f}%")
+    print(f"  Volatility: {metrics['vol_ann']:.2f}%")
+    print(f"  Max Drawdown: {metrics['max_drawdown']:.2f}%")
+    
+    snapshot = store_metrics(session, symbol, metrics)
+    response_cache.bump(symbol)
+    print(f"✓ Successfully stored metrics snapshot for {symbol}")
+    print(f"{'='*50}\n")
+    
+    return {
+        "success": True,
+        "metrics": metrics,
+        "snapshot": snapshot
+    }
+
+
+def _market_refresh_error(symbol: str, e: Exception) -> Dict:
+    error_msg = str(e) if e else "Unknown error"
+    import traceback
+    print(f"\n✗ ERROR in refresh_ticker_market_data for {symbol}: {error_msg}")
+    print(f"Full traceback:")
+    traceback.print_exc()
+    if "429" in error_msg or "Too Many Requests" in error_msg or "rate limit" in error_msg.lower():
+        return {"error": f"Rate limited. Wait 1-2 minutes and try again."}
+    return {"error": error_msg if error_msg else "Unknown error occurred"}
@@ -0,0 +1,75 @@
+"""
+Per-article news sentiment and the rolling daily news windows built from it.
+Each article is scored once (VADER over the headline plus risk-keyword themes) and the score
+is stored on its NewsArticle row. Historical backfills then derive every day's news score from
+the stored scores in that day's 7-day window instead of re-analyzing overlapping windows.
+"""
+import json
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple
+from sqlalchemy import update
+from sqlmodel import Session, select
+from app.models.models import NewsArticle, NewsArticleSymbol
+from app.services.ai_service import AIService, RISK_KEYWORDS
+
+NEWS_WINDOW_DAYS = 7
+NEWS_WINDOW_ARTICLES = 15  # Newest headlines per window, as get_recent_news / analyze_news use
+
+
+def score_unscored_articles(session: Session, rows: List, ai_service: AIService) -> Dict[int, Tuple[float, List[str]]]:
+    """Score rows without a stored sentiment, persist the scores in one bulk update, and return
+    {article id: (sentiment, themes)} for every row."""
+    scores = {}
+    updates = []
+    for row in rows:
+        if row.sentiment is None:
+            sentiment, themes = ai_service.score_headline(row.title)
+            updates.append({"id": row.id, "sentiment": sentiment, "themes_json": json.dumps(themes)})
+        else:
+            sentiment, themes = row.sentiment, json.loads(row.themes_json or "[]")
+        scores[row.id] = (sentiment, themes)
+    if updates:
+        session.execute(update(NewsArticle), updates)
+        session.commit()
+        print(f"✓ Scored {len(updates)} new article(s)")
+    return scores
+
+
+def news_windows_by_day(session: Session, symbol: str, days: List[date]) -> Dict[date, List]:
+    """For each day, the newest articles published in the 7 days up to the end of that day
+    (newest first). Loads the whole range in one query."""
+    if not days:
+        return {}
+    range_start = datetime.combine(min(days), datetime.min.time()) - timedelta(days=NEWS_WINDOW_DAYS)
+    range_end = datetime.combine(max(days), datetime.max.time())
+    rows = session.exec(
+        select(
+            NewsArticle.id, NewsArticle.title, NewsArticle.url, NewsArticle.source,
+            NewsArticle.published_at, NewsArticle.sentiment, NewsArticle.themes_json
+        ).join(
+            NewsArticleSymbol, NewsArticleSymbol.article_id == NewsArticle.id
+        ).where(
+            NewsArticleSymbol.symbol == symbol,
+            NewsArticleSymbol.published_at >= range_start,
+            NewsArticleSymbol.published_at <= range_end
+        ).order_by(NewsArticleSymbol.published_at)
+    ).all()
+    published = [row.published_at for row in rows]
+
+    windows = {}
+    for day in days:
+        day_start = datetime.combine(day, datetime.min.time())
+        lo = bisect_left(published, day_start - timedelta(days=NEWS_WINDOW_DAYS))
+        hi = bisect_right(published, datetime.combine(day, datetime.max.time()))
+        windows[day] = rows[max(lo, hi - NEWS_WINDOW_ARTICLES):hi][::-1]
+    return windows
+
+
+def window_sentiment(window: List, scores: Dict[int, Tuple[float, List[str]]]) -> Tuple[float, List[str]]:
+    """Average headline sentiment and the risk themes present in a window of scored articles."""
+    if not window:
+        return 0.0, []
+    sentiments = [scores[row.id][0] for row in window]
+    present = {theme for row in window for theme in scores[row.id][1]}
+    return sum(sentiments) / len(sentiments), [keyword for keyword in RISK_KEYWORDS if keyword in present]
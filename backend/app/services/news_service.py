@@ -1,13 +1,59 @@
+import asyncio
+import hashlib
 import feedparser
 import httpx
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Optional
 from sqlmodel import Session, select
-from app.models.models import NewsArticle
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.models import NewsArticle, NewsArticleSymbol
+from app.core.config import settings
+from app.services.provider_cache import provider_cache
+from app.services.response_cache import response_cache, NEWS_SCOPE
+from app.services.single_flight import single_flight
 
+GOOGLE_NEWS_RSS_URL = "https://news.google.com/rss/search"
+# Stop querying more search variants once this many relevant articles are collected
+NEWS_RELEVANCE_QUOTA = 10
+# Query params that vary per click/feed but not per story
+TRACKING_PARAMS = {"oc", "ved", "usg", "fbclid", "gclid", "cmpid", "ref"}
 
-def fetch_google_news_rss(symbol: str, days: int = 7) -> List[Dict]:
-    """Fetch news from Google News RSS feed. Tries multiple search queries for better results."""
+
+def google_news_params(query: str) -> Dict[str, str]:
+    # Queries use '+' as the word separator (URL form); httpx does the encoding
+    return {"q": query.replace("+", " "), "hl": "en-US", "gl": "US", "ceid": "US:en"}
+
+
+def fetch_news_feed(query: str):
+    """Fetch and parse one Google News RSS search, served from the provider cache within its TTL.
+
+    Stale entries are revalidated with a conditional GET (ETag / Last-Modified); a 304 reuses the cached feed.
+    """
+    params = google_news_params(query)
+    cached = provider_cache.lookup("google_news", GOOGLE_NEWS_RSS_URL, params)
+    if cached and cached.fresh:
+        return feedparser.parse(cached.body)
+    
+    headers = cached.conditional_headers() if cached else {}
+    response = httpx.get(GOOGLE_NEWS_RSS_URL, params=params, headers=headers, timeout=15, follow_redirects=True)
+    if response.status_code == 304 and cached:
+        provider_cache.mark_revalidated("google_news", cached)
+        return feedparser.parse(cached.body)
+    response.raise_for_status()
+    
+    provider_cache.store(
+        "google_news", GOOGLE_NEWS_RSS_URL, params, response.content,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified")
+    )
+    return feedparser.parse(response.content)
+
+
+def build_news_queries(symbol: str) -> Dict:
+    """Search query variants for a symbol plus the info needed to judge article relevance."""
     # Detect if this is a crypto symbol
     is_crypto = '-' in symbol and any(crypto in symbol.upper() for crypto in ['BTC', 'ETH', 'SOL', 'XRP', 'DOGE', 'ADA', 'MATIC', 'LTC', 'AVAX', 'UNI', 'LINK', 'ATOM', 'ETC', 'XLM', 'ALGO', 'ZEC'])
     
@@ -31,51 +77,66 @@ def fetch_google_news_rss(symbol: str, days: int = 7) -> List[Dict]:
             symbol  # Just the symbol itself
         ]
     
+    return {"queries": search_queries, "is_crypto": is_crypto, "base_symbol": base_symbol}
+
+
+def extract_relevant_articles(feed, symbol: str, is_crypto: bool, base_symbol: str, days: int, seen_urls: set) -> List[Dict]:
+    """Pick recent, relevant entries from a parsed feed, skipping URLs already in `seen_urls`."""
+    articles = []
+    cutoff_date = datetime.now() - timedelta(days=days)
+    
+    for entry in feed.entries[:20]:  # Limit to 20 most recent
+        try:
+            # Skip if we've seen this URL
+            if entry.link in seen_urls:
+                continue
+            
+            published = datetime(*entry.published_parsed[:6])
+            if published >= cutoff_date:
+                # Check if article is relevant (contains symbol or relevant keywords)
+                title_lower = entry.title.lower()
+                symbol_lower = symbol.lower()
+                base_symbol_lower = base_symbol.lower() if is_crypto else symbol_lower
+                
+                # Different relevance checks for crypto vs stocks
+                if is_crypto:
+                    relevant_keywords = ['crypto', 'cryptocurrency', 'bitcoin', 'ethereum', 'blockchain', 'trading', 'market', 'price']
+                    is_relevant = (base_symbol_lower in title_lower or symbol_lower in title_lower or 
+                                 any(kw in title_lower for kw in relevant_keywords))
+                else:
+                    relevant_keywords = ['stock', 'share', 'trading', 'market', 'earnings', 'revenue']
+                    is_relevant = (symbol_lower in title_lower or 
+                                 any(kw in title_lower for kw in relevant_keywords))
+                
+                if is_relevant:
+                    articles.append({
+                        "title": entry.title,
+                        "url": entry.link,
+                        "published_at": published,
+                        "source": entry.get("source", {}).get("title", "Unknown")
+                    })
+                    seen_urls.add(entry.link)
+        except:
+            continue
+    
+    return articles
+
+
+def fetch_google_news_rss(symbol: str, days: int = 7) -> List[Dict]:
+    """Fetch news from Google News RSS feed. Tries multiple search queries for better results."""
+    plan = build_news_queries(symbol)
     all_articles = []
     seen_urls = set()
     
-    for query in search_queries:
+    for query in plan["queries"]:
         try:
-            url = f"https://news.google.com/rss/search?q={query}&hl=en-US&gl=US&ceid=US:en"
-            feed = feedparser.parse(url)
-            cutoff_date = datetime.now() - timedelta(days=days)
-            
-            for entry in feed.entries[:20]:  # Limit to 20 most recent
-                try:
-                    # Skip if we've seen this URL
-                    if entry.link in seen_urls:
-                        continue
-                    
-                    published = datetime(*entry.published_parsed[:6])
-                    if published >= cutoff_date:
-                        # Check if article is relevant (contains symbol or relevant keywords)
-                        title_lower = entry.title.lower()
-                        symbol_lower = symbol.lower()
-                        base_symbol_lower = base_symbol.lower() if is_crypto else symbol_lower
-                        
-                        # Different relevance checks for crypto vs stocks
-                        if is_crypto:
-                            relevant_keywords = ['crypto', 'cryptocurrency', 'bitcoin', 'ethereum', 'blockchain', 'trading', 'market', 'price']
-                            is_relevant = (base_symbol_lower in title_lower or symbol_lower in title_lower or 
-                                         any(kw in title_lower for kw in relevant_keywords))
-                        else:
-                            relevant_keywords = ['stock', 'share', 'trading', 'market', 'earnings', 'revenue']
-                            is_relevant = (symbol_lower in title_lower or 
-                                         any(kw in title_lower for kw in relevant_keywords))
-                        
-                        if is_relevant:
-                            all_articles.append({
-                                "title": entry.title,
-                                "url": entry.link,
-                                "published_at": published,
-                                "source": entry.get("source", {}).get("title", "Unknown")
-                            })
-                            seen_urls.add(entry.link)
-                except:
-                    continue
+            feed = fetch_news_feed(query)
+            all_articles.extend(extract_relevant_articles(
+                feed, symbol, plan["is_crypto"], plan["base_symbol"], days, seen_urls
+            ))
             
             # If we got good results, break early
-            if len(all_articles) >= 10:
+            if len(all_articles) >= NEWS_RELEVANCE_QUOTA:
                 break
         except Exception as e:
             print(f"Error fetching news for {symbol} with query '{query}': {e}")
@@ -86,42 +147,197 @@ def fetch_google_news_rss(symbol: str, days: int = 7) -> List[Dict]:
     return all_articles[:20]  # Return up to 20 articles
 
 
-def store_news_articles(session: Session, symbol: str, articles: List[Dict]):
-    """Store news articles in database, avoiding duplicates."""
-    for article in articles:
-        existing = session.exec(
-            select(NewsArticle).where(
-                NewsArticle.symbol == symbol,
-                NewsArticle.url == article["url"]
-            )
-        ).first()
-        
-        if not existing:
-            news_article = NewsArticle(
-                symbol=symbol,
-                title=article["title"],
-                url=article["url"],
-                published_at=article["published_at"],
-                source=article["source"]
+# Shared async client and per-host concurrency caps, bound to the running event loop
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def get_news_client() -> httpx.AsyncClient:
+    """Pooled AsyncClient for news fetches (recreated if the event loop changed)."""
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            timeout=15,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=settings.news_max_connections,
+                max_keepalive_connections=settings.news_max_connections
             )
-            session.add(news_article)
+        )
+        _async_client_loop = loop
+        _host_semaphores.clear()
+    return _async_client
+
+
+def _host_semaphore(url: str) -> asyncio.Semaphore:
+    host = httpx.URL(url).host
+    if host not in _host_semaphores:
+        _host_semaphores[host] = asyncio.Semaphore(settings.news_per_host_concurrency)
+    return _host_semaphores[host]
+
+
+async def close_news_client():
+    global _async_client, _async_client_loop
+    if _async_client is not None:
+        await _async_client.aclose()
+    _async_client = None
+    _async_client_loop = None
+
+
+async def fetch_news_feed_async(query: str):
+    """Async fetch_news_feed: pooled client, per-host concurrency cap, parsing off the event loop."""
+    params = google_news_params(query)
+    cached = await asyncio.to_thread(provider_cache.lookup, "google_news", GOOGLE_NEWS_RSS_URL, params)
+    if cached and cached.fresh:
+        return await asyncio.to_thread(feedparser.parse, cached.body)
+    
+    client = get_news_client()
+    headers = cached.conditional_headers() if cached else {}
+    async with _host_semaphore(GOOGLE_NEWS_RSS_URL):
+        response = await client.get(GOOGLE_NEWS_RSS_URL, params=params, headers=headers)
+    if response.status_code == 304 and cached:
+        await asyncio.to_thread(provider_cache.mark_revalidated, "google_news", cached)
+        return await asyncio.to_thread(feedparser.parse, cached.body)
+    response.raise_for_status()
+    
+    await asyncio.to_thread(
+        provider_cache.store, "google_news", GOOGLE_NEWS_RSS_URL, params, response.content,
+        response.headers.get("ETag"), response.headers.get("Last-Modified")
+    )
+    return await asyncio.to_thread(feedparser.parse, response.content)
+
+
+async def fetch_google_news_rss_async(symbol: str, days: int = 7, quota: int = NEWS_RELEVANCE_QUOTA) -> List[Dict]:
+    """Fetch all query variants concurrently; cancel the rest once `quota` relevant articles are in."""
+    plan = build_news_queries(symbol)
+    all_articles = []
+    seen_urls = set()
+    tasks = {asyncio.create_task(fetch_news_feed_async(query)): query for query in plan["queries"]}
+    
+    try:
+        for next_done in asyncio.as_completed(list(tasks)):
+            try:
+                feed = await next_done
+            except Exception as e:
+                print(f"Error fetching news for {symbol}: {e}")
+                continue
+            all_articles.extend(extract_relevant_articles(
+                feed, symbol, plan["is_crypto"], plan["base_symbol"], days, seen_urls
+            ))
+            if len(all_articles) >= quota:
+                break
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    
+    all_articles.sort(key=lambda x: x["published_at"], reverse=True)
+    return all_articles[:20]
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of an article URL: lowercase scheme/host, no fragment, tracking params or trailing slash."""
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith("utm_")
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+
+
+def url_hash(url: str) -> str:
+    return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+
+def store_news_articles_bulk(session: Session, articles_by_symbol: Dict[str, List[Dict]]) -> int:
+    """Store each story once and link it to every symbol it was fetched for, in two statements.
+    Returns the number of new (symbol, story) links."""
+    stories = {}
+    links = set()
+    for symbol, articles in articles_by_symbol.items():
+        for article in articles:
+            hashed = url_hash(article["url"])
+            stories.setdefault(hashed, {
+                "title": article["title"],
+                "url": article["url"],
+                "url_hash": hashed,
+                "published_at": article["published_at"],
+                "source": article["source"]
+            })
+            links.add((symbol, hashed))
+    if not stories:
+        return 0
     
+    table = NewsArticle.__table__
+    session.execute(pg_insert(table).values(list(stories.values())).on_conflict_do_nothing(
+        index_elements=[table.c.url_hash]
+    ))
+    # Stories stored earlier keep their row (and any stored sentiment); read back every id to link
+    stored = {
+        row.url_hash: row for row in session.execute(
+            select(table.c.id, table.c.url_hash, table.c.published_at).where(table.c.url_hash.in_(list(stories)))
+        )
+    }
+    link_table = NewsArticleSymbol.__table__
+    stmt = pg_insert(link_table).values([
+        {"symbol": symbol, "article_id": stored[hashed].id, "published_at": stored[hashed].published_at}
+        for symbol, hashed in links
+    ]).on_conflict_do_nothing(
+        index_elements=[link_table.c.symbol, link_table.c.article_id]
+    ).returning(link_table.c.article_id)
+    inserted = len(session.execute(stmt).all())
     session.commit()
+    if inserted:
+        response_cache.bump(NEWS_SCOPE, *articles_by_symbol)
+    return inserted
+
+
+def store_news_articles(session: Session, symbol: str, articles: List[Dict]) -> int:
+    """Store news articles in database, avoiding duplicates."""
+    return store_news_articles_bulk(session, {symbol: articles})
+
+
+def recent_news_statement(symbol: str, limit: int = 15):
+    cutoff = datetime.now() - timedelta(days=7)
+    return select(NewsArticle).join(
+        NewsArticleSymbol, NewsArticleSymbol.article_id == NewsArticle.id
+    ).where(
+        NewsArticleSymbol.symbol == symbol,
+        NewsArticleSymbol.published_at >= cutoff
+    ).order_by(NewsArticleSymbol.published_at.desc()).limit(limit)
 
 
 def get_recent_news(session: Session, symbol: str, limit: int = 15) -> List[NewsArticle]:
     """Get recent news articles for a ticker."""
-    cutoff = datetime.now() - timedelta(days=7)
-    statement = select(NewsArticle).where(
-        NewsArticle.symbol == symbol,
+    return list(session.exec(recent_news_statement(symbol, limit)))
+
+
+async def get_recent_news_async(session: AsyncSession, symbol: str, limit: int = 15) -> List[NewsArticle]:
+    """get_recent_news on an async session."""
+    return list(await session.exec(recent_news_statement(symbol, limit)))
+
+
+def recent_stories_statement(cutoff: datetime, limit: int):
+    """Newest stories across all symbols since `cutoff`, each once, as (article, symbol) rows.
+    A story linked to several symbols is labelled with the first of them."""
+    return select(NewsArticle, func.min(NewsArticleSymbol.symbol)).join(
+        NewsArticleSymbol, NewsArticleSymbol.article_id == NewsArticle.id
+    ).where(
         NewsArticle.published_at >= cutoff
-    ).order_by(NewsArticle.published_at.desc()).limit(limit)
-    
-    return list(session.exec(statement))
+    ).group_by(NewsArticle.id).order_by(NewsArticle.published_at.desc()).limit(limit)
 
 
-def refresh_ticker_news(session: Session, symbol: str) -> Dict:
-    """Refresh news for a ticker."""
+def _refreshed_elsewhere() -> Dict:
+    # Another process just stored this symbol's news; nothing new to count here
+    return {"success": True, "count": 0, "coalesced": True}
+
+
+def _refresh_ticker_news(session: Session, symbol: str) -> Dict:
     try:
         articles = fetch_google_news_rss(symbol)
         store_news_articles(session, symbol, articles)
@@ -132,3 +348,28 @@ def refresh_ticker_news(session: Session, symbol: str) -> Dict:
     except Exception as e:
         return {"error": str(e)}
 
+
+def refresh_ticker_news(session: Session, symbol: str) -> Dict:
+    """Refresh news for a ticker. Concurrent refreshes of the same symbol are coalesced."""
+    return single_flight.do(("news", symbol), lambda: _refresh_ticker_news(session, symbol), fallback=_refreshed_elsewhere)
+
+
+async def _refresh_ticker_news_async(session: Session, symbol: str) -> Dict:
+    try:
+        articles = await fetch_google_news_rss_async(symbol)
+        await asyncio.to_thread(store_news_articles, session, symbol, articles)
+        return {
+            "success": True,
+            "count": len(articles)
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+
+async def refresh_ticker_news_async(session: Session, symbol: str) -> Dict:
+    """Refresh news for a ticker with concurrent query fetches; the DB write runs off the event loop.
+    Shares the in-flight table with refresh_ticker_news, so sync and async refreshes coalesce."""
+    return await single_flight.do_async(
+        ("news", symbol), lambda: _refresh_ticker_news_async(session, symbol), fallback=_refreshed_elsewhere
+    )
+
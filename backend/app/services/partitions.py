@@ -0,0 +1,149 @@
+"""
+Monthly range partitions for the snapshot tables (metricssnapshot, risksnapshot, aisnapshot).
+Migration 004 turns them into tables partitioned by ts with a DEFAULT partition; this module keeps
+them maintained. Partitions are created a few months ahead, plus one for any month whose rows
+landed in the default partition (e.g. a historical backfill), and whole months past each table's
+retention are dropped instead of deleted row by row. Where a table is not partitioned (SQLite, or
+before the migration) retention falls back to a DELETE.
+"""
+import re
+from datetime import datetime
+from typing import Dict, List
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from app.core.config import settings
+from app.core.database import jobs_engine
+
+PARTITION_KEY = "ts"
+PARTITION_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def retention_policies() -> Dict[str, int]:
+    """Months of history kept per partitioned table (0 keeps everything)."""
+    return {
+        "metricssnapshot": settings.metrics_retention_months,
+        "risksnapshot": settings.risk_retention_months,
+        "aisnapshot": settings.ai_snapshot_retention_months,
+    }
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month: datetime, n: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + n
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def _qualified(table: str, name: str) -> str:
+    """Partition names come back unqualified; keep the parent's schema prefix if it has one."""
+    return f"{table.rsplit('.', 1)[0]}.{name}" if "." in table else name
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+        {"table": table}
+    ).scalar())
+
+
+def list_partitions(conn: Connection, table: str) -> Dict[datetime, str]:
+    """{month: partition name} for the table's monthly partitions (the default partition is excluded)."""
+    rows = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:table)
+    """), {"table": table}).fetchall()
+    partitions = {}
+    for (name,) in rows:
+        match = PARTITION_SUFFIX.search(name)
+        if match:
+            partitions[datetime(int(match.group(1)), int(match.group(2)), 1)] = _qualified(table, name)
+    return partitions
+
+
+def create_month_partition(conn: Connection, table: str, month: datetime) -> str:
+    """Create and attach the partition for `month`, moving any of its rows out of the default partition."""
+    name = partition_name(table, month)
+    start, end = month, add_months(month, 1)
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    default = default_partition_name(table)
+    if conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": default}).scalar():
+        conn.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {default} WHERE {PARTITION_KEY} >= :start AND {PARTITION_KEY} < :end RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """), {"start": start, "end": end})
+    conn.execute(text(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+    ))
+    return name
+
+
+def ensure_partitions(conn: Connection, table: str, months_ahead: int) -> List[str]:
+    """Create missing partitions for this month, the next `months_ahead` months and any month
+    sitting in the default partition. Returns the names created."""
+    existing = list_partitions(conn, table)
+    current = month_start(datetime.utcnow())
+    wanted = {add_months(current, n) for n in range(months_ahead + 1)}
+    default = default_partition_name(table)
+    if conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": default}).scalar():
+        wanted.update(
+            month_start(row[0]) for row in conn.execute(
+                text(f"SELECT DISTINCT date_trunc('month', {PARTITION_KEY}) FROM {default}")
+            ).fetchall()
+        )
+    return [create_month_partition(conn, table, month) for month in sorted(wanted - set(existing))]
+
+
+def drop_expired_partitions(conn: Connection, table: str, retention_months: int) -> Dict:
+    """Drop whole months older than the retention window (plus stragglers in the default partition)."""
+    if retention_months <= 0:
+        return {"dropped": [], "deleted_rows": 0}
+    cutoff = add_months(month_start(datetime.utcnow()), -retention_months)
+    if not is_partitioned(conn, table):
+        result = conn.execute(text(f"DELETE FROM {table} WHERE {PARTITION_KEY} < :cutoff"), {"cutoff": cutoff})
+        return {"dropped": [], "deleted_rows": result.rowcount or 0}
+    dropped = []
+    for month, name in sorted(list_partitions(conn, table).items()):
+        if add_months(month, 1) <= cutoff:
+            conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    result = conn.execute(
+        text(f"DELETE FROM {default_partition_name(table)} WHERE {PARTITION_KEY} < :cutoff"), {"cutoff": cutoff}
+    )
+    return {"dropped": dropped, "deleted_rows": result.rowcount or 0}
+
+
+def maintain_partitions() -> Dict[str, Dict]:
+    """Create upcoming partitions and apply retention for every snapshot table (one transaction each)."""
+    summary = {}
+    for table, retention_months in retention_policies().items():
+        try:
+            with jobs_engine.begin() as conn:
+                partitioned = is_partitioned(conn, table)
+                # Retention first, so expired rows in the default partition don't get a partition created
+                expired = drop_expired_partitions(conn, table, retention_months)
+                created = ensure_partitions(conn, table, settings.partition_months_ahead) if partitioned else []
+            summary[table] = {"partitioned": partitioned, "created": created, **expired}
+            if created or expired["dropped"] or expired["deleted_rows"]:
+                print(
+                    f"✓ {table}: created {len(created)} partition(s), dropped {len(expired['dropped'])}, "
+                    f"deleted {expired['deleted_rows']} expired row(s)"
+                )
+        except Exception as e:
+            print(f"⚠ Partition maintenance failed for {table}: {e}")
+            summary[table] = {"error": str(e)}
+    return summary
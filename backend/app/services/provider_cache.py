@@ -0,0 +1,210 @@
+"""
+On-disk cache for external provider responses (Alpha Vantage, Google News RSS).
+Entries are keyed by provider + endpoint + request params (secrets excluded), expire after a
+per-provider TTL, keep ETag/Last-Modified validators for conditional revalidation, and are
+evicted least-recently-used once the store exceeds its size cap. Backed by SQLite so it
+survives restarts and is shared by every worker process on the host.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from app.core.config import settings
+
+# Request params that identify the caller, not the resource
+SECRET_PARAMS = {"apikey", "api_key", "key", "token"}
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def text(self) -> str:
+        return self.body.decode("utf-8")
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers for a conditional GET revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ProviderCache:
+    """SQLite-backed response cache with per-provider TTLs, LRU size cap and hit/miss counters."""
+
+    def __init__(self, path: str, max_bytes: int, ttls: Dict[str, float], default_ttl: float = 300, enabled: bool = True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.counters = {"hits": 0, "misses": 0, "stale": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS provider_cache (
+                    key TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    stored_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_provider_cache_last_access ON provider_cache(last_access)")
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(provider: str, endpoint: str, params: Optional[Dict] = None) -> str:
+        public_params = {k: v for k, v in (params or {}).items() if k.lower() not in SECRET_PARAMS}
+        raw = json.dumps([provider, endpoint, public_params], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, provider: str) -> float:
+        return self.ttls.get(provider, self.default_ttl)
+
+    def lookup(self, provider: str, endpoint: str, params: Optional[Dict] = None) -> Optional[CacheEntry]:
+        """Return the cached entry (fresh or stale) and count the hit/miss. Check `entry.fresh`."""
+        if not self.enabled:
+            return None
+        key = self.make_key(provider, endpoint, params)
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT body, etag, last_modified, stored_at, expires_at FROM provider_cache WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                if row is None:
+                    self.counters["misses"] += 1
+                    return None
+                conn.execute("UPDATE provider_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+                entry = CacheEntry(key, row[0], row[1], row[2], row[3], row[4])
+                self.counters["hits" if entry.fresh else "stale"] += 1
+                return entry
+        except sqlite3.Error as e:
+            print(f"⚠ Provider cache lookup failed: {e}")
+            return None
+
+    def is_fresh(self, provider: str, endpoint: str, params: Optional[Dict] = None) -> bool:
+        """Peek whether a fresh entry exists, without counting a lookup or touching LRU order."""
+        if not self.enabled:
+            return False
+        key = self.make_key(provider, endpoint, params)
+        try:
+            with self._lock:
+                row = self._connection().execute(
+                    "SELECT expires_at FROM provider_cache WHERE key = ?", (key,)
+                ).fetchone()
+            return row is not None and time.time() < row[0]
+        except sqlite3.Error:
+            return False
+
+    def store(
+        self,
+        provider: str,
+        endpoint: str,
+        params: Optional[Dict],
+        body,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None
+    ):
+        """Cache a successful response body (str or bytes)."""
+        if not self.enabled:
+            return
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        key = self.make_key(provider, endpoint, params)
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO provider_cache
+                        (key, provider, body, size, etag, last_modified, stored_at, expires_at, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (key, provider, body, len(body), etag, last_modified, now, now + self.ttl_for(provider), now)
+                )
+                self.counters["stores"] += 1
+                self._evict_locked(conn)
+        except sqlite3.Error as e:
+            print(f"⚠ Provider cache store failed: {e}")
+
+    def mark_revalidated(self, provider: str, entry: CacheEntry):
+        """A conditional GET returned 304: extend the entry's lifetime without rewriting the body."""
+        if not self.enabled:
+            return
+        now = time.time()
+        entry.expires_at = now + self.ttl_for(provider)
+        try:
+            with self._lock:
+                self._connection().execute(
+                    "UPDATE provider_cache SET expires_at = ?, last_access = ? WHERE key = ?",
+                    (entry.expires_at, now, entry.key)
+                )
+                self.counters["revalidated"] += 1
+        except sqlite3.Error as e:
+            print(f"⚠ Provider cache revalidation update failed: {e}")
+
+    def _evict_locked(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM provider_cache").fetchone()[0]
+        while total > self.max_bytes:
+            row = conn.execute("SELECT key, size FROM provider_cache ORDER BY last_access LIMIT 1").fetchone()
+            if row is None:
+                break
+            conn.execute("DELETE FROM provider_cache WHERE key = ?", (row[0],))
+            total -= row[1]
+            self.counters["evictions"] += 1
+
+    def stats(self) -> Dict:
+        stats = dict(self.counters)
+        lookups = stats["hits"] + stats["stale"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["enabled"] = self.enabled
+        if self.enabled:
+            try:
+                with self._lock:
+                    entries, size = self._connection().execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM provider_cache"
+                    ).fetchone()
+                stats.update({"entries": entries, "bytes": size, "max_bytes": self.max_bytes})
+            except sqlite3.Error:
+                pass
+        return stats
+
+
+provider_cache = ProviderCache(
+    path=settings.provider_cache_path,
+    max_bytes=settings.provider_cache_max_bytes,
+    ttls={
+        "alphavantage": settings.provider_cache_ttl_alphavantage_seconds,
+        "google_news": settings.provider_cache_ttl_news_seconds,
+    },
+    enabled=settings.provider_cache_enabled
+)
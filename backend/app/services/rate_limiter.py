@@ -0,0 +1,217 @@
+"""
+Shared rate limiting for provider API keys.
+Each API key gets its own token bucket (per-minute limit) and a daily-quota ledger entry.
+Callers are handed the key with the most remaining quota that has a token available, so
+throughput scales with the number of configured keys. Rate-limit responses are reported
+back and put the offending key on cooldown.
+"""
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from app.core.config import settings
+
+
+class RateLimitExceeded(ValueError):
+    """No key can serve a request right now. Message mentions "rate limit" so existing handlers map it."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket: `rate_per_minute` tokens refill continuously up to `capacity`."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated_at = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def try_consume(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def seconds_until_token(self) -> float:
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate_per_second
+
+    def drain(self):
+        self.tokens = 0.0
+        self.updated_at = self.clock()
+
+
+@dataclass
+class KeyState:
+    key: str
+    bucket: TokenBucket
+    used_today: int = 0
+    cooldown_until: float = 0.0
+    rate_limited_count: int = 0
+
+
+class ApiKeyPool:
+    """Thread-safe pool of API keys with per-key token buckets, daily quota and cooldowns."""
+
+    def __init__(
+        self,
+        keys: List[str],
+        calls_per_minute: float,
+        daily_limit: int,
+        cooldown_seconds: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.daily_limit = daily_limit
+        self.cooldown_seconds = cooldown_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._ledger_day = datetime.utcnow().date()
+        self._states: Dict[str, KeyState] = {
+            key: KeyState(key=key, bucket=TokenBucket(calls_per_minute, clock=clock))
+            for key in keys
+        }
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self._states)
+
+    def _roll_ledger(self):
+        today = datetime.utcnow().date()
+        if today != self._ledger_day:
+            self._ledger_day = today
+            for state in self._states.values():
+                state.used_today = 0
+
+    def _remaining_today(self, state: KeyState) -> float:
+        if self.daily_limit <= 0:
+            return float("inf")
+        return self.daily_limit - state.used_today
+
+    def _try_acquire_locked(self) -> Optional[str]:
+        self._roll_ledger()
+        now = self.clock()
+        candidates = [
+            state for state in self._states.values()
+            if state.cooldown_until <= now and self._remaining_today(state) > 0 and state.bucket.available() >= 1
+        ]
+        if not candidates:
+            return None
+        # Rotate towards the key with the most quota left, then the fullest bucket
+        best = max(candidates, key=lambda s: (self._remaining_today(s), s.bucket.available()))
+        best.bucket.try_consume()
+        best.used_today += 1
+        return best.key
+
+    def _next_available_in_locked(self) -> Optional[float]:
+        """Seconds until some key can serve a request, or None if every key is out of daily quota."""
+        now = self.clock()
+        waits = [
+            max(state.cooldown_until - now, state.bucket.seconds_until_token())
+            for state in self._states.values()
+            if self._remaining_today(state) > 0
+        ]
+        return max(0.0, min(waits)) if waits else None
+
+    def try_acquire(self) -> Optional[str]:
+        """Take a token from the best key without waiting. Returns None if none is ready."""
+        with self._lock:
+            return self._try_acquire_locked()
+
+    def acquire_nowait(self) -> str:
+        """Take a token from the best key or raise RateLimitExceeded."""
+        if not self._states:
+            raise ValueError("ALPHAVANTAGE_API_KEY not set in environment variables")
+        with self._lock:
+            key = self._try_acquire_locked()
+            if key:
+                return key
+            retry_after = self._next_available_in_locked()
+        if retry_after is None:
+            raise RateLimitExceeded("Daily rate limit reached for all configured API keys")
+        raise RateLimitExceeded(f"Rate limit reached, next key available in {retry_after:.0f}s", retry_after)
+
+    async def acquire(self, timeout: Optional[float] = None) -> str:
+        """Wait (without blocking the event loop) until a key has a token, then take it."""
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            try:
+                return self.acquire_nowait()
+            except RateLimitExceeded as e:
+                if e.retry_after is None:
+                    raise
+                if deadline is not None and self.clock() + e.retry_after > deadline:
+                    raise
+                await asyncio.sleep(max(e.retry_after, 0.05))
+
+    def report_rate_limited(self, key: str, retry_after: Optional[float] = None):
+        """Feed a 429 / "Note" response back so the key cools down before it is used again."""
+        with self._lock:
+            state = self._states.get(key)
+            if not state:
+                return
+            state.rate_limited_count += 1
+            state.cooldown_until = self.clock() + (retry_after if retry_after else self.cooldown_seconds)
+            state.bucket.drain()
+
+    def report_quota_exhausted(self, key: str):
+        """The provider says this key is out of daily quota; stop using it until the ledger rolls over."""
+        with self._lock:
+            state = self._states.get(key)
+            if state and self.daily_limit > 0:
+                state.used_today = self.daily_limit
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._roll_ledger()
+            now = self.clock()
+            return {
+                "day": self._ledger_day.isoformat(),
+                "keys": [
+                    {
+                        "key": f"...{state.key[-4:]}",
+                        "used_today": state.used_today,
+                        "remaining_today": None if self.daily_limit <= 0 else max(0, self._remaining_today(state)),
+                        "tokens": round(state.bucket.available(), 2),
+                        "cooldown_seconds": round(max(0.0, state.cooldown_until - now), 1),
+                        "rate_limited_count": state.rate_limited_count
+                    }
+                    for state in self._states.values()
+                ]
+            }
+
+
+def parse_api_keys(*values: Optional[str]) -> List[str]:
+    """Split comma-separated key settings into a de-duplicated list, preserving order."""
+    keys: List[str] = []
+    for value in values:
+        for key in (value or "").split(","):
+            key = key.strip()
+            if key and key not in keys:
+                keys.append(key)
+    return keys
+
+
+alphavantage_keys = ApiKeyPool(
+    keys=parse_api_keys(settings.alphavantage_api_keys, settings.alphavantage_api_key),
+    calls_per_minute=settings.alphavantage_calls_per_minute,
+    daily_limit=settings.alphavantage_daily_limit,
+    cooldown_seconds=settings.alphavantage_cooldown_seconds
+)
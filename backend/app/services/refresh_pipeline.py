@@ -0,0 +1,231 @@
+"""
+Staged refresh pipeline used by the background scheduler.
+Each symbol flows through price fetch -> news fetch -> AI analysis -> scoring/persist.
+Every stage has its own bounded worker pool and a bounded queue in front of it, so a slow
+provider applies backpressure to the stage before it instead of stalling the whole cycle,
+and a failing or slow symbol only affects itself.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional
+from sqlmodel import Session
+from app.core.database import jobs_engine
+from app.core.config import settings
+from app.core.executor import run_blocking
+from app.services.market_data import refresh_ticker_market_data_async, fetch_yfinance_batch
+from app.services.news_service import refresh_ticker_news_async, get_recent_news
+from app.services.ai_service import NewsAnalysisBatcher, ai_service, ai_usage, store_ai_snapshot
+from app.services.risk_scoring import calculate_risk_score
+from app.services.alphavantage_data import is_crypto_symbol, has_fresh_alphavantage_response
+from app.services.rate_limiter import alphavantage_keys
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class StageError(Exception):
+    """Raised by a stage handler to drop a symbol from the rest of the pipeline."""
+
+
+@dataclass
+class SymbolJob:
+    """State carried by one symbol as it moves through the pipeline."""
+    symbol: str
+    api_key: Optional[str] = None
+    prefetched: Optional["pd.DataFrame"] = None
+    metrics: Optional[Dict] = None
+    ai_result: Optional[Dict] = None
+    error: Optional[str] = None
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class Stage:
+    name: str
+    handler: Callable[[SymbolJob], Awaitable[None]]
+    workers: int
+    critical: bool = True  # Non-critical failures are logged and the symbol moves on
+    # Awaited before the timed handler, e.g. waiting for a rate-limit token
+    admit: Optional[Callable[[SymbolJob], Awaitable[None]]] = None
+
+
+async def _price_stage(job: SymbolJob):
+    # Alpha Vantage is awaited on the pooled client; session work runs on the blocking pool
+    with Session(jobs_engine) as session:
+        result = await refresh_ticker_market_data_async(session, job.symbol, api_key=job.api_key, prefetched=job.prefetched)
+    if result.get("error"):
+        raise StageError(result["error"])
+    job.metrics = result["metrics"]
+
+
+def _prefetch_yfinance(symbols: List[str]) -> Dict[str, "pd.DataFrame"]:
+    with Session(jobs_engine) as session:
+        return fetch_yfinance_batch(session, symbols)
+
+
+async def _news_stage(job: SymbolJob):
+    # Query variants are fetched concurrently on the loop; only the DB write uses a thread
+    with Session(jobs_engine) as session:
+        result = await refresh_ticker_news_async(session, job.symbol)
+    if result.get("error"):
+        raise StageError(result["error"])
+
+
+def _score_stage(job: SymbolJob):
+    ai_result = job.ai_result
+    with Session(jobs_engine) as session:
+        store_ai_snapshot(session, job.symbol, ai_result)
+        calculate_risk_score(session, job.symbol, job.metrics, ai_result)
+
+
+def _in_thread(fn: Callable[[SymbolJob], None]) -> Callable[[SymbolJob], Awaitable[None]]:
+    """Run a blocking stage handler off the event loop."""
+    async def handler(job: SymbolJob):
+        await asyncio.to_thread(fn, job)
+    return handler
+
+
+class RefreshPipeline:
+    """Bounded-concurrency, multi-stage refresh of a set of symbols."""
+
+    def __init__(
+        self,
+        stages: Optional[List[Stage]] = None,
+        queue_size: Optional[int] = None,
+        stage_timeout: Optional[float] = None
+    ):
+        # Batch-download yfinance symbols up front only when running the real price stage
+        self.prefetch_batch = stages is None
+        self._price_batch: Optional[asyncio.Task] = None
+        self._ai_batcher: Optional[NewsAnalysisBatcher] = None
+        self.stages = stages or [
+            Stage("price", _price_stage, settings.refresh_price_workers, admit=self._admit_price),
+            Stage("news", _news_stage, settings.refresh_news_workers, critical=False),
+            # Each worker holds one symbol while it waits for its batch, so allow
+            # refresh_ai_workers concurrent batched requests of up to ai_batch_max_symbols
+            Stage("ai", self._ai_stage, settings.refresh_ai_workers * settings.ai_batch_max_symbols),
+            Stage("score", _in_thread(_score_stage), settings.refresh_score_workers),
+        ]
+        self.queue_size = queue_size or settings.refresh_queue_size
+        self.stage_timeout = stage_timeout or settings.refresh_stage_timeout_seconds
+
+    async def _ai_stage(self, job: SymbolJob):
+        # Symbols reaching this stage together share one packed LLM request
+        market_data = {
+            "price": job.metrics["price"],
+            "return_7d": job.metrics["return_7d"],
+            "vol_ann": job.metrics["vol_ann"],
+            "max_drawdown": job.metrics["max_drawdown"]
+        }
+        with Session(jobs_engine) as session:
+            news_articles = await run_blocking(get_recent_news, session, job.symbol, limit=15)
+        if self._ai_batcher is None:
+            self._ai_batcher = NewsAnalysisBatcher(
+                ai_service,
+                max_symbols=settings.ai_batch_max_symbols,
+                max_wait=settings.ai_batch_max_wait_seconds,
+                max_concurrent=settings.refresh_ai_workers
+            )
+        job.ai_result = await self._ai_batcher.analyze(job.symbol, news_articles, market_data)
+
+    async def _admit_price(self, job: SymbolJob):
+        # Crypto goes through yfinance (batch-downloaded for the whole cycle);
+        # stocks need an Alpha Vantage key from the shared pool
+        if is_crypto_symbol(job.symbol):
+            if self._price_batch is not None:
+                try:
+                    frames = await asyncio.shield(self._price_batch)
+                except Exception as e:
+                    print(f"⚠ yfinance batch prefetch failed, falling back to per-symbol fetch: {e}")
+                    frames = {}
+                job.prefetched = frames.get(job.symbol)
+        elif not has_fresh_alphavantage_response(job.symbol):
+            job.api_key = await alphavantage_keys.acquire()
+
+    async def _worker(self, stage: Stage, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue], failed: List[SymbolJob]):
+        while True:
+            job = await inbox.get()
+            started = time.monotonic()
+            try:
+                if stage.admit:
+                    await stage.admit(job)
+                    started = time.monotonic()
+                await asyncio.wait_for(stage.handler(job), timeout=self.stage_timeout)
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    message = f"{stage.name} stage timed out after {self.stage_timeout:.0f}s"
+                else:
+                    message = str(e) or e.__class__.__name__
+                if stage.critical:
+                    job.error = f"{stage.name}: {message}"
+                    failed.append(job)
+                    print(f"✗ Refresh pipeline dropped {job.symbol} at {stage.name} stage: {message}")
+                else:
+                    print(f"⚠ {stage.name} stage failed for {job.symbol} (non-critical): {message}")
+            finally:
+                job.stage_seconds[stage.name] = time.monotonic() - started
+            try:
+                if job.error is None and outbox is not None:
+                    # Blocks while the next stage is saturated (backpressure)
+                    await outbox.put(job)
+            finally:
+                inbox.task_done()
+
+    async def run(self, symbols: List[str]) -> Dict:
+        """Push every symbol through all stages and return a cycle summary."""
+        started = time.monotonic()
+        llm_requests = ai_usage["requests"]
+        symbols = list(dict.fromkeys(symbols))  # Each symbol is processed once per cycle
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        done: asyncio.Queue = asyncio.Queue()
+        failed: List[SymbolJob] = []
+
+        batch_symbols = [symbol for symbol in symbols if is_crypto_symbol(symbol)]
+        if self.prefetch_batch and batch_symbols:
+            self._price_batch = asyncio.create_task(asyncio.to_thread(_prefetch_yfinance, batch_symbols))
+
+        workers_by_stage = []
+        for idx, stage in enumerate(self.stages):
+            outbox = queues[idx + 1] if idx + 1 < len(self.stages) else done
+            workers_by_stage.append([
+                asyncio.create_task(self._worker(stage, queues[idx], outbox, failed))
+                for _ in range(max(1, stage.workers))
+            ])
+
+        try:
+            for symbol in symbols:
+                await queues[0].put(SymbolJob(symbol=symbol))
+            # Drain stages in order: once a stage's queue is joined every job it
+            # accepted has been handed to the next stage (or dropped)
+            for queue, workers in zip(queues, workers_by_stage):
+                await queue.join()
+                for task in workers:
+                    task.cancel()
+        finally:
+            for workers in workers_by_stage:
+                for task in workers:
+                    task.cancel()
+
+        succeeded = []
+        while not done.empty():
+            succeeded.append(done.get_nowait())
+
+        stage_seconds = {stage.name: 0.0 for stage in self.stages}
+        for job in succeeded + failed:
+            for name, seconds in job.stage_seconds.items():
+                stage_seconds[name] += seconds
+
+        return {
+            "total": len(symbols),
+            "succeeded": [job.symbol for job in succeeded],
+            "failed": {job.symbol: job.error for job in failed},
+            "duration_seconds": round(time.monotonic() - started, 2),
+            "llm_requests": ai_usage["requests"] - llm_requests,
+            "stage_seconds": {name: round(seconds, 2) for name, seconds in stage_seconds.items()}
+        }
+
+
+async def run_refresh_pipeline(symbols: List[str]) -> Dict:
+    """Refresh the given symbols through the staged pipeline."""
+    return await RefreshPipeline().run(symbols)
@@ -0,0 +1,132 @@
+"""
+In-process read-through cache for hot API responses (/risk, /dashboard, /market/*).
+Responses are stored as encoded JSON bytes together with the versions of the scopes they
+were built from (a symbol, a user's watchlist, "news"). Writers bump a scope's version after
+they commit, which makes every dependent entry stale on its next lookup. A TTL bounds the
+damage of any write path that forgets to bump, and entries are evicted least-recently-used
+once the byte cap is reached. The cache is per process; each worker keeps its own.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Iterable, Optional
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from app.core.config import settings
+
+
+NEWS_SCOPE = "news"
+WATCHLISTS_SCOPE = "watchlists"  # Any user's watchlist changed
+
+
+def watchlist_scope(session_id: Optional[str]) -> str:
+    return f"watchlist:{session_id or ''}"
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    versions: Dict[str, int]
+    expires_at: float
+
+
+class ResponseCache:
+    """Thread-safe LRU of encoded JSON responses with scope-version invalidation."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, enabled: bool = True):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._bytes = 0
+        self.counters = {"hits": 0, "misses": 0, "invalidated": 0, "expired": 0, "stores": 0, "evictions": 0}
+
+    def versions(self, scopes: Iterable[str]) -> Dict[str, int]:
+        """Snapshot scope versions. Take it *before* reading the DB so a concurrent write wins."""
+        with self._lock:
+            return {scope: self._versions.get(scope, 0) for scope in scopes}
+
+    def bump(self, *scopes: str):
+        """Called after a write commits: entries built from these scopes become stale."""
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+
+    def _drop_locked(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._bytes -= len(entry.body)
+
+    def get(self, key: Hashable) -> Optional[Response]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            if time.monotonic() >= entry.expires_at:
+                self._drop_locked(key)
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+            if any(self._versions.get(scope, 0) != version for scope, version in entry.versions.items()):
+                self._drop_locked(key)
+                self.counters["invalidated"] += 1
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            body = entry.body
+        return Response(content=body, media_type="application/json")
+
+    def set(self, key: Hashable, value: Any, versions: Dict[str, int]) -> Any:
+        """Cache `value` (anything FastAPI can encode) built at `versions`; returns `value` unchanged."""
+        if not self.enabled:
+            return value
+        body = json.dumps(jsonable_encoder(value), separators=(",", ":")).encode("utf-8")
+        if len(body) > self.max_bytes:
+            return value
+        with self._lock:
+            # Don't cache a response that a write already superseded while it was being built
+            if any(self._versions.get(scope, 0) != version for scope, version in versions.items()):
+                return value
+            self._drop_locked(key)
+            self._entries[key] = CachedResponse(body, dict(versions), time.monotonic() + self.ttl_seconds)
+            self._bytes += len(body)
+            self.counters["stores"] += 1
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop_locked(oldest)
+                self.counters["evictions"] += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update({
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds
+            })
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+response_cache = ResponseCache(
+    max_bytes=settings.response_cache_max_bytes,
+    ttl_seconds=settings.response_cache_ttl_seconds,
+    enabled=settings.response_cache_enabled
+)
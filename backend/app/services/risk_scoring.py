@@ -3,6 +3,10 @@ from typing import Dict, List
 from sqlmodel import Session, select, desc
 from app.models.models import MetricsSnapshot, RiskSnapshot, AISnapshot
 from app.core.config import settings
+from app.services.response_cache import response_cache
+
+# Score change (points) between consecutive snapshots that counts as an up/down trend
+TREND_THRESHOLD = 5
 
 
 def calculate_market_score(metrics: Dict) -> float:
@@ -93,24 +97,49 @@ def get_trend(session: Session, symbol: str, current_score: float) -> str:
     if len(snapshots) < 2:
         return "new"
     
-    previous_score = snapshots[1].total_score
+    return trend_between(current_score, snapshots[1].total_score)
+
+
+def trend_between(current_score: float, previous_score: float) -> str:
+    """Classify a score change: more than TREND_THRESHOLD points either way is a trend, otherwise flat."""
     diff = current_score - previous_score
     
-    if diff > 5:
+    if diff > TREND_THRESHOLD:
         return "up"
-    elif diff < -5:
+    elif diff < -TREND_THRESHOLD:
         return "down"
     else:
         return "flat"
 
 
+def trend_from_snapshots(snapshots: List[RiskSnapshot]) -> str:
+    """Trend from risk snapshots ordered newest first (latest vs previous)."""
+    if len(snapshots) < 2:
+        return "new"
+    return trend_between(snapshots[0].total_score, snapshots[1].total_score)
+
+
+def score_risk(metrics: Dict, ai_data: Dict) -> Dict:
+    """Market, news and total scores plus reasons, without touching the database."""
+    market_score = calculate_market_score(metrics)
+    news_score = calculate_news_score(ai_data)
+    return {
+        "market_score": market_score,
+        "news_score": news_score,
+        "total_score": calculate_total_score(market_score, news_score),
+        "reasons": generate_reasons(metrics, ai_data, market_score, news_score)
+    }
+
+
 def calculate_risk_score(session: Session, symbol: str, metrics: Dict, ai_data: Dict, snapshot_date=None) -> Dict:
     """Calculate and store risk score for a ticker."""
     from datetime import datetime
-    market_score = calculate_market_score(metrics)
-    news_score = calculate_news_score(ai_data)
-    total_score = calculate_total_score(market_score, news_score)
-    reasons = generate_reasons(metrics, ai_data, market_score, news_score)
+    from app.services.latest_state import record_risk
+    scores = score_risk(metrics, ai_data)
+    market_score = scores["market_score"]
+    news_score = scores["news_score"]
+    total_score = scores["total_score"]
+    reasons = scores["reasons"]
     trend = get_trend(session, symbol, total_score)
     
     # Store risk snapshot
@@ -124,7 +153,9 @@ def calculate_risk_score(session: Session, symbol: str, metrics: Dict, ai_data:
         ts=snapshot_date if snapshot_date else datetime.utcnow()
     )
     session.add(risk_snapshot)
+    record_risk(session, risk_snapshot)
     session.commit()
+    response_cache.bump(symbol)
     
     return {
         "market_score": market_score,
@@ -1,78 +1,45 @@
+from datetime import datetime
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
-from sqlmodel import Session, select
-from app.core.database import engine
+from sqlmodel import Session
+from app.core.database import jobs_engine
 from app.core.config import settings
-from app.models.models import Ticker
-from app.services.market_data import refresh_ticker_market_data
-from app.services.news_service import refresh_ticker_news
-from app.services.ai_service import AIService
-from app.services.risk_scoring import calculate_risk_score
-from app.services.news_service import get_recent_news
-from sqlmodel import select, desc
-from app.models.models import MetricsSnapshot, AISnapshot
-import json
-import asyncio
+from app.services.refresh_pipeline import run_refresh_pipeline
+from app.services.symbol_universe import get_symbol_universe
+from app.services.ai_cache import ai_result_cache
+from app.services.partitions import maintain_partitions
+from app.services.compaction import compact_snapshots
 
 
 scheduler = AsyncIOScheduler()
 
 
-async def process_ticker_async(session: Session, symbol: str):
-    """Process a ticker: get metrics, news, run AI, calculate risk."""
-    # Get latest metrics
-    metrics_stmt = select(MetricsSnapshot).where(
-        MetricsSnapshot.symbol == symbol
-    ).order_by(desc(MetricsSnapshot.ts)).limit(1)
-    latest_metrics = session.exec(metrics_stmt).first()
-    
-    if not latest_metrics:
+async def refresh_all_tickers():
+    """Background job to refresh every watched symbol once through the staged refresh pipeline."""
+    with Session(jobs_engine) as session:
+        universe = get_symbol_universe(session)
+
+    if not universe:
         return
-    
-    # Get recent news
-    news_articles = get_recent_news(session, symbol, limit=15)
-    
-    # Run AI analysis
-    ai_service = AIService()
-    ai_result = ai_service.analyze_news(news_articles)
-    
-    # Store AI snapshot
-    ai_snapshot = AISnapshot(
-        symbol=symbol,
-        sentiment=ai_result["sentiment"],
-        themes_json=json.dumps(ai_result["themes"]),
-        summary=ai_result["summary"],
-        raw_json=ai_result["raw_json"]
+
+    summary = await run_refresh_pipeline(list(universe))
+    print(
+        f"Refresh cycle finished in {summary['duration_seconds']}s: "
+        f"{len(summary['succeeded'])}/{summary['total']} symbols refreshed "
+        f"for {sum(universe.values())} subscriptions, {len(summary['failed'])} failed, "
+        f"{summary['llm_requests']} LLM request(s)"
     )
-    session.add(ai_snapshot)
-    session.commit()
-    
-    # Calculate risk score
-    metrics_dict = {
-        "price": latest_metrics.price,
-        "return_7d": latest_metrics.return_7d,
-        "vol_ann": latest_metrics.vol_ann,
-        "max_drawdown": latest_metrics.max_drawdown
-    }
-    calculate_risk_score(session, symbol, metrics_dict, ai_result)
+    for symbol, error in list(summary["failed"].items())[:5]:
+        print(f"  - {symbol}: {error}")
 
 
-async def refresh_all_tickers():
-    """Background job to refresh all tickers."""
-    with Session(engine) as session:
-        tickers = session.exec(select(Ticker)).all()
-        
-        for ticker in tickers:
-            try:
-                # Refresh market data
-                refresh_ticker_market_data(session, ticker.symbol)
-                # Refresh news
-                refresh_ticker_news(session, ticker.symbol)
-                # Process AI and risk scoring
-                await process_ticker_async(session, ticker.symbol)
-                print(f"Refreshed {ticker.symbol}")
-            except Exception as e:
-                print(f"Error refreshing {ticker.symbol}: {e}")
+def prune_ai_cache():
+    """Drop AI analysis cache entries older than AI_CACHE_TTL_HOURS."""
+    with Session(jobs_engine) as session:
+        removed = ai_result_cache.prune(session)
+    if removed:
+        print(f"✓ Pruned {removed} expired AI cache entr{'y' if removed == 1 else 'ies'}")
 
 
 def start_scheduler():
@@ -83,8 +50,37 @@ def start_scheduler():
         trigger=IntervalTrigger(minutes=interval_minutes),
         id="refresh_tickers",
         name="Refresh all tickers",
-        replace_existing=True
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.add_job(
+        prune_ai_cache,
+        trigger=IntervalTrigger(hours=6),
+        id="prune_ai_cache",
+        name="Prune AI analysis cache",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.add_job(
+        maintain_partitions,
+        trigger=IntervalTrigger(hours=24),
+        id="maintain_partitions",
+        name="Create snapshot partitions and apply retention",
+        next_run_time=datetime.now(),  # also once at startup
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.add_job(
+        compact_snapshots,
+        trigger=CronTrigger(hour=3, minute=30),  # nightly, off the busy hours
+        id="compact_snapshots",
+        name="Compact snapshot history",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
     )
     scheduler.start()
     print(f"Scheduler started: refreshing every {interval_minutes} minutes")
-
@@ -0,0 +1,173 @@
+"""
+Single-flight coalescing for per-symbol refreshes.
+The API (/refresh, /risk ingestion), the scheduler pipeline and the /market/news backfill can all
+refresh the same symbol at once. The first caller for a key runs the refresh; callers that arrive
+while it is in flight wait for it and receive the same result instead of repeating the provider
+calls and DB writes. Sync (thread) and async callers share one in-flight table. A sync follower
+waits at most SINGLE_FLIGHT_WAIT_SECONDS and then stops waiting, so a slow leader can't hold the
+follower's thread (often a blocking-pool one) indefinitely.
+
+With SINGLE_FLIGHT_MODE=advisory the leader also holds a Postgres advisory lock for the key, so
+API and scheduler workers in other processes coalesce too. A caller that finds the lock held waits
+for it to be released and then returns `fallback()` (built from what the other process stored)
+rather than refreshing again. Each in-flight key then holds one extra jobs-pool connection (the lock
+connection) next to the refresh's own session; database.jobs_pool_overflow() sizes the pool for it.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import jobs_engine
+
+ADVISORY_POLL_SECONDS = 0.25
+
+
+def advisory_key(key: Hashable) -> int:
+    """Stable signed 64-bit lock id for a key (same in every process)."""
+    digest = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class SingleFlight:
+    """Per-key in-flight table: one leader runs, concurrent followers share its result."""
+
+    def __init__(self, mode: str = "local", wait_seconds: float = 120):
+        self.mode = mode
+        self.wait_seconds = wait_seconds
+        self._lock = threading.Lock()
+        # key -> (shared future, event loop of an async leader or None for a thread leader)
+        self._inflight: Dict[Hashable, Tuple[Future, Optional[asyncio.AbstractEventLoop]]] = {}
+        self.counters = {"leaders": 0, "coalesced": 0, "remote_coalesced": 0, "remote_timeouts": 0,
+                         "local_timeouts": 0}
+
+    @property
+    def use_advisory_locks(self) -> bool:
+        return self.mode == "advisory" and jobs_engine.dialect.name == "postgresql"
+
+    def _join(self, key: Hashable, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """(future, leader loop, is_leader): register as leader for `key` or join the in-flight call."""
+        with self._lock:
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                self.counters["coalesced"] += 1
+                return inflight[0], inflight[1], False
+            future = Future()
+            self._inflight[key] = (future, loop)
+            self.counters["leaders"] += 1
+            return future, loop, True
+
+    def _finish(self, key: Hashable, future: Future, result: Any = None, error: Optional[BaseException] = None):
+        with self._lock:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    @contextmanager
+    def _advisory_lock(self, key: Hashable):
+        """Yields True if this process holds the key's advisory lock, False if another process
+        held it (and has since released it, or the wait timed out)."""
+        if not self.use_advisory_locks:
+            yield True
+            return
+        lock_id = advisory_key(key)
+        with jobs_engine.connect() as conn:
+            # Session-level locks don't need a transaction; autocommit keeps this connection from
+            # sitting "idle in transaction" for the whole refresh (or the whole wait)
+            conn.execution_options(isolation_level="AUTOCOMMIT")
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": lock_id}).scalar()
+            if acquired:
+                try:
+                    yield True
+                finally:
+                    conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": lock_id})
+                return
+            # Another process is refreshing this key: wait for it instead of refreshing again
+            deadline = time.monotonic() + self.wait_seconds
+            while time.monotonic() < deadline:
+                time.sleep(ADVISORY_POLL_SECONDS)
+                if conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": lock_id}).scalar():
+                    conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": lock_id})
+                    break
+            else:
+                self.counters["remote_timeouts"] += 1
+            self.counters["remote_coalesced"] += 1
+            yield False
+
+    def _lead(self, key: Hashable, fn: Callable[[], Any], fallback: Optional[Callable[[], Any]]) -> Any:
+        with self._advisory_lock(key) as owner:
+            if owner or fallback is None:
+                return fn()
+            return fallback()
+
+    def do(self, key: Hashable, fn: Callable[[], Any], fallback: Optional[Callable[[], Any]] = None) -> Any:
+        """Run fn() for `key`, or wait for the call already in flight and return its result."""
+        future, leader_loop, leader = self._join(key)
+        if not leader:
+            if leader_loop is not None and _running_loop() is leader_loop:
+                # Blocking here would stall the loop the async leader runs on; refresh uncoalesced
+                return fn()
+            try:
+                return future.result(timeout=self.wait_seconds)
+            except FutureTimeout:
+                # The leader is still running: answer from what is stored (or refresh uncoalesced)
+                # rather than keep this thread waiting
+                with self._lock:
+                    self.counters["local_timeouts"] += 1
+                return fallback() if fallback is not None else fn()
+        try:
+            result = self._lead(key, fn, fallback)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def do_async(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        fallback: Optional[Callable[[], Any]] = None
+    ) -> Any:
+        """Async twin of do(): followers await the shared future without blocking the loop."""
+        future, _, leader = self._join(key, asyncio.get_running_loop())
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            if self.use_advisory_locks:
+                # The lock wait blocks, so it runs in a thread; a lock owner then runs fn on the loop
+                lock = self._advisory_lock(key)
+                owner = await asyncio.to_thread(lock.__enter__)
+                try:
+                    result = await fn() if owner or fallback is None else await asyncio.to_thread(fallback)
+                finally:
+                    await asyncio.to_thread(lock.__exit__, None, None, None)
+            else:
+                result = await fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update({"mode": self.mode, "advisory_locks": self.use_advisory_locks, "in_flight": len(self._inflight)})
+        return stats
+
+
+single_flight = SingleFlight(mode=settings.single_flight_mode, wait_seconds=settings.single_flight_wait_seconds)
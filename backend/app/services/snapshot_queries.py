@@ -0,0 +1,49 @@
+"""
+Batched "latest snapshot per symbol" reads.
+Instead of one ORDER BY ts DESC LIMIT n query per symbol, each helper runs a single query:
+a VALUES list of the requested symbols joined LATERAL to the newest rows for each symbol,
+which Postgres serves with one index probe per symbol.
+"""
+from typing import Dict, List
+from sqlalchemy import String, column, true, values
+from sqlmodel import Session, select
+from app.models.models import MetricsSnapshot, RiskSnapshot, AISnapshot
+
+
+def _latest_ids(model, symbols: List[str], depth: int):
+    requested = values(column("symbol", String), name="requested_symbols").data([(s,) for s in symbols])
+    newest = (
+        select(model.id)
+        .where(model.symbol == requested.c.symbol)
+        .order_by(model.ts.desc(), model.id.desc())
+        .limit(depth)
+        .lateral("newest")
+    )
+    return select(newest.c.id).select_from(requested).join(newest, true())
+
+
+def latest_by_symbol(session: Session, model, symbols: List[str], depth: int = 1) -> Dict[str, List]:
+    """Return {symbol: [newest, ..., depth-th newest]} rows of a snapshot model in one query."""
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    statement = select(model).where(model.id.in_(_latest_ids(model, symbols, depth)))
+    grouped: Dict[str, List] = {}
+    for row in session.exec(statement).all():
+        grouped.setdefault(row.symbol, []).append(row)
+    for rows in grouped.values():
+        rows.sort(key=lambda r: (r.ts, r.id), reverse=True)
+    return grouped
+
+
+def latest_metrics_by_symbol(session: Session, symbols: List[str]) -> Dict[str, MetricsSnapshot]:
+    return {symbol: rows[0] for symbol, rows in latest_by_symbol(session, MetricsSnapshot, symbols).items()}
+
+
+def latest_risks_by_symbol(session: Session, symbols: List[str], depth: int = 2) -> Dict[str, List[RiskSnapshot]]:
+    """Newest `depth` risk snapshots per symbol (newest first), e.g. current + previous for trends."""
+    return latest_by_symbol(session, RiskSnapshot, symbols, depth)
+
+
+def latest_ai_by_symbol(session: Session, symbols: List[str]) -> Dict[str, AISnapshot]:
+    return {symbol: rows[0] for symbol, rows in latest_by_symbol(session, AISnapshot, symbols).items()}
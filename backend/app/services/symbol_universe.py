@@ -0,0 +1,17 @@
+"""
+Distinct symbol universe for refresh work.
+Ticker rows are per user, so the same symbol can appear thousands of times. Refresh jobs work on
+the distinct set of symbols instead, each with a reference count of the users subscribed to it.
+A symbol leaves the universe as soon as its last Ticker row is deleted.
+"""
+from typing import Dict
+from sqlalchemy import func
+from sqlmodel import Session, select
+from app.models.models import Ticker
+
+
+def get_symbol_universe(session: Session) -> Dict[str, int]:
+    """Return {symbol: subscriber_count} for every symbol watched by at least one user."""
+    statement = select(Ticker.symbol, func.count(Ticker.id)).group_by(Ticker.symbol).order_by(Ticker.symbol)
+    return {symbol: count for symbol, count in session.exec(statement).all()}
+
@@ -0,0 +1,43 @@
+# Compare LLM request count and prompt size for one refresh cycle: one analyze_news request per
+# symbol (old path) vs analyze_news_batch packing. Builds the real request payloads from synthetic
+# headlines and estimates tokens locally; no OpenAI calls are made.
+# Run from backend/:  python -m benchmarks.ai_batching [--symbols 100] [--headlines 15]
+import argparse
+from types import SimpleNamespace
+from app.services.ai_service import AIService, estimate_tokens, pack_news_batches
+
+
+def prompt_tokens(request):
+    return sum(estimate_tokens(message["content"]) for message in request["messages"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched LLM news analysis payloads")
+    parser.add_argument("--symbols", type=int, default=100)
+    parser.add_argument("--headlines", type=int, default=15)
+    args = parser.parse_args()
+
+    service = AIService()
+    market_data = {"price": 187.42, "return_7d": -3.15, "vol_ann": 27.4, "max_drawdown": 8.9}
+    items = []
+    for i in range(args.symbols):
+        articles = [
+            SimpleNamespace(title=f"Company {i} shares move after quarterly update on guidance and margins, analysts say ({j})", url="")
+            for j in range(args.headlines)
+        ]
+        items.append((f"SYM{i}", articles, market_data))
+
+    single = [service._news_request(articles, data) for _, articles, data in items]
+    batches = pack_news_batches(items)
+    batched = [service._batch_request(batch) for batch in batches]
+
+    single_tokens = sum(prompt_tokens(request) for request in single)
+    batched_tokens = sum(prompt_tokens(request) for request in batched)
+    print(f"{args.symbols} symbols x {args.headlines} headlines")
+    print(f"  per-symbol: {len(single):5d} requests  ~{single_tokens:8d} prompt tokens")
+    print(f"  batched:    {len(batched):5d} requests  ~{batched_tokens:8d} prompt tokens  (sizes {sorted({len(b) for b in batches})})")
+    print(f"  requests {len(single) / len(batched):.1f}x fewer, prompt tokens {single_tokens / batched_tokens:.1f}x fewer")
+
+
+if __name__ == "__main__":
+    main()
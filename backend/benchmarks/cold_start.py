@@ -0,0 +1,55 @@
+# Benchmark API worker cold start: wall time of `import main` in fresh interpreters (what every
+# uvicorn worker and every --reload cycle pays before serving), plus the one-off cost the lazy imports
+# move to first use (VADER lexicon on the first headline score, pandas/numpy on the first metrics pass).
+# No database or network access: the startup event (init_db, scheduler) is not run.
+# Run from backend/:  python -m benchmarks.cold_start [--runs 7]
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from app.services.ai_service import ai_service
+ai_service.score_headline("Shares rally after earnings beat")
+scored = time.perf_counter()
+from app.services.market_data import calculate_metrics
+import pandas as pd
+calculate_metrics(pd.DataFrame({"Close": [float(n) for n in range(1, 31)]}))
+computed = time.perf_counter()
+print(json.dumps({
+    "import_main": imported - started,
+    "first_headline_score": scored - imported,
+    "first_metrics": computed - scored,
+}))
+"""
+
+
+def run_probe() -> dict:
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(result.stderr[-2000:])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API cold start")
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+
+    run_probe()  # warm the OS file cache and .pyc files so every measured run starts equal
+    runs = [run_probe() for _ in range(args.runs)]
+    print(f"{'phase (median of ' + str(args.runs) + ')':<26} {'ms':>8}")
+    for phase in ("import_main", "first_headline_score", "first_metrics"):
+        print(f"{phase:<26} {statistics.median(run[phase] for run in runs) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
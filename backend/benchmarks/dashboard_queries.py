@@ -0,0 +1,148 @@
+# Benchmark GET /dashboard reads: per-ticker queries (old path) vs batched latest-snapshot queries.
+# Seeds BENCH* symbols for a throwaway user into DATABASE_URL, times both paths at several
+# watchlist sizes, counts SQL statements, then deletes the seeded rows.
+# Run from backend/:  python -m benchmarks.dashboard_queries [--sizes 10,100,1000] [--snapshots 50]
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event, delete, insert
+from sqlmodel import Session, select, desc
+from app.core.database import engine, init_db
+from app.models.models import User, Ticker, MetricsSnapshot, RiskSnapshot
+from app.services.risk_scoring import trend_from_snapshots
+from app.services.snapshot_queries import latest_metrics_by_symbol, latest_risks_by_symbol
+
+BENCH_SESSION_ID = "bench-dashboard-queries"
+BENCH_PREFIX = "BENCH"
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+def seed(session: Session, size: int, snapshots: int) -> int:
+    user = User(session_id=BENCH_SESSION_ID)
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+
+    symbols = [f"{BENCH_PREFIX}{i:04d}" for i in range(size)]
+    now = datetime.utcnow()
+    session.execute(insert(Ticker), [{"symbol": s, "user_id": user.id, "created_at": now} for s in symbols])
+    metrics_rows, risk_rows = [], []
+    for symbol in symbols:
+        for n in range(snapshots):
+            ts = now - timedelta(minutes=30 * n)
+            metrics_rows.append({
+                "symbol": symbol, "ts": ts, "price": random.uniform(10, 500),
+                "return_7d": random.uniform(-10, 10), "vol_ann": random.uniform(5, 80),
+                "max_drawdown": random.uniform(0, 40)
+            })
+            risk_rows.append({
+                "symbol": symbol, "ts": ts, "market_score": random.uniform(0, 100),
+                "news_score": random.uniform(0, 100), "total_score": random.uniform(0, 100),
+                "reasons_json": "[]", "trend": "flat"
+            })
+    session.execute(insert(MetricsSnapshot), metrics_rows)
+    session.execute(insert(RiskSnapshot), risk_rows)
+    session.commit()
+    return user.id
+
+
+def cleanup(session: Session):
+    user = session.exec(select(User).where(User.session_id == BENCH_SESSION_ID)).first()
+    if user:
+        session.execute(delete(Ticker).where(Ticker.user_id == user.id))
+        session.delete(user)
+    session.execute(delete(MetricsSnapshot).where(MetricsSnapshot.symbol.like(f"{BENCH_PREFIX}%")))
+    session.execute(delete(RiskSnapshot).where(RiskSnapshot.symbol.like(f"{BENCH_PREFIX}%")))
+    session.commit()
+
+
+def per_ticker_path(session: Session, user_id: int):
+    """The dashboard read loop before batching: three queries per ticker."""
+    rows = []
+    for ticker in session.exec(select(Ticker).where(Ticker.user_id == user_id)).all():
+        latest_metrics = session.exec(
+            select(MetricsSnapshot).where(MetricsSnapshot.symbol == ticker.symbol)
+            .order_by(desc(MetricsSnapshot.ts)).limit(1)
+        ).first()
+        latest_risk = session.exec(
+            select(RiskSnapshot).where(RiskSnapshot.symbol == ticker.symbol)
+            .order_by(desc(RiskSnapshot.ts)).limit(1)
+        ).first()
+        risk_snapshots = list(session.exec(
+            select(RiskSnapshot).where(RiskSnapshot.symbol == ticker.symbol)
+            .order_by(desc(RiskSnapshot.ts)).limit(2)
+        ))
+        rows.append((ticker.symbol, latest_metrics, latest_risk, trend_from_snapshots(risk_snapshots)))
+    return rows
+
+
+def batched_path(session: Session, user_id: int):
+    tickers = session.exec(select(Ticker).where(Ticker.user_id == user_id)).all()
+    symbols = [ticker.symbol for ticker in tickers]
+    metrics_by_symbol = latest_metrics_by_symbol(session, symbols)
+    risks_by_symbol = latest_risks_by_symbol(session, symbols, depth=2)
+    rows = []
+    for ticker in tickers:
+        risk_snapshots = risks_by_symbol.get(ticker.symbol, [])
+        rows.append((
+            ticker.symbol,
+            metrics_by_symbol.get(ticker.symbol),
+            risk_snapshots[0] if risk_snapshots else None,
+            trend_from_snapshots(risk_snapshots)
+        ))
+    return rows
+
+
+def measure(fn, user_id: int, repeats: int):
+    timings, queries = [], 0
+    for _ in range(repeats):
+        counter = QueryCounter()
+        event.listen(engine, "before_cursor_execute", counter)
+        try:
+            with Session(engine) as session:
+                started = time.perf_counter()
+                rows = fn(session, user_id)
+                timings.append(time.perf_counter() - started)
+        finally:
+            event.remove(engine, "before_cursor_execute", counter)
+        queries = counter.count
+    return statistics.median(timings), queries, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dashboard read paths")
+    parser.add_argument("--sizes", default="10,100,1000")
+    parser.add_argument("--snapshots", type=int, default=50, help="metrics/risk snapshots per symbol")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    init_db()
+    print(f"{'tickers':>8} {'old ms':>10} {'old queries':>12} {'new ms':>10} {'new queries':>12} {'speedup':>8}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        with Session(engine) as session:
+            cleanup(session)
+            user_id = seed(session, size, args.snapshots)
+        try:
+            old_s, old_q, old_rows = measure(per_ticker_path, user_id, args.repeats)
+            new_s, new_q, new_rows = measure(batched_path, user_id, args.repeats)
+            old_view = [(s, m.id if m else None, r.id if r else None, t) for s, m, r, t in old_rows]
+            new_view = [(s, m.id if m else None, r.id if r else None, t) for s, m, r, t in new_rows]
+            if old_view != new_view:
+                print(f"✗ Results differ at {size} tickers")
+            print(f"{size:>8} {old_s * 1000:>10.1f} {old_q:>12} {new_s * 1000:>10.1f} {new_q:>12} {old_s / new_s:>7.1f}x")
+        finally:
+            with Session(engine) as session:
+                cleanup(session)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# Benchmark the snapshot read paths and retention before/after migration 004 (Postgres only).
+# Builds two copies of a risk snapshot table in a scratch schema of DATABASE_URL: the old layout
+# (single-column symbol and ts indexes) and the new one (monthly partitions on ts with a
+# (symbol, ts DESC, id DESC) index), seeds both with the same 30-minute history, times the queries
+# routes.py / forecasting.py / snapshot_queries.py run, then drops the schema.
+# Run from backend/:  python -m benchmarks.snapshot_partitions [--symbols 500] [--months 12] [--repeats 20]
+import argparse
+import statistics
+import time
+from datetime import datetime
+from sqlalchemy import text
+from app.core.database import engine
+from app.services.partitions import add_months, create_month_partition, default_partition_name, month_start
+
+SCHEMA = "bench_snapshots"
+BEFORE = f"{SCHEMA}.risk_before"
+AFTER = f"{SCHEMA}.risk_after"
+COLUMNS = "id SERIAL, symbol VARCHAR NOT NULL, ts TIMESTAMP NOT NULL, total_score DOUBLE PRECISION NOT NULL, reasons_json TEXT"
+
+QUERIES = {
+    "latest 2 x 100 symbols": """
+        SELECT r.* FROM (SELECT 'BENCH' || g AS symbol FROM generate_series(1, 100) g) requested
+        JOIN LATERAL (
+            SELECT id, ts, total_score FROM {table} t WHERE t.symbol = requested.symbol
+            ORDER BY ts DESC, id DESC LIMIT 2
+        ) r ON true
+    """,
+    "90-day history, 1 symbol": """
+        SELECT ts, total_score FROM {table}
+        WHERE symbol = 'BENCH7' AND ts >= now() - interval '90 days' ORDER BY ts
+    """,
+    "newest row, 1 symbol": "SELECT * FROM {table} WHERE symbol = 'BENCH7' ORDER BY ts DESC LIMIT 1",
+}
+
+
+def build(conn, symbols: int, months: int):
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    conn.execute(text(f"CREATE TABLE {BEFORE} ({COLUMNS}, PRIMARY KEY (id))"))
+    conn.execute(text(f"CREATE TABLE {AFTER} ({COLUMNS}) PARTITION BY RANGE (ts)"))
+    conn.execute(text(f"CREATE TABLE {default_partition_name(AFTER)} PARTITION OF {AFTER} DEFAULT"))
+    current = month_start(datetime.utcnow())
+    for n in range(-months, 2):
+        create_month_partition(conn, AFTER, add_months(current, n))
+
+    seed = f"""
+        SELECT 'BENCH' || s, now() - (h * interval '30 minutes'), random() * 100, '[]'
+        FROM generate_series(1, :symbols) s, generate_series(0, :points) h
+    """
+    params = {"symbols": symbols, "points": months * 30 * 48}
+    conn.execute(text(f"INSERT INTO {BEFORE} (symbol, ts, total_score, reasons_json) {seed}"), params)
+    conn.execute(text(f"INSERT INTO {AFTER} (symbol, ts, total_score, reasons_json) {seed}"), params)
+    conn.execute(text(f"CREATE INDEX ON {BEFORE} (symbol)"))
+    conn.execute(text(f"CREATE INDEX ON {BEFORE} (ts)"))
+    conn.execute(text(f"ALTER TABLE {AFTER} ADD PRIMARY KEY (id, ts)"))
+    conn.execute(text(f"CREATE INDEX ON {AFTER} (symbol, ts DESC, id DESC)"))
+    conn.execute(text(f"CREATE INDEX ON {AFTER} (ts)"))
+    conn.execute(text(f"ANALYZE {BEFORE}"))
+    conn.execute(text(f"ANALYZE {AFTER}"))
+
+
+def time_query(conn, sql: str, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        conn.execute(text(sql)).fetchall()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def time_retention(conn) -> tuple:
+    """Remove the oldest month: DELETE on the old layout vs DROP of one partition."""
+    oldest = conn.execute(text(f"SELECT date_trunc('month', min(ts)) FROM {BEFORE}")).scalar()
+    started = time.perf_counter()
+    deleted = conn.execute(text(f"DELETE FROM {BEFORE} WHERE ts < :end"), {"end": add_months(oldest, 1)}).rowcount
+    delete_s = time.perf_counter() - started
+    started = time.perf_counter()
+    conn.execute(text(f"DROP TABLE {AFTER}_p{oldest:%Y%m}"))
+    drop_s = time.perf_counter() - started
+    return deleted, delete_s, drop_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot indexes and partitioning")
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("This benchmark needs a Postgres DATABASE_URL")
+
+    try:
+        with engine.begin() as conn:
+            started = time.perf_counter()
+            build(conn, args.symbols, args.months)
+            rows = conn.execute(text(f"SELECT count(*) FROM {BEFORE}")).scalar()
+            print(f"Seeded {rows} rows per layout in {time.perf_counter() - started:.1f}s")
+
+        with engine.connect() as conn:
+            print(f"{'query':<26} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+            for name, sql in QUERIES.items():
+                before_s = time_query(conn, sql.format(table=BEFORE), args.repeats)
+                after_s = time_query(conn, sql.format(table=AFTER), args.repeats)
+                print(f"{name:<26} {before_s * 1000:>10.2f} {after_s * 1000:>10.2f} {before_s / after_s:>7.1f}x")
+
+        with engine.begin() as conn:
+            deleted, delete_s, drop_s = time_retention(conn)
+            print(f"{'retention: oldest month':<26} {delete_s * 1000:>10.2f} {drop_s * 1000:>10.2f} "
+                  f"{delete_s / drop_s:>7.1f}x  ({deleted} rows; DELETE vs DROP partition)")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
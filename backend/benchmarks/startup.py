@@ -0,0 +1,60 @@
+# Benchmark the schema step of startup before/after versioned migrations (migration 005).
+# "before" replays what init_db did on every start: create_all plus the idempotent DDL steps now in
+# alembic/versions/005_init_db_steps.py (ALTER TABLEs, index rebuild, duplicate sweeps, backfills),
+# each of which takes table locks even when there is nothing to change. "after" is init_db() on a
+# database already at head: one alembic_version lookup. Both run against DATABASE_URL, which should
+# already be migrated (`alembic upgrade head`); the replayed steps are the ones every old start ran.
+# Run from backend/:  python -m benchmarks.startup [--repeats 5]
+import argparse
+import contextlib
+import importlib.util
+import io
+import statistics
+import time
+from sqlmodel import SQLModel
+from app.core.database import engine, init_db
+from app.core.migrations import BACKEND_DIR, current_revision, head_revision
+import app.models.models  # noqa: F401
+
+
+def load_init_db_steps():
+    # The migration's file name starts with a digit, so it can't be imported by name
+    path = BACKEND_DIR / "alembic" / "versions" / "005_init_db_steps.py"
+    spec = importlib.util.spec_from_file_location("init_db_steps", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.run_init_db_steps
+
+
+def time_call(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark startup schema checks")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    if current_revision() != head_revision():
+        raise SystemExit("Run `alembic upgrade head` first: the benchmark times startup on a current schema")
+
+    run_init_db_steps = load_init_db_steps()
+
+    def before():
+        SQLModel.metadata.create_all(engine)
+        with engine.begin() as conn:
+            run_init_db_steps(conn)
+
+    before_s = time_call(before, args.repeats)
+    after_s = time_call(init_db, args.repeats)
+    print(f"{'startup schema step':<22} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    print(f"{'schema already current':<22} {before_s * 1000:>10.1f} {after_s * 1000:>10.1f} {before_s / after_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
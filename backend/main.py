@@ -1,8 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.core.database import init_db
+from app.core.database import init_db, dispose_async_engine
+from app.core.executor import install_blocking_executor, shutdown_blocking_executor
 from app.api.routes import router
 from app.services.scheduler import start_scheduler
+from app.services.news_service import close_news_client
+from app.services.alphavantage_data import close_alphavantage_client
+from app.services.ai_service import close_openai_client
+from app.services.ingestion_jobs import ingestion_queue
 import os
 
 app = FastAPI(title="RiskLattice API", version="1.0.0")
@@ -24,12 +29,25 @@ app.include_router(router, prefix="/api", tags=["api"])
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and start scheduler on startup."""
+    install_blocking_executor()
     init_db()
     print("Database initialized")
     start_scheduler()
+    ingestion_queue.start()
     print("Application started")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop ingestion workers, close pooled HTTP clients and the async engine."""
+    await ingestion_queue.stop()
+    await close_news_client()
+    await close_alphavantage_client()
+    await close_openai_client()
+    await dispose_async_engine()
+    shutdown_blocking_executor()
+
+
 @app.get("/")
 async def root():
     return {"message": "RiskLattice API", "docs": "/docs"}
@@ -80,12 +80,52 @@ export interface ChatResponse {
   conversation_history: ChatMessage[]
 }
 
+export interface IngestionJob {
+  job_id: string
+  symbol: string
+  status: 'queued' | 'running' | 'succeeded' | 'failed'
+  stage: string | null
+  progress: number
+  error: string | null
+  status_url: string
+}
+
+const JOB_POLL_INTERVAL_MS = 1500
+const JOB_POLL_MAX_ATTEMPTS = 200
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms))
+
+// First view of a symbol answers 202 with an ingestion job; poll it, then fetch the detail again
+const getRiskDetail = async (symbol: string, period?: string) => {
+  const params = period ? { period } : {}
+  let response = await apiClient.get<RiskDetail | IngestionJob>(`/risk/${symbol}`, { params })
+  let attempts = 0
+  while (response.status === 202) {
+    const job = response.data as IngestionJob
+    let status = job.status
+    while (status !== 'succeeded') {
+      if (++attempts > JOB_POLL_MAX_ATTEMPTS) {
+        throw new Error(`Timed out waiting for ${symbol} data`)
+      }
+      await sleep(JOB_POLL_INTERVAL_MS)
+      const { data } = await apiClient.get<IngestionJob>(`/jobs/${job.job_id}`)
+      if (data.status === 'failed') {
+        throw new Error(data.error || `Could not fetch data for ${symbol}`)
+      }
+      status = data.status
+    }
+    response = await apiClient.get<RiskDetail | IngestionJob>(`/risk/${symbol}`, { params })
+  }
+  return response as typeof response & { data: RiskDetail }
+}
+
 export const api = {
   getTickers: () => apiClient.get<string[]>('/tickers'),
   addTicker: (symbol: string) => apiClient.post('/tickers', { symbol }),
   deleteTicker: (symbol: string) => apiClient.delete(`/tickers/${symbol}`),
   getDashboard: () => apiClient.get<DashboardRow[]>('/dashboard'),
-  getRiskDetail: (symbol: string, period?: string) => apiClient.get<RiskDetail>(`/risk/${symbol}`, { params: period ? { period } : {} }),
+  getRiskDetail,
+  getJob: (jobId: string) => apiClient.get<IngestionJob>(`/jobs/${jobId}`),
   refreshAll: () => apiClient.post('/refresh'),
   refreshTicker: (symbol: string) => apiClient.post(`/refresh/${symbol}`),
   chatWithAgent: (request: ChatRequest) => apiClient.post<ChatResponse>('/agent/chat', request),